@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import lanelet2
+from LaneletMap import LaneletMap
+
+# Benchmarks of the LaneletMap on synthetic maps.
+#
+#   python Benchmark_LaneletMap.py suite --maps ring grid --sizes 100 1000 10000 --output results.json
+#   python Benchmark_LaneletMap.py lookup
+#   python Benchmark_LaneletMap.py startup
+#
+# startup also measures the time to the first query in a fresh interpreter:
+# "eager" as before (matplotlib imported, routing graph built at the start),
+# "lazy" (the default now) and "background" (background = True).
+#
+# The maps: "ring" a closed ring road of three lanes, "grid" a street grid with
+# crossings (forks and merges of the turn lanes), "highway" a straight road of
+# many parallel lanes. The suite writes its results as JSON (stdout or --output),
+# one record per map, size and benchmark, to track regressions between releases.
+#
+# The maps are built with build_corridor(); "build by elements" times the ring
+# built with the element builders add_and_get_Point(), add_and_get_lineString()
+# and add_Lanelet() as well. The default sizes stop at 10^5 lanelets (about 1 GB
+# of memory): "--sizes 1000000" runs 10^6 lanelets on a machine with about 10 GB.
+
+LANE_WIDTH = 3.5
+SEGMENT_LENGTH = 10.0
+
+# Street grid: distance of the crossings and points per boundary of the turns through a crossing
+BLOCK_LENGTH = 60.0
+TURN_ROWS = 4
+
+
+# Returns the boundaries of a synthetic ring road with three lanes and about n_lanelets lanelets
+# @param n_lanelets: number of lanelets (int)
+# @return: ndarray[4, segments, 2], the inner boundary first
+def ring_boundaries(n_lanelets: int):
+
+    n_lanes = 3
+    n_segments = max(n_lanelets // n_lanes, 3)
+
+    # circle with segments of about SEGMENT_LENGTH
+    radius = n_segments * SEGMENT_LENGTH / (2 * np.pi)
+    angle = np.linspace(0.0, 2 * np.pi, n_segments, endpoint=False)
+    boundaries = np.stack([np.stack(((radius + k * LANE_WIDTH) * np.cos(angle),
+                                     (radius + k * LANE_WIDTH) * np.sin(angle)), axis=1)
+                           for k in range(n_lanes + 1)])
+
+    return boundaries
+
+
+# Builds a synthetic ring road with three lanes and about n_lanelets lanelets
+# @param n_lanelets: number of lanelets (int)
+# @return: a LaneletMap
+def make_ring_map(n_lanelets: int):
+
+    lanelet_map_ = LaneletMap()
+    lanelet_map_.build_corridor(ring_boundaries(n_lanelets), closed=True)
+
+    return lanelet_map_
+
+
+# Builds the ring road of make_ring_map() element by element with add_and_get_Point(),
+# add_and_get_lineString() and add_Lanelet()
+# @param n_lanelets: number of lanelets (int)
+# @return: a LaneletMap
+def make_ring_map_by_elements(n_lanelets: int):
+
+    lanelet_map_ = LaneletMap()
+    lines = []
+    for boundary in ring_boundaries(n_lanelets):
+        points = [lanelet_map_.add_and_get_Point(x, y) for x, y in boundary.tolist()]
+        lines.append([lanelet_map_.add_and_get_lineString(points[i], points[(i + 1) % len(points)])
+                      for i in range(len(points))])
+
+    for left_lines, right_lines in zip(lines[:-1], lines[1:]):
+        for left, right in zip(left_lines, right_lines):
+            lanelet_map_.add_Lanelet(left, right)
+
+    return lanelet_map_
+
+
+# Builds a synthetic highway: a straight road with about sqrt(n_lanelets) parallel lanes and segments
+# (lane changes, no forks or merges)
+# @param n_lanelets: number of lanelets (int)
+# @return: a LaneletMap
+def make_highway_map(n_lanelets: int):
+
+    n_lanes = max(int(np.sqrt(n_lanelets)), 1)
+    n_segments = max(n_lanelets // n_lanes, 1)
+
+    x = np.arange(n_segments + 1) * SEGMENT_LENGTH
+    boundaries = np.stack([np.stack((x, np.full(len(x), -k * LANE_WIDTH)), axis=1) for k in range(n_lanes + 1)])
+
+    lanelet_map_ = LaneletMap()
+    lanelet_map_.build_corridor(boundaries, closed=False)
+
+    return lanelet_map_
+
+
+# Returns the points of a quadratic Bezier curve from a (direction u_a) to b (direction u_b)
+# @return: ndarray[TURN_ROWS, 2]
+def turn_curve(a, u_a, b, u_b):
+
+    t = np.linspace(0.0, 1.0, TURN_ROWS)[:, None]
+
+    # control point: intersection of the two tangents, a straight line if they are parallel
+    matrix = np.stack((u_a, -u_b), axis=1)
+    if abs(np.linalg.det(matrix)) < 1e-9:
+        return (1 - t) * a + t * b
+    control = a + np.linalg.solve(matrix, b - a)[0] * u_a
+
+    return (1 - t)**2 * a + 2 * (1 - t) * t * control + t**2 * b
+
+
+# Builds a synthetic street grid of about n_lanelets lanelets: crossing two-way streets with
+# one lane per direction; at each crossing every incoming lane forks into the lanes straight
+# on, to the left and to the right (several successors), which merge into the outgoing lanes
+# (several predecessors). The turns join the streets by snapping of their points.
+# @param n_lanelets: number of lanelets (int)
+# @return: a LaneletMap
+def make_grid_map(n_lanelets: int):
+
+    # lanelets per crossing: 4 outgoing lanes of a block and up to 12 turns
+    n_rows = max(int(np.ceil((BLOCK_LENGTH - 4 * LANE_WIDTH) / SEGMENT_LENGTH)), 1)
+    per_crossing = 4 * n_rows + 12 * (TURN_ROWS - 1)
+    # at least 3 x 3 crossings: the inner crossing has four streets
+    n_crossings = max(int(round(np.sqrt(n_lanelets / per_crossing))), 3)
+
+    lanelet_map_ = LaneletMap()
+    lanelet_map_.enable_snapping()
+    directions = np.array([(1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0)])
+    margin = 2 * LANE_WIDTH
+
+    # the lane from the crossing (i, j) in direction d: left and right boundary, the street center on its left
+    def lane(i, j, d):
+        u = directions[d]
+        n = np.array((-u[1], u[0]))
+        start = np.array((i, j)) * BLOCK_LENGTH + margin * u
+        x = np.linspace(0.0, BLOCK_LENGTH - 2 * margin, n_rows + 1)[:, None]
+        return np.stack((start + x * u, start + x * u - LANE_WIDTH * n))
+
+    def exists(i, j):
+        return 0 <= i < n_crossings and 0 <= j < n_crossings
+
+    lanes = {}
+    for i in range(n_crossings):
+        for j in range(n_crossings):
+            for d, (di, dj) in enumerate(directions.astype(int)):
+                if exists(i + di, j + dj):
+                    lanes[(i, j, d)] = lane(i, j, d)
+                    lanelet_map_.build_corridor(lanes[(i, j, d)], closed=False)
+
+    # turns from the end of each incoming lane to the start of each outgoing lane (no U-turns)
+    for (i, j, d), incoming in lanes.items():
+        di, dj = directions[d].astype(int)
+        for turn in (0, 1, 3):
+            out = (i + di, j + dj, (d + turn) % 4)
+            if out in lanes:
+                outgoing = lanes[out]
+                u_in = directions[d]
+                u_out = directions[out[2]]
+                boundaries = [turn_curve(incoming[k][-1], u_in, outgoing[k][0], u_out) for k in range(2)]
+                lanelet_map_.build_corridor(boundaries, closed=False)
+
+    lanelet_map_.disable_snapping()
+
+    return lanelet_map_
+
+
+MAP_BUILDERS = {"ring": make_ring_map, "grid": make_grid_map, "highway": make_highway_map}
+
+
+# Returns the mean time of one call of func(ID) in microseconds
+# @param func: a function taking an ID
+# @param ids: list of IDs to look up
+def time_per_call(func, ids):
+
+    start = time.perf_counter()
+    for ID in ids:
+        func(ID)
+
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+
+# Returns the time of one call of func() in seconds
+# @param func: a function without arguments
+def time_once(func):
+
+    start = time.perf_counter()
+    func()
+
+    return time.perf_counter() - start
+
+
+# Compares a cold start (OSM file) with a warm start (snapshot) of a map
+# @param osm_map_file: path of the OSM map (str)
+def benchmark_startup(osm_map_file: str):
+
+    snapshot_path = osm_map_file + ".snapshot"
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+
+    cold = time_once(lambda: LaneletMap(0, 0, osm_map_file))
+    build = time_once(lambda: LaneletMap(0, 0, osm_map_file, use_snapshot=True))
+    warm = time_once(lambda: LaneletMap(0, 0, osm_map_file, use_snapshot=True))
+
+    print("%-30s cold %9.3f s   cold + snapshot %9.3f s   warm %9.4f s" %
+          (os.path.basename(osm_map_file), cold, build, warm))
+
+
+# Script of a fresh interpreter: times of the import, the constructor and the first query (JSON)
+FIRST_QUERY_SCRIPT = r"""
+import json, sys, time
+start = time.perf_counter()
+if sys.argv[2] == "eager":
+    import matplotlib.pyplot
+from LaneletMap import LaneletMap
+imported = time.perf_counter()
+lanelet_map_ = LaneletMap(0, 0, sys.argv[1], background=sys.argv[2] == "background")
+returned = time.perf_counter()
+lanelet_map_.wait_ready()
+if sys.argv[2] == "eager":
+    lanelet_map_.graph
+lane = lanelet_map_.get_Lanelet_with_Id(next(iter(lanelet_map_.lanelet_index)))
+lanelet_map_.get_following_Lanelets(lane)
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "constructor": returned - imported, "first_query": done - start}))
+"""
+
+
+# Compares the time to the first query of a map: eager, lazy and background start
+# @param osm_map_file: path of the OSM map (str)
+def benchmark_first_query(osm_map_file: str):
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (package_dir, os.environ.get("PYTHONPATH")))))
+
+    for mode in ("eager", "lazy", "background"):
+        result = subprocess.run([sys.executable, "-c", FIRST_QUERY_SCRIPT, os.path.abspath(osm_map_file), mode],
+                                capture_output=True, text=True, env=env)
+        times = json.loads(result.stdout.strip().splitlines()[-1])
+        print("%-30s %-10s import %7.3f s   constructor %7.3f s   first query %7.3f s" %
+              (os.path.basename(osm_map_file), mode, times["import"], times["constructor"], times["first_query"]))
+
+
+# Lookup time of Lanelets, Lines and Points by ID over the map size
+def benchmark_lookup():
+
+    print("%10s %14s %14s %14s" % ("lanelets", "lanelet [us]", "line [us]", "point [us]"))
+
+    for n_lanelets in (100, 1000, 10000, 100000):
+        lanelet_map_ = make_highway_map(n_lanelets)
+
+        lanelet_ids = list(lanelet_map_.lanelet_index)
+        line_ids = list(lanelet_map_.line_index)
+        point_ids = list(lanelet_map_.point_index)
+
+        print("%10d %14.3f %14.3f %14.3f" % (len(lanelet_ids),
+              time_per_call(lanelet_map_.get_Lanelet_with_Id, lanelet_ids),
+              time_per_call(lanelet_map_.get_Line_with_Id, line_ids),
+              time_per_call(lanelet_map_.get_Point_with_Id, point_ids)))
+
+
+# Runs all benchmarks on one synthetic map
+# @param map_type: "ring", "grid" or "highway"
+# @param n_lanelets: number of lanelets (int)
+# @param n_samples: number of queries per benchmark (int)
+# @param tmp_dir: directory for the OSM and image files
+# @return: list of result records
+def benchmark_map(map_type: str, n_lanelets: int, n_samples: int, tmp_dir: str):
+
+    results = []
+
+    def record(benchmark, value, unit):
+        results.append({"map": map_type, "size": n_lanelets, "lanelets": n_built,
+                        "benchmark": benchmark, "value": value, "unit": unit})
+
+    rng = np.random.default_rng(0)
+    osm_map_file = os.path.join(tmp_dir, "%s_%d.osm" % (map_type, n_lanelets))
+
+    start = time.perf_counter()
+    built_map = MAP_BUILDERS[map_type](n_lanelets)
+    build = time.perf_counter() - start
+    n_built = len(built_map.lanelet_index)
+    record("build", build, "s")
+
+    record("write", time_once(lambda: built_map.write_LaneletMap_to_file(osm_map_file)), "s")
+    del built_map
+
+    if map_type == "ring":
+        record("build by elements", time_once(lambda: make_ring_map_by_elements(n_lanelets)), "s")
+
+    start = time.perf_counter()
+    lanelet_map_ = LaneletMap(0, 0, osm_map_file)
+    record("load", time.perf_counter() - start, "s")
+
+    # queries on random lanelets
+    ids = rng.choice(np.array(list(lanelet_map_.lanelet_index)), n_samples).tolist()
+    lanes = [lanelet_map_.get_Lanelet_with_Id(ID) for ID in ids]
+
+    record("get_Lanelet_with_Id", time_per_call(lanelet_map_.get_Lanelet_with_Id, ids), "us")
+    record("get_leftBound_Lanelet", time_per_call(lanelet_map_.get_leftBound_Lanelet, lanes), "us")
+    record("get_rightBound_Lanelet", time_per_call(lanelet_map_.get_rightBound_Lanelet, lanes), "us")
+    record("get_following_Lanelet", time_per_call(lanelet_map_.get_following_Lanelet, lanes), "us")
+    record("get_following_Lanelets", time_per_call(lanelet_map_.get_following_Lanelets, lanes), "us")
+    record("get_preceding_Lanelets", time_per_call(lanelet_map_.get_preceding_Lanelets, lanes), "us")
+    record("get_corridor_ahead", time_per_call(lambda lane: lanelet_map_.get_corridor_ahead(lane, 100.0), lanes), "us")
+
+    # routing between random lanelets (forks and merges of the grid)
+    record("build routing graph", time_once(lambda: lanelet_map_.graph), "s")
+    od_ids = rng.choice(np.array(list(lanelet_map_.lanelet_index)), (min(n_samples, 100), 2))
+    record("get_routes", time_once(lambda: lanelet_map_.get_routes(od_ids)) / len(od_ids) * 1e6, "us")
+
+    # map matching on random points of the map area
+    line_ids, offsets, xy = lanelet_map_.get_LineString_arrays()
+    lower = xy.min(axis=0)
+    upper = xy.max(axis=0)
+    points = rng.uniform(lower, upper, (n_samples, 2))
+    lat, lon = lanelet_map_.project_xy_to_ll(points)
+
+    # the spatial indices are built on the first query
+    lanelet_map_.point_xy_over_Lanelet(points[0, 0], points[0, 1])
+    record("build spatial index", time_once(lambda: lanelet_map_.points_xy_over_Lanelets(points[:1])), "s")
+
+    record("point_xy_over_Lanelet", time_per_call(lambda p: lanelet_map_.point_xy_over_Lanelet(p[0], p[1]),
+                                                  points.tolist()), "us")
+    record("point_ll_over_Lanelet", time_per_call(lambda p: lanelet_map_.point_ll_over_Lanelet(p[0], p[1]),
+                                                  list(zip(lat.tolist(), lon.tolist()))), "us")
+    record("points_xy_over_Lanelets", time_once(lambda: lanelet_map_.points_xy_over_Lanelets(points))
+           / n_samples * 1e6, "us")
+
+    record("draw_map", time_once(lambda: lanelet_map_.draw_map(output_file=osm_map_file + ".png")), "s")
+
+    return results
+
+
+# Runs the benchmark suite
+# @param map_types: list of "ring" / "grid" / "highway"
+# @param sizes: list of map sizes (number of lanelets)
+# @param n_samples: number of queries per benchmark (int)
+# @return: dict with "meta" and "results"
+def benchmark_suite(map_types, sizes, n_samples = 1000):
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for map_type in map_types:
+            for n_lanelets in sizes:
+                # the LaneletMap reports on stdout
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results.extend(benchmark_map(map_type, n_lanelets, n_samples, tmp_dir))
+                print("%s %d done" % (map_type, n_lanelets), file=sys.stderr)
+
+    meta = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "lanelet2": getattr(lanelet2, "__version__", "unknown"),
+            "machine": platform.machine(),
+            "samples": n_samples}
+
+    return {"meta": meta, "results": results}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the LaneletMap")
+    parser.add_argument("benchmark", nargs="?", default="lookup", choices=("lookup", "startup", "suite"))
+    parser.add_argument("--maps", nargs="+", default=["ring", "grid", "highway"], choices=sorted(MAP_BUILDERS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000, 100000])
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--output", default=None, help="JSON file of the suite results (default stdout)")
+    args = parser.parse_args()
+
+    if args.benchmark == "lookup":
+        benchmark_lookup()
+
+    elif args.benchmark == "startup":
+        benchmark_startup("Data_Map.osm")
+        benchmark_first_query("Data_Map.osm")
+
+        # scaled-up synthetic map
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            osm_map_file = os.path.join(tmp_dir, "Synthetic_Map_50000.osm")
+            with contextlib.redirect_stdout(io.StringIO()):
+                make_ring_map(50000).write_LaneletMap_to_file(osm_map_file)
+            benchmark_startup(osm_map_file)
+            benchmark_first_query(osm_map_file)
+
+    else:
+        report = benchmark_suite(args.maps, args.sizes, args.samples)
+        if args.output == None:
+            print(json.dumps(report, indent=2))
+        else:
+            with open(args.output, "w") as json_file:
+                json.dump(report, json_file, indent=2)
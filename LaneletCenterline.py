@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+# Vectorized centerlines of all Lanelets of a map at once.
+#
+# The centerline of a Lanelet pairs its left and right bound by the normalized
+# arc length t in [0, 1] (the bounds in driving direction, inverted bounds
+# reversed) and takes the midpoint of both. It is sampled at the vertices of
+# both bounds, so it is exact between them; with a spacing it is afterwards
+# resampled uniformly by its own arc length.
+#
+# All Lanelets are computed together on the packed geometry arrays of the map
+# (LaneletMap.get_geometry_arrays()): Lanelet k is mapped to the parameter
+# range [2k, 2k + 1], so one np.interp() call interpolates all Lanelets.
+
+# Packed centerlines (read-only arrays):
+#   lanelet_ids  int64[L]     Lanelet IDs
+#   offsets      int64[L + 1] CSR: the points of Lanelet k are xyz[offsets[k]:offsets[k + 1]]
+#   xyz          float64[N, 3]
+#   lengths      float64[L]   arc length of each centerline in meter
+
+
+# Returns the points of one bound of every Lanelet in driving direction
+# @param pairs: (begin, end) of the bound in the geometry xyz (ndarray[L, 2])
+# @param inverted: the bound is inverted (ndarray[L] of bool)
+# @return: indices into xyz (ndarray[M]), offsets (ndarray[L + 1]), Lanelet of each index (ndarray[M])
+def bound_indices(pairs, inverted):
+
+    begin = pairs[:, 0]
+    end = pairs[:, 1]
+    counts = np.maximum(end - begin, 0)
+
+    offsets = np.zeros(len(pairs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+
+    lanelet = np.repeat(np.arange(len(pairs)), counts)
+    j = np.arange(offsets[-1]) - offsets[lanelet]
+    indices = np.where(inverted[lanelet], end[lanelet] - 1 - j, begin[lanelet] + j)
+
+    return indices, offsets, lanelet
+
+
+# Returns the normalized arc length of packed polylines
+# @param xyz: points of all polylines (ndarray[M, 3])
+# @param offsets: CSR offsets of the polylines (ndarray[L + 1])
+# @param lanelet: polyline of each point (ndarray[M])
+# @return: t in [0, 1] of each point (ndarray[M]), arc length of each polyline (ndarray[L])
+def arc_parameter(xyz, offsets, lanelet):
+
+    counts = np.diff(offsets)
+
+    segment = np.zeros(len(xyz))
+    segment[1:] = np.linalg.norm(xyz[1:] - xyz[:-1], axis=1)
+    segment[offsets[:-1][counts > 0]] = 0.0
+
+    s = np.cumsum(segment)
+    s -= s[offsets[:-1][lanelet]]
+
+    lengths = np.zeros(len(counts))
+    lengths[counts > 0] = s[offsets[1:][counts > 0] - 1]
+
+    # a polyline without length is parameterized by its point numbers
+    j = np.arange(len(xyz)) - offsets[:-1][lanelet]
+    t = np.where(lengths[lanelet] > 0.0, s / np.where(lengths > 0.0, lengths, 1.0)[lanelet],
+                 j / np.maximum(counts - 1, 1)[lanelet])
+
+    return np.minimum(t, 1.0), lengths
+
+
+# Interpolates packed polylines at the parameters 2k + t (Lanelet k)
+# @param xyz, offsets, lanelet, t: the polylines (see arc_parameter())
+# @param queries: 2k + t of the points to interpolate (ndarray[Q], sorted)
+# @return: the interpolated points (ndarray[Q, 3])
+def interpolate(xyz, offsets, lanelet, t, queries):
+
+    # np.interp() needs sample points, a map without Lanelets has none
+    if len(queries) == 0:
+        return np.zeros((0, 3))
+
+    # a polyline of a single point stays at its point
+    single = (np.diff(offsets) < 2)[(queries // 2).astype(np.int64)]
+    queries = np.where(single, 2.0 * (queries // 2), queries)
+
+    u = 2.0 * lanelet + t
+    return np.stack([np.interp(queries, u, xyz[:, d]) for d in range(3)], axis=1)
+
+
+# Computes the centerlines of all Lanelets
+# @param geometry: packed geometry of the map (see LaneletMap.get_geometry_arrays())
+# @param spacing: resamples the centerlines uniformly at (at most) spacing meter, default the bound vertices
+# @return: dict with "lanelet_ids", "offsets", "xyz" and "lengths" (see above)
+def compute_centerlines(geometry, spacing = None):
+
+    xyz = geometry["xyz"]
+    n_lanelets = len(geometry["lanelet_ids"])
+
+    bounds = []
+    for j, name in enumerate(("left", "right")):
+        indices, offsets, lanelet = bound_indices(geometry["lanelet_" + name], geometry["lanelet_inverted"][:, j])
+        points = xyz[indices]
+        t, _ = arc_parameter(points, offsets, lanelet)
+        bounds.append((points, offsets, lanelet, t))
+
+    # the vertices of both bounds, without (near) duplicates
+    queries = np.unique(np.concatenate([2.0 * lanelet + t for _, _, lanelet, t in bounds]))
+    if len(queries) > 1:
+        keep = np.ones(len(queries), dtype=bool)
+        keep[1:] = np.diff(queries) > 1e-9
+        queries = queries[keep]
+
+    center = 0.5 * (interpolate(*bounds[0], queries) + interpolate(*bounds[1], queries))
+    lanelet = (queries // 2).astype(np.int64)
+    offsets = np.zeros(n_lanelets + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(lanelet, minlength=n_lanelets))
+
+    t, lengths = arc_parameter(center, offsets, lanelet)
+
+    # uniform resampling by the arc length of the centerline
+    if spacing != None and spacing > 0.0:
+        counts = np.maximum(np.ceil(lengths / spacing - 1e-9).astype(np.int64) + 1, 2)
+        counts[np.diff(offsets) == 0] = 0
+
+        new_offsets = np.zeros(n_lanelets + 1, dtype=np.int64)
+        new_offsets[1:] = np.cumsum(counts)
+        new_lanelet = np.repeat(np.arange(n_lanelets), counts)
+        j = np.arange(new_offsets[-1]) - new_offsets[:-1][new_lanelet]
+
+        center = interpolate(center, offsets, lanelet, t, 2.0 * new_lanelet + j / (counts[new_lanelet] - 1))
+        offsets = new_offsets
+
+    centerlines = {"lanelet_ids": np.asarray(geometry["lanelet_ids"], dtype=np.int64), "offsets": offsets,
+                   "xyz": center, "lengths": lengths}
+
+    for array in centerlines.values():
+        array.flags.writeable = False
+
+    return centerlines
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+import numpy as np
+from LaneletCenterline import arc_parameter
+
+# Frenet coordinates (s, d) along the lanes of a map.
+#
+# A lane is a chain of Lanelets, each with exactly one following Lanelet which
+# has no other preceding Lanelet; a ring road is a closed chain. s is the arc
+# length along the centerlines of the chain (LaneletMap.get_centerlines()) from
+# the start of its first Lanelet, d the lateral offset, positive to the left.
+# A lane is named by the ID of its first Lanelet.
+#
+# All centerline points of all lanes are packed in lane order with their
+# cumulative s. xy_to_sd() projects each point onto the centerline of its
+# matched Lanelet only, sd_to_xy() finds the segment by a binary search over s.
+
+class LaneletFrenet:
+    def __init__(self, centerlines, topology):
+
+        # the centerlines and the neighbour table the lanes are built from
+        self.centerlines = centerlines
+        self.topology = topology
+        self.topology_version = topology.version
+
+        ids = centerlines["lanelet_ids"]
+        offsets = centerlines["offsets"]
+        xy = centerlines["xyz"][:, :2]
+        counts = np.diff(offsets)
+        n_lanelets = len(ids)
+
+        # centerline index i of the Lanelet IDs (sorted search)
+        self.sorted_order = np.argsort(ids, kind="stable")
+        self.sorted_ids = ids[self.sorted_order]
+
+        # next Lanelet of the lane: the only following Lanelet, if it has no other preceding one
+        rows = topology.rows(ids)
+        index_of_row = np.full(len(topology.columns["ids"]) + 1, -1, dtype=np.int64)
+        index_of_row[rows[rows >= 0]] = np.nonzero(rows >= 0)[0]
+
+        valid = (rows >= 0) & (counts >= 2)
+        row = np.maximum(rows, 0)
+        n_following = np.where(valid, topology.following_offsets[row + 1] - topology.following_offsets[row], 0)
+        following = np.append(topology.following, -1)
+        successor_row = np.where(n_following == 1, following[topology.following_offsets[row]], -1)
+        n_preceding = topology.preceding_offsets[successor_row + 1] - topology.preceding_offsets[successor_row]
+        successor = np.where((successor_row >= 0) & (n_preceding == 1), index_of_row[successor_row], -1)
+        successor[successor >= 0] = np.where(valid[successor[successor >= 0]], successor[successor >= 0], -1)
+
+        predecessor = np.full(n_lanelets, -1, dtype=np.int64)
+        predecessor[successor[successor >= 0]] = np.nonzero(successor >= 0)[0]
+
+        # lanes: from each Lanelet without predecessor, then the closed chains from their smallest ID
+        next_of = successor.tolist()
+        visited = np.zeros(n_lanelets, dtype=bool)
+        lane_order = []
+        lane_offsets = [0]
+        cyclic = []
+        starts = np.concatenate((np.nonzero(valid & (predecessor < 0))[0], self.sorted_order[valid[self.sorted_order]])).tolist()
+
+        for start in starts:
+            if visited[start]:
+                continue
+            i = start
+            while i >= 0 and not visited[i]:
+                visited[i] = True
+                lane_order.append(i)
+                i = next_of[i]
+            lane_offsets.append(len(lane_order))
+            cyclic.append(i == start)
+
+        lane_order = np.array(lane_order, dtype=np.int64)
+        self.lane_offsets = np.array(lane_offsets, dtype=np.int64)
+        self.cyclic = np.array(cyclic, dtype=bool)
+        n_lanes = len(cyclic)
+
+        # lane of each Lanelet and s at its start
+        lanelet_of_point = np.repeat(np.arange(n_lanelets), counts)
+        t, lengths = arc_parameter(centerlines["xyz"], offsets, lanelet_of_point)
+        lane_of_order = np.repeat(np.arange(n_lanes), np.diff(self.lane_offsets))
+
+        start_s = np.zeros(len(lane_order))
+        if len(lane_order) > 0:
+            before = np.cumsum(lengths[lane_order]) - lengths[lane_order]
+            start_s = before - before[self.lane_offsets[:-1]][lane_of_order]
+
+        self.lane_of = np.full(n_lanelets, -1, dtype=np.int64)
+        self.lane_of[lane_order] = lane_of_order
+        self.start_s = np.zeros(n_lanelets)
+        self.start_s[lane_order] = start_s
+
+        self.lane_ids = ids[lane_order[self.lane_offsets[:-1]]] if n_lanes > 0 else np.zeros(0, dtype=np.int64)
+        self.lane_lengths = np.bincount(lane_of_order, weights=lengths[lane_order], minlength=n_lanes)
+        self.lane_sorted_order = np.argsort(self.lane_ids, kind="stable")
+
+        # cumulative s of every centerline point
+        self.offsets = offsets
+        self.xy = xy
+        self.point_s = self.start_s[lanelet_of_point] + t * lengths[lanelet_of_point]
+
+        # centerline points in lane order, with the lanes one meter apart on a common axis u
+        point_counts = counts[lane_order]
+        local = np.arange(point_counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(point_counts) - point_counts, point_counts)
+        order = np.repeat(offsets[:-1][lane_order], point_counts) + local
+        self.lane_point_offsets = np.zeros(n_lanes + 1, dtype=np.int64)
+        self.lane_point_offsets[1:] = np.cumsum(np.bincount(lane_of_order, weights=point_counts, minlength=n_lanes)).astype(np.int64)
+        self.lane_base = np.concatenate(([0.0], np.cumsum(self.lane_lengths + 1.0)))[:-1]
+        self.lane_xy = xy[order]
+        self.lane_u = self.lane_base[np.repeat(lane_of_order, point_counts)] + self.point_s[order]
+
+
+    # Returns the centerline index of Lanelet IDs, -1 if unknown
+    def index_of(self, ids):
+
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(self.sorted_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+
+        slot = np.minimum(np.searchsorted(self.sorted_ids, ids), len(self.sorted_ids) - 1)
+        return np.where(self.sorted_ids[slot] == ids, self.sorted_order[slot], -1)
+
+
+    # Returns the lane index of lane IDs, -1 if unknown
+    def lane_index_of(self, lane_ids):
+
+        lane_ids = np.asarray(lane_ids, dtype=np.int64).reshape(-1)
+        if len(self.lane_ids) == 0:
+            return np.full(len(lane_ids), -1, dtype=np.int64)
+
+        sorted_ids = self.lane_ids[self.lane_sorted_order]
+        slot = np.minimum(np.searchsorted(sorted_ids, lane_ids), len(sorted_ids) - 1)
+        return np.where(sorted_ids[slot] == lane_ids, self.lane_sorted_order[slot], -1)
+
+
+    # Converts points (x, y) to Frenet coordinates along the lanes
+    # @param xy: points (ndarray[N, 2])
+    # @param lanelet_ids: Lanelet of each point, e.g. of the map matching (ndarray[N], -1 if none)
+    # @return: dict with "lane_ids" (ID of the first Lanelet of the lane, -1 if none), "s" and "d"
+    #          (ndarray[N], NaN if the point is not over a Lanelet)
+    def xy_to_sd(self, xy, lanelet_ids):
+
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        index = self.index_of(lanelet_ids)
+        valid = index >= 0
+        valid[valid] = self.lane_of[index[valid]] >= 0
+
+        # pairs (point, segment of the centerline of its Lanelet)
+        points = np.nonzero(valid)[0]
+        n_segments = np.diff(self.offsets)[index[points]] - 1
+        pair_point = np.repeat(points, n_segments)
+        local = np.arange(n_segments.sum(), dtype=np.int64) - np.repeat(np.cumsum(n_segments) - n_segments, n_segments)
+        segment = np.repeat(self.offsets[:-1][index[points]], n_segments) + local
+
+        a = self.xy[segment]
+        ab = self.xy[segment + 1] - a
+        ap = xy[pair_point] - a
+        length2 = np.einsum("ij,ij->i", ab, ab)
+        t = np.clip(np.einsum("ij,ij->i", ap, ab) / np.where(length2 > 0.0, length2, 1.0), 0.0, 1.0)
+        offset = ap - t[:, None] * ab
+        distance2 = np.einsum("ij,ij->i", offset, offset)
+
+        # the nearest segment of each point
+        order = np.lexsort((distance2, pair_point))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pair_point[order][1:] != pair_point[order][:-1]
+        best = order[first]
+
+        s = np.full(len(xy), np.nan)
+        d = np.full(len(xy), np.nan)
+        lane_ids = np.full(len(xy), -1, dtype=np.int64)
+
+        p = pair_point[best]
+        s[p] = self.point_s[segment[best]] + t[best] * np.sqrt(length2[best])
+        side = np.sign(ab[best, 0] * ap[best, 1] - ab[best, 1] * ap[best, 0])
+        d[p] = np.where(side < 0.0, -1.0, 1.0) * np.sqrt(distance2[best])
+        lane_ids[p] = self.lane_ids[self.lane_of[index[p]]]
+
+        return {"lane_ids": lane_ids, "s": s, "d": d}
+
+
+    # Converts Frenet coordinates along the lanes to points (x, y)
+    # On a closed lane s is taken modulo its length, beyond the ends of an open lane
+    # the first / last segment is extended.
+    # @param lane_ids: IDs of the lanes (ndarray[N])
+    # @param s: arc length along the lane (ndarray[N])
+    # @param d: lateral offset, positive to the left (ndarray[N])
+    # @return: points (ndarray[N, 2]), NaN for unknown lanes
+    def sd_to_xy(self, lane_ids, s, d):
+
+        lane = self.lane_index_of(lane_ids)
+        s = np.asarray(s, dtype=np.float64).reshape(-1)
+        d = np.broadcast_to(np.asarray(d, dtype=np.float64), s.shape)
+        xy = np.full((len(lane), 2), np.nan)
+
+        valid = np.nonzero(lane >= 0)[0]
+        lane = lane[valid]
+        s = s[valid]
+        s = np.where(self.cyclic[lane], np.mod(s, np.where(self.lane_lengths[lane] > 0.0, self.lane_lengths[lane], 1.0)), s)
+
+        # binary search of the segment, at most the last segment of the lane
+        u = self.lane_base[lane] + s
+        k = np.searchsorted(self.lane_u, u, side="right") - 1
+        k = np.clip(k, self.lane_point_offsets[lane], self.lane_point_offsets[lane + 1] - 2)
+
+        a = self.lane_xy[k]
+        ab = self.lane_xy[k + 1] - a
+        length = self.lane_u[k + 1] - self.lane_u[k]
+        t = (u - self.lane_u[k]) / np.where(length > 0.0, length, 1.0)
+
+        norm = np.linalg.norm(ab, axis=1)
+        normal = np.stack((-ab[:, 1], ab[:, 0]), axis=1) / np.where(norm > 0.0, norm, 1.0)[:, None]
+        xy[valid] = a + t[:, None] * ab + d[valid][:, None] * normal
+
+        return xy
@@ -0,0 +1,578 @@
+#!/usr/bin/env python
+
+import math
+import numpy as np
+
+# An array-backed spatial index of the Lanelet polygons of a Lanelet2 map.
+#
+# The polygons are stored packed (CSR style): the vertices of lanelet k are
+# poly_xy[poly_offsets[k]:poly_offsets[k+1]]. Each lanelet is registered in
+# all cells of a uniform grid covered by its bounding box. A query looks up
+# the candidates of the cell of each point and runs a vectorized
+# point-in-polygon (even-odd) test, so every point is matched to a lanelet
+# that really contains it and not only to the nearest one.
+
+# Arrays of the grid (see to_arrays()), besides the polygons
+GRID_ARRAYS = ("bbox_min", "bbox_max", "next_vertex", "cell_keys", "cell_offsets", "cell_lanelets")
+
+class LaneletGridIndex:
+    def __init__(self, lanelet_ids, poly_xy, poly_offsets, cell_size = None, tables = None):
+
+        # ID of the lanelet k (int64)
+        self.lanelet_ids = np.asarray(lanelet_ids, dtype=np.int64)
+
+        # packed polygon vertices (float64, [M, 2]) and offsets ([L + 1])
+        self.poly_xy = np.asarray(poly_xy, dtype=np.float64).reshape(-1, 2)
+        self.poly_offsets = np.asarray(poly_offsets, dtype=np.int64)
+
+        n_lanelets = len(self.lanelet_ids)
+
+        # grid of to_arrays(), e.g. of a snapshot: used as is
+        if tables != None:
+            for name in GRID_ARRAYS:
+                setattr(self, name, tables["grid_" + name])
+            self.cell_size = float(tables["grid_cell_size"][0])
+            self.origin = np.asarray(tables["grid_origin"], dtype=np.float64)
+            self.n_rows = int(tables["grid_n_rows"][0])
+            return
+
+        # Bounding boxes of the polygons
+        if n_lanelets > 0:
+            starts = self.poly_offsets[:-1]
+            self.bbox_min = np.minimum.reduceat(self.poly_xy, starts, axis=0)
+            self.bbox_max = np.maximum.reduceat(self.poly_xy, starts, axis=0)
+        else:
+            self.bbox_min = np.zeros((0, 2))
+            self.bbox_max = np.zeros((0, 2))
+
+        # End point of each edge: the next vertex of the same polygon (closed ring)
+        self.next_vertex = np.arange(1, len(self.poly_xy) + 1, dtype=np.int64)
+        if n_lanelets > 0:
+            self.next_vertex[self.poly_offsets[1:] - 1] = self.poly_offsets[:-1]
+
+        # Grid cell size: the median extent of a lanelet
+        if cell_size == None:
+            if n_lanelets > 0:
+                cell_size = float(np.median(np.max(self.bbox_max - self.bbox_min, axis=1)))
+            if not cell_size or cell_size <= 0.0:
+                cell_size = 1.0
+        self.cell_size = float(cell_size)
+
+        if n_lanelets > 0:
+            self.origin = self.bbox_min.min(axis=0)
+        else:
+            self.origin = np.zeros(2)
+
+        # Cells covered by each bounding box
+        cell_min = self.cell_of(self.bbox_min)
+        cell_max = self.cell_of(self.bbox_max)
+        self.n_rows = int(cell_max[:, 1].max()) + 1 if n_lanelets > 0 else 1
+
+        span = cell_max - cell_min + 1
+        n_cells = span[:, 0] * span[:, 1]
+        owner = np.repeat(np.arange(n_lanelets, dtype=np.int64), n_cells)
+        local = np.arange(n_cells.sum(), dtype=np.int64) - np.repeat(np.cumsum(n_cells) - n_cells, n_cells)
+        cx = cell_min[owner, 0] + local // span[owner, 1]
+        cy = cell_min[owner, 1] + local % span[owner, 1]
+
+        # CSR grid: cell key -> lanelets
+        keys = cx * self.n_rows + cy
+        order = np.argsort(keys, kind="stable")
+        self.cell_keys, first = np.unique(keys[order], return_index=True)
+        self.cell_offsets = np.append(first, len(order)).astype(np.int64)
+        self.cell_lanelets = owner[order]
+
+
+    # Returns the grid as dict of arrays (e.g. for a snapshot)
+    def to_arrays(self):
+
+        arrays = {"grid_" + name: getattr(self, name) for name in GRID_ARRAYS}
+        arrays.update({"grid_cell_size": np.array([self.cell_size]), "grid_origin": self.origin,
+                       "grid_n_rows": np.array([self.n_rows], dtype=np.int64)})
+        return arrays
+
+
+    # Creates the index from the polygons and the dict of arrays of to_arrays()
+    @staticmethod
+    def from_arrays(lanelet_ids, poly_xy, poly_offsets, arrays):
+        return LaneletGridIndex(lanelet_ids, poly_xy, poly_offsets, tables=arrays)
+
+
+    # Returns a new index without some lanelets and with added polygons, at the same cell size
+    # The polygons of the other lanelets are taken over as arrays.
+    # @param remove_ids: IDs of the removed (or changed) lanelets
+    # @param lanelet_ids, poly_xy, poly_offsets: the added (or changed) lanelets, packed as in the constructor
+    # @return: a LaneletGridIndex
+    def updated(self, remove_ids, lanelet_ids, poly_xy, poly_offsets):
+
+        keep = ~np.isin(self.lanelet_ids, np.asarray(remove_ids, dtype=np.int64))
+        counts = np.diff(self.poly_offsets)
+        new_counts = np.diff(np.asarray(poly_offsets, dtype=np.int64))
+
+        offsets = np.zeros(keep.sum() + len(new_counts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.concatenate((counts[keep], new_counts)))
+
+        return LaneletGridIndex(np.concatenate((self.lanelet_ids[keep], np.asarray(lanelet_ids, dtype=np.int64))),
+                                np.concatenate((self.poly_xy[np.repeat(keep, counts)],
+                                                np.asarray(poly_xy, dtype=np.float64).reshape(-1, 2))),
+                                offsets, self.cell_size)
+
+
+    # Returns the integer grid cell (cx, cy) of points
+    # @param xy: points (ndarray[N, 2])
+    # @return: cells (ndarray[N, 2], int64)
+    def cell_of(self, xy):
+        return np.floor((xy - self.origin) / self.cell_size).astype(np.int64)
+
+
+    # Returns the candidate pairs (point, lanelet) whose bounding box contains the point
+    # @param xy: points (ndarray[N, 2])
+    # @return: (point indices, lanelet indices)
+    def candidates(self, xy):
+
+        cells = self.cell_of(xy)
+        keys = cells[:, 0] * self.n_rows + cells[:, 1]
+
+        if len(self.cell_keys) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        slot = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        found = (self.cell_keys[slot] == keys) & (cells[:, 1] >= 0) & (cells[:, 1] < self.n_rows)
+
+        start = self.cell_offsets[slot]
+        n = np.where(found, self.cell_offsets[slot + 1] - start, 0)
+
+        pair_point = np.repeat(np.arange(len(xy), dtype=np.int64), n)
+        local = np.arange(n.sum(), dtype=np.int64) - np.repeat(np.cumsum(n) - n, n)
+        pair_lanelet = self.cell_lanelets[np.repeat(start, n) + local]
+
+        # Bounding box filter
+        p = xy[pair_point]
+        inside_bbox = np.all((p >= self.bbox_min[pair_lanelet]) & (p <= self.bbox_max[pair_lanelet]), axis=1)
+
+        return pair_point[inside_bbox], pair_lanelet[inside_bbox]
+
+
+    # Even-odd point-in-polygon test for pairs (point, lanelet)
+    # @param xy: points (ndarray[N, 2])
+    # @param pair_point: point index of each pair
+    # @param pair_lanelet: lanelet index of each pair
+    # @return: bool array, True if the point lies inside the lanelet polygon
+    def contains(self, xy, pair_point, pair_lanelet):
+
+        n_edges = self.poly_offsets[pair_lanelet + 1] - self.poly_offsets[pair_lanelet]
+        pair = np.repeat(np.arange(len(pair_point), dtype=np.int64), n_edges)
+        local = np.arange(n_edges.sum(), dtype=np.int64) - np.repeat(np.cumsum(n_edges) - n_edges, n_edges)
+        edge = self.poly_offsets[pair_lanelet][pair] + local
+
+        px = xy[pair_point[pair], 0]
+        py = xy[pair_point[pair], 1]
+        x0 = self.poly_xy[edge, 0]
+        y0 = self.poly_xy[edge, 1]
+        x1 = self.poly_xy[self.next_vertex[edge], 0]
+        y1 = self.poly_xy[self.next_vertex[edge], 1]
+
+        straddles = (y0 > py) != (y1 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        crossing = straddles & (px < x_cross)
+
+        n_crossings = np.bincount(pair, weights=crossing, minlength=len(pair_point))
+        return (n_crossings.astype(np.int64) % 2) == 1
+
+
+    # Returns for every point the index of a lanelet containing it
+    # @param xy: points (ndarray[N, 2])
+    # @return: lanelet indices (ndarray[N], int64), -1 if the point is not over a lanelet
+    def match_index(self, xy, chunk_size = 65536):
+
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        result = np.full(len(xy), -1, dtype=np.int64)
+
+        for begin in range(0, len(xy), chunk_size):
+            chunk = xy[begin:begin + chunk_size]
+            pair_point, pair_lanelet = self.candidates(chunk)
+            hit = self.contains(chunk, pair_point, pair_lanelet)
+
+            # first containing candidate wins: assign in reverse order
+            pair_point = pair_point[hit][::-1]
+            pair_lanelet = pair_lanelet[hit][::-1]
+            result[begin + pair_point] = pair_lanelet
+
+        return result
+
+
+    # Returns the ID of a lanelet containing a single point
+    # Same result as match() for one point, without the overhead of the batch arrays:
+    # only the candidates of the one cell are tested.
+    # @param x, y: the point
+    # @return: lanelet ID (int), -1 if the point is not over a lanelet
+    def match_point(self, x: float, y: float):
+
+        cx = math.floor((x - float(self.origin[0])) / self.cell_size)
+        cy = math.floor((y - float(self.origin[1])) / self.cell_size)
+        if len(self.cell_keys) == 0 or cy < 0 or cy >= self.n_rows:
+            return -1
+
+        key = cx * self.n_rows + cy
+        slot = int(np.searchsorted(self.cell_keys, key))
+        if slot >= len(self.cell_keys) or int(self.cell_keys[slot]) != key:
+            return -1
+
+        for k in self.cell_lanelets[self.cell_offsets[slot]:self.cell_offsets[slot + 1]].tolist():
+            x_min, y_min = self.bbox_min[k].tolist()
+            x_max, y_max = self.bbox_max[k].tolist()
+            if x < x_min or x > x_max or y < y_min or y > y_max:
+                continue
+
+            # even-odd test as in contains()
+            ring = self.poly_xy[self.poly_offsets[k]:self.poly_offsets[k + 1]]
+            x0 = ring[:, 0]
+            y0 = ring[:, 1]
+            x1 = np.roll(x0, -1)
+            y1 = np.roll(y0, -1)
+            straddles = (y0 > y) != (y1 > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+            if np.count_nonzero(straddles & (x < x_cross)) % 2 == 1:
+                return int(self.lanelet_ids[k])
+
+        return -1
+
+
+    # Returns for every point the ID of a lanelet containing it
+    # @param xy: points (ndarray[N, 2])
+    # @return: lanelet IDs (ndarray[N], int64), -1 if the point is not over a lanelet
+    def match(self, xy):
+
+        index = self.match_index(xy)
+        if len(self.lanelet_ids) == 0:
+            return index
+        return np.where(index >= 0, self.lanelet_ids[np.maximum(index, 0)], -1)
+
+
+# Columns of a lanelet row of the LaneletTopology
+TOPOLOGY_COLUMNS = ("ids", "left_line", "right_line", "left_first", "left_last",
+                    "right_first", "right_last", "passable", "one_way")
+
+
+# An array-backed neighbour table of the Lanelets of a Lanelet2 map.
+#
+# Each lanelet k is a row: its ID, the IDs of its bounds and the IDs of the
+# first and last point of both bounds. From the rows the table derives
+#   left[k], right[k]   the other lanelet sharing the left / right bound, else -1;
+#                       of several, the neighbour of the routing graph: the same
+#                       direction across the bound (left bound of k = right bound of
+#                       the other), then the opposite direction (left bound of k =
+#                       inverted left bound of the other), then the lowest ID
+#   following           CSR: lanelets whose bounds start where lanelet k ends
+#   preceding           CSR: lanelets whose bounds end where lanelet k starts
+# Only lanelets passable by the traffic rules are connected; lanelets which are
+# not one way are also connected in the inverted direction, like the routing
+# graph. Added rows are merged and the table is rebuilt on the next query.
+
+class LaneletTopology:
+    def __init__(self, columns = None, tables = None):
+
+        # rows of the lanelets (see TOPOLOGY_COLUMNS), rows added since the last update()
+        self.columns = {name: np.zeros(0, dtype=np.int64) for name in TOPOLOGY_COLUMNS}
+        if columns != None:
+            self.columns.update({name: np.asarray(columns[name], dtype=np.int64) for name in TOPOLOGY_COLUMNS})
+        self.pending = []
+
+        # rows have been added or removed since the last build() ( e.g. with remove() )
+        self.changed = False
+
+        # ID -> row k ( later e.g. with add() or get_index() )
+        self.index = None
+
+        # incremented with every build() of the table, e.g. to invalidate caches
+        self.version = 0
+
+        # neighbour table
+        if tables != None:
+            self.left = np.asarray(tables["left"], dtype=np.int64)
+            self.right = np.asarray(tables["right"], dtype=np.int64)
+            self.following_offsets = np.asarray(tables["following_offsets"], dtype=np.int64)
+            self.following = np.asarray(tables["following"], dtype=np.int64)
+            self.preceding_offsets = np.asarray(tables["preceding_offsets"], dtype=np.int64)
+            self.preceding = np.asarray(tables["preceding"], dtype=np.int64)
+            self.sorted_order = np.asarray(tables["sorted_order"], dtype=np.int64)
+            self.sorted_ids = np.asarray(tables["sorted_ids"], dtype=np.int64)
+        else:
+            self.build()
+
+
+    # Returns the row of a lanelet
+    # @param lane: a Lanelet
+    # @param traffic_rules: lanelet2 traffic rules
+    # @return: tuple of the TOPOLOGY_COLUMNS
+    @staticmethod
+    def row_of(lane, traffic_rules):
+
+        left = lane.leftBound
+        right = lane.rightBound
+
+        return (lane.id, left.id, right.id, left[0].id, left[len(left) - 1].id,
+                right[0].id, right[len(right) - 1].id,
+                int(traffic_rules.canPass(lane)), int(traffic_rules.isOneWay(lane)))
+
+
+    # Adds a lanelet row
+    # @param row: tuple of the TOPOLOGY_COLUMNS (see row_of())
+    def add(self, row):
+
+        self.get_index()[row[0]] = len(self.columns["ids"]) + len(self.pending)
+        self.pending.append(row)
+
+
+    # Removes the rows of lanelets, the table is rebuilt on the next query
+    # @param ids: lanelet IDs
+    def remove(self, ids):
+
+        self.merge()
+        keep = ~np.isin(self.columns["ids"], np.asarray(list(ids), dtype=np.int64))
+        if keep.all():
+            return
+
+        self.columns = {name: column[keep] for name, column in self.columns.items()}
+        self.index = None
+        self.changed = True
+
+
+    # Merges the added rows into the columns
+    def merge(self):
+
+        if len(self.pending) > 0:
+            rows = np.array(self.pending, dtype=np.int64).reshape(-1, len(TOPOLOGY_COLUMNS))
+            for j, name in enumerate(TOPOLOGY_COLUMNS):
+                self.columns[name] = np.concatenate((self.columns[name], rows[:, j]))
+            self.pending = []
+            self.changed = True
+
+
+    # Merges the added rows and rebuilds the table, if rows have been added or removed
+    def update(self):
+
+        self.merge()
+        if self.changed:
+            self.build()
+
+
+    # Builds the neighbour table from the rows
+    def build(self):
+
+        c = self.columns
+        n_lanelets = len(c["ids"])
+        self.version += 1
+        self.changed = False
+        self.sorted_order = np.argsort(c["ids"], kind="stable")
+        self.sorted_ids = c["ids"][self.sorted_order]
+
+        # left / right: the other user of the bound, of several the best ranked (see above)
+        lines = np.concatenate((c["left_line"], c["right_line"]))
+        first = np.concatenate((c["left_first"], c["right_first"]))
+        last = np.concatenate((c["left_last"], c["right_last"]))
+        side = np.repeat(np.arange(2, dtype=np.int64), n_lanelets)
+        owner = np.tile(np.arange(n_lanelets, dtype=np.int64), 2)
+        order = np.argsort(lines, kind="stable")
+        sorted_lines = lines[order]
+        group_start = np.searchsorted(sorted_lines, sorted_lines, side="left")
+        size = np.searchsorted(sorted_lines, sorted_lines, side="right") - group_start
+
+        # all pairs of users of a bound
+        local = np.arange(size.sum(), dtype=np.int64) - np.repeat(np.cumsum(size) - size, size)
+        use = np.repeat(order, size)
+        other = order[np.repeat(group_start, size) + local]
+        keep = owner[use] != owner[other]
+        use = use[keep]
+        other = other[keep]
+
+        same_way = (first[use] == first[other]) & (last[use] == last[other])
+        opposite_way = (first[use] == last[other]) & (last[use] == first[other])
+        rank = np.where((side[use] != side[other]) & same_way, 0,
+                        np.where((side[use] == side[other]) & opposite_way, 1, 2))
+        best = np.lexsort((c["ids"][owner[other]], rank, use))
+        use = use[best]
+        is_first = np.ones(len(use), dtype=bool)
+        is_first[1:] = use[1:] != use[:-1]
+
+        neighbour = np.full(2 * n_lanelets, -1, dtype=np.int64)
+        neighbour[use[is_first]] = owner[other[best][is_first]]
+        self.left = neighbour[:n_lanelets]
+        self.right = neighbour[n_lanelets:]
+
+        # directed rows: every passable lanelet, inverted also if it is not one way
+        forward = np.nonzero(c["passable"] != 0)[0]
+        inverted = np.nonzero((c["passable"] != 0) & (c["one_way"] == 0))[0]
+        dir_owner = np.concatenate((forward, inverted))
+        start = np.concatenate((np.stack((c["left_first"][forward], c["right_first"][forward]), axis=1),
+                                np.stack((c["right_last"][inverted], c["left_last"][inverted]), axis=1)))
+        end = np.concatenate((np.stack((c["left_last"][forward], c["right_last"][forward]), axis=1),
+                              np.stack((c["right_first"][inverted], c["left_first"][inverted]), axis=1)))
+
+        # following: the start of B equals the end of A
+        ends = np.concatenate((start, end)).reshape(-1, 2)
+        order = np.lexsort((ends[:, 1], ends[:, 0]))
+        new_end = np.ones(len(order), dtype=bool)
+        new_end[1:] = np.any(ends[order][1:] != ends[order][:-1], axis=1)
+        codes = np.empty(len(order), dtype=np.int64)
+        codes[order] = np.cumsum(new_end) - 1
+        start_code = codes[:len(dir_owner)]
+        end_code = codes[len(dir_owner):]
+
+        by_start = np.argsort(start_code, kind="stable")
+        begin = np.searchsorted(start_code[by_start], end_code, side="left")
+        count = np.searchsorted(start_code[by_start], end_code, side="right") - begin
+        pair_a = np.repeat(dir_owner, count)
+        local = np.arange(count.sum(), dtype=np.int64) - np.repeat(np.cumsum(count) - count, count)
+        pair_b = dir_owner[by_start[np.repeat(begin, count) + local]]
+
+        keep = pair_a != pair_b
+        pairs = np.unique(pair_a[keep] * max(n_lanelets, 1) + pair_b[keep])
+        pair_a = pairs // max(n_lanelets, 1)
+        pair_b = pairs % max(n_lanelets, 1)
+
+        self.following_offsets = np.zeros(n_lanelets + 1, dtype=np.int64)
+        self.following_offsets[1:] = np.cumsum(np.bincount(pair_a, minlength=n_lanelets))
+        self.following = pair_b
+
+        by_b = np.argsort(pair_b, kind="stable")
+        self.preceding_offsets = np.zeros(n_lanelets + 1, dtype=np.int64)
+        self.preceding_offsets[1:] = np.cumsum(np.bincount(pair_b, minlength=n_lanelets))
+        self.preceding = pair_a[by_b]
+
+
+    # Returns the tables as dict of arrays (e.g. for a snapshot)
+    def to_arrays(self):
+
+        self.update()
+        arrays = {"topology_" + name: self.columns[name] for name in TOPOLOGY_COLUMNS}
+        arrays.update({"left": self.left, "right": self.right,
+                       "following_offsets": self.following_offsets, "following": self.following,
+                       "preceding_offsets": self.preceding_offsets, "preceding": self.preceding,
+                       "sorted_order": self.sorted_order, "sorted_ids": self.sorted_ids})
+        return arrays
+
+
+    # Creates the table from the dict of arrays of to_arrays()
+    @staticmethod
+    def from_arrays(arrays):
+
+        columns = {name: arrays["topology_" + name] for name in TOPOLOGY_COLUMNS}
+        return LaneletTopology(columns, arrays)
+
+
+    # Returns the row of a lanelet ID, -1 if unknown
+    # A table of from_arrays() is searched in its sorted IDs until a row is added.
+    def row(self, ID: int):
+
+        self.update()
+        if self.index == None:
+            slot = int(np.searchsorted(self.sorted_ids, ID))
+            if slot < len(self.sorted_ids) and self.sorted_ids[slot] == ID:
+                return int(self.sorted_order[slot])
+            return -1
+
+        return self.index.get(ID, -1)
+
+
+    # Returns the dict ID -> row k, builds it on the first call
+    def get_index(self):
+
+        if self.index == None:
+            self.index = {ID: k for k, ID in enumerate(self.columns["ids"].tolist())}
+        return self.index
+
+
+    # Returns the rows of an array of lanelet IDs, -1 if unknown
+    def rows(self, ids):
+
+        self.update()
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        sorted_ids = self.sorted_ids
+        if len(sorted_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+
+        slot = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return np.where(sorted_ids[slot] == ids, self.sorted_order[slot], -1)
+
+
+    # Returns the ID of the left / right lanelet, else None
+    # @param ID: Id of a lanelet (int)
+    def left_id(self, ID: int):
+        k = self.row(ID)
+        return int(self.columns["ids"][self.left[k]]) if k >= 0 and self.left[k] >= 0 else None
+
+    def right_id(self, ID: int):
+        k = self.row(ID)
+        return int(self.columns["ids"][self.right[k]]) if k >= 0 and self.right[k] >= 0 else None
+
+
+    # Returns the IDs of the following / preceding lanelets
+    # @param ID: Id of a lanelet (int)
+    # @return: list of lanelet IDs
+    def following_ids(self, ID: int):
+        k = self.row(ID)
+        if k < 0:
+            return []
+        return self.columns["ids"][self.following[self.following_offsets[k]:self.following_offsets[k + 1]]].tolist()
+
+    def preceding_ids(self, ID: int):
+        k = self.row(ID)
+        if k < 0:
+            return []
+        return self.columns["ids"][self.preceding[self.preceding_offsets[k]:self.preceding_offsets[k + 1]]].tolist()
+
+
+    # Returns the chain of first successors starting at a row
+    # @param k: row of the start lanelet
+    # @param accept: function(k, n) -> True to append row k as n-th element and go on
+    # @return: list of rows
+    def chain(self, k: int, accept):
+
+        self.update()
+        n_lanelets = len(self.columns["ids"])
+        following_offsets = self.following_offsets
+        following = self.following
+
+        rows = []
+        while k >= 0 and len(rows) < n_lanelets and accept(k, len(rows)):
+            rows.append(k)
+            begin = following_offsets[k]
+            k = int(following[begin]) if following_offsets[k + 1] > begin else -1
+
+        return rows
+
+
+    # Returns the neighbours of an array of lanelet IDs
+    # @param ids: lanelet IDs (ndarray[N])
+    # @return: dict with "left", "right" (ndarray[N], -1 if none) and "following",
+    #          "preceding" as CSR (offsets ndarray[N + 1], IDs)
+    def neighbours(self, ids):
+
+        k = self.rows(ids)
+        ids_of = self.columns["ids"]
+
+        # an unknown lanelet has no neighbours
+        if len(ids_of) == 0:
+            k = np.full(len(k), -1, dtype=np.int64)
+        valid = k >= 0
+        k_safe = np.maximum(k, 0)
+
+        result = {}
+        for name, table in (("left", self.left), ("right", self.right)):
+            j = np.where(valid, table[k_safe] if len(table) > 0 else -1, -1)
+            result[name] = np.where(j >= 0, np.append(ids_of, -1)[j], -1)
+
+        for name, offsets, targets in (("following", self.following_offsets, self.following),
+                                       ("preceding", self.preceding_offsets, self.preceding)):
+            offsets = np.append(offsets, offsets[-1])
+            begin = np.where(valid, offsets[k_safe], 0)
+            count = np.where(valid, offsets[k_safe + 1] - offsets[k_safe], 0)
+            local = np.arange(count.sum(), dtype=np.int64) - np.repeat(np.cumsum(count) - count, count)
+            result_offsets = np.zeros(len(k) + 1, dtype=np.int64)
+            result_offsets[1:] = np.cumsum(count)
+            result[name] = (result_offsets, ids_of[targets[np.repeat(begin, count) + local]])
+
+        return result
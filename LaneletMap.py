@@ -1,11 +1,47 @@
 #!/usr/bin/env python
 
+import asyncio
+import contextlib
+import gzip
+import math
 import os
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import lanelet2
 import lanelet2.core as lncore
 from lanelet2.core import (BasicPoint2d, GPSPoint, LineString3d, Point3d, getId, Lanelet)
 from lanelet2.geometry import (distance, intersects2d, boundingBox2d, to2D)
-import matplotlib.pyplot as plt
+import numpy as np
+from LaneletCenterline import compute_centerlines
+from LaneletFrenet import LaneletFrenet
+from LaneletIndex import LaneletGridIndex, LaneletTopology
+from LaneletProjection import UtmBatchProjector
+from LaneletSnapshot import MapSnapshot, pack_geometry, snapshot_key
+from LaneletStats import LaneletStats, PhaseTimer
+from LaneletTiles import LaneletTiles, write_tiles
+from LaneletValidation import DUPLICATE_TOLERANCE, GAP_TOLERANCE, validate_snapshot
+from LaneletWriter import write_osm_stream
+
+# Attributes of the new Lanelets
+LANELET_ATTRIBUTES = {"location": "nonurban", "one_way": "yes", "region": "de", "subtype": "highway"}
+
+# Default tolerance in meter of the snapping and of dedupe_points()
+SNAP_TOLERANCE = 0.01
+
+
+# Reads a CSV file with K boundaries of (x,y)-points per row: x0,y0,x1,y1,...
+# @param csv_file: path of the CSV file (str)
+# @return: the boundaries (ndarray[K, N, 2])
+def read_boundaries_csv(csv_file: str):
+
+    data = np.loadtxt(csv_file, delimiter=",", ndmin=2)
+    
+    return data.reshape(len(data), -1, 2).transpose(1, 0, 2)
+
 
 # A class that allows you to handle a Lanelet2 map with Python.
 
@@ -14,9 +50,78 @@ import matplotlib.pyplot as plt
 # b) LaneletMap(latitude)
 # c) LaneletMap(latitude, longitude)
 # d) LaneletMap(latitude, longitude, osm_map_file)
+#
+# With use_snapshot = True the map is started from a binary snapshot
+# <osm_map_file>.snapshot, which is (re)written whenever the OSM file or the
+# origin has changed. Lanelets, LineStrings and Points are then created on
+# demand and the complete Lanelet2 map only on the first access of lmap, e.g.
+# by the first routing query: the routing graph is not part of the snapshot.
+# A map with areas, polygons or regulatory elements is never written as
+# snapshot (or tiles) and always starts from the OSM file.
+#
+# With tile_size = <meter> the map is split once into square tiles
+# (<osm_map_file>.tiles) and only the tiles around the position are opened: at
+# the start around the origin (lat, lon), later around set_position(x, y). At
+# most max_tiles tiles stay open. Lookups by ID, neighbours, corridors and map
+# matching open further tiles on demand, so queries across tile borders work as
+# on the whole map. Operations on the whole map would load all tiles: lmap,
+# routing, writing, validation, the snapshot, the geometry arrays, centerlines,
+# Frenet coordinates and draw_map() raise a RuntimeError on a tiled map (see
+# check_whole_map()). A tiled map cannot be changed (update_map(),
+# dedupe_points(), set_Centerlines()).
+#
+# A map published once with publish_shared_map() (shared memory) or
+# export_snapshot() (memory-mapped file) is attached read-only by other processes
+# with LaneletMap(shared_map=<name or path>): lookups by ID, neighbours and xy map
+# matching read the shared arrays without a copy of the map per process. An
+# attached map has no Lanelet2 map: lmap and graph (routing, writing) raise a
+# RuntimeError instead of copying the whole map into the process.
+#
+# With background = True the constructor returns at once and the map is loaded
+# in a background thread: wait_ready() or "await lanelet_map.ready()" before the
+# first query. The routing graph (graph) is built on its first use: its
+# construction holds the GIL, so in a background thread it would block the caller.
+#
+# With enable_snapping(tolerance) add_and_get_Point() and build_corridor() return
+# an existing Point within tolerance meter instead of a new one (grid hash of
+# the Points), and an existing LineString through the same Points instead of a
+# new one, so adjacent Lanelets share their bound; dedupe_points() merges such
+# Points and LineStrings of a loaded map.
+#
+# With collect_stats = True (or later enable_stats()) the calls of the methods of
+# the API (STATS_API_METHODS), the load / write phases and the cache hits are
+# recorded, see stats().
+
+# Methods whose calls are recorded by the statistics. Internal helpers (index,
+# topology, snapping, ...) are not wrapped: they run in the loops of bulk operations.
+STATS_API_METHODS = (
+    # loading, building and writing
+    "load_delta", "update_map", "dedupe_points", "add_and_get_Point", "add_and_get_lineString",
+    "add_Lanelet", "add_Lanelet_with_Centerline", "build_corridor", "write_LaneletMap_to_file",
+    "stream_LaneletMap_to_file", "publish_shared_map", "export_snapshot", "validate", "draw_map",
+    # lookups and map matching
+    "get_Lanelet_with_Id", "get_Line_with_Id", "get_Point_with_Id", "point_ll_over_Lanelet",
+    "point_xy_over_Lanelet", "points_xy_over_Lanelets", "points_ll_over_Lanelets",
+    "project_ll_to_xy", "project_xy_to_ll", "set_position",
+    # neighbours and geometry
+    "get_leftBound_Lanelet", "get_rightBound_Lanelet", "get_following_Lanelet", "get_following_Lanelets",
+    "get_preceding_Lanelets", "get_neighbour_ids", "get_corridor_ahead", "get_LineString_arrays",
+    "get_geometry_arrays", "get_centerlines", "xy_to_sd", "sd_to_xy",
+    # routing
+    "get_route_of_Ids", "get_shortest_path", "get_cost_to_go", "get_reachable_set", "get_routes")
+
+# Context of a phase while the statistics are off
+NO_PHASE = contextlib.nullcontext()
 
 class LaneletMap:
-    def __init__(self, lat = 0.0, lon = 0.0, osm_map_file = "none"):
+    def __init__(self, lat = 0.0, lon = 0.0, osm_map_file = "none", use_snapshot = False, collect_stats = False,
+                 shared_map = None, tile_size = None, max_tiles = 64, background = False):
+        
+        # Statistics ( later e.g. with enable_stats() )
+        self.stats_recorder = None
+        self.stats_wrapped = []
+        if collect_stats:
+            self.enable_stats()
         
         # file name of the OSM map e.g. <name.osm>
         self.osm_map_file = osm_map_file
@@ -25,25 +130,207 @@ class LaneletMap:
         self.lat = lat
         self.lon = lon
         
-        # Lanelet2 map
+        # Binary snapshot of the map ( later e.g. with load_snapshot() ), attached read-only with shared_map
+        self.use_snapshot = use_snapshot
+        self.snapshot = None
+        self.shared_map = shared_map
+        
+        # Tiles of the map: edge length in meter and maximum number of open tiles ( later e.g. with load_tiles() )
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        
+        # Errors of loadRobust while parsing the OSM map ( later e.g. with load_osm_file_to_lanelet2() )
+        self.load_errors = None
+        
+        # Lanelet2 map, rebuilt from the ID index on the next access if lanelet2_map_changed ( e.g. after update_map() )
         self.lmap = None
+        self.lanelet2_map_changed = False
+        
+        # UTM projectors of the origin (lat, lon) ( later e.g. with get_projector() )
+        self.projector = None
+        self.batch_projector = None
+        self.projector_origin = None
         
-        # Routing graph ( later e.g. with set_graph() )
+        # Routing graph ( later e.g. on the first use of graph or with set_graph() )
         self.graph = None
         
-        if not self.osm_map_file == "none":
-            """ Initialize LaneletMap from a osm_map_file """
-            # Lanelet2 map
-            self.lmap = self.load_osm_file_to_lanelet2(self.osm_map_file, self.lat, self.lon)
+        # Traffic rules of the routing graph and the topology ( later e.g. with get_traffic_rules() )
+        self.traffic_rules = None
+        
+        # ID index: ID -> Lanelet / LineString / Point ( later e.g. with build_index() )
+        self.lanelet_index = {}
+        self.line_index = {}
+        self.point_index = {}
+        
+        # Reverse index of the Points: Point ID -> IDs of its LineStrings ( later e.g. with get_point_lines() )
+        self.point_lines = None
+        
+        # Spatial index of the Lanelet polygons ( later e.g. with get_spatial_index() )
+        self.spatial_index = None
+        
+        # Coordinates of all LineStrings and bounds of all Lanelets as arrays ( later e.g. with get_geometry_arrays() )
+        self.geometry_arrays = None
+        
+        # Centerlines of all Lanelets per spacing, of the geometry arrays centerline_geometry ( later e.g. with get_centerlines() )
+        self.centerline_cache = {}
+        self.centerline_geometry = None
         
-            # Routing graph
-            self.graph = self.get_graph()
+        # Frenet coordinates along the lanes ( later e.g. with get_frenet() )
+        self.frenet = None
+        
+        # Neighbour table: left, right, following and preceding Lanelets ( later e.g. with get_topology() )
+        self.topology = None
+        
+        # Snapping of new Points: tolerance and grid hash (cx, cy) -> Points,
+        # LineStrings by their Point IDs ( later e.g. with enable_snapping() )
+        self.snap_tolerance = None
+        self.point_grid = None
+        self.line_lookup = None
+        
+        # LRU cache of get_corridor_ahead() and the lengths of the Lanelets
+        self.corridor_cache = OrderedDict()
+        self.corridor_cache_size = 1024
+        self.corridor_cache_topology = None
+        self.lanelet_lengths = {}
+        
+        # LRU cache of the routes: (from ID, to ID) -> (path, cost), ("reachable", ID, cost) -> IDs
+        self.route_cache = OrderedDict()
+        self.route_cache_size = 65536
+        self.route_cache_topology = None
+        
+        if shared_map != None:
+            """ Initialize LaneletMap from a published snapshot """
+            self.snapshot = self.attach_shared_map(shared_map)
+            if self.snapshot != None:
+                self.lat, self.lon = self.snapshot.header["origin"]
+            else:
+                self.lmap = lncore.LaneletMap()
+        
+        elif not self.osm_map_file == "none":
+            """ Initialize LaneletMap from a osm_map_file """
+            if background:
+                self.load_future = Future()
+                threading.Thread(target=self.load_in_background, name="LaneletMap load", daemon=True).start()
+            else:
+                self.load_map()
             
         else:
             """ Initialize LaneletMap without a osm_map_file """
             # Lanelet2 map
             self.lmap = lncore.LaneletMap()
+        
+        # Loaded map ( later e.g. in the background with load_in_background() )
+        if not background or self.osm_map_file == "none" or shared_map != None:
+            self.load_future = Future()
+            self.load_future.set_result(self)
+
 
+    # Loads the osm_map_file: snapshot, tiles or the OSM file with its ID index and neighbour table
+    def load_map(self):
+    
+        # Up to date snapshot
+        if self.use_snapshot:
+            self.snapshot = self.load_snapshot(self.osm_map_file, self.lat, self.lon)
+        elif self.tile_size != None:
+            self.snapshot = self.load_tiles(self.osm_map_file, self.lat, self.lon)
+        
+        if self.snapshot == None:
+            # Lanelet2 map
+            self.lmap = self.load_osm_file_to_lanelet2(self.osm_map_file, self.lat, self.lon)
+            
+            # ID index
+            self.build_index()
+            
+            # Neighbour table
+            self.topology = self.get_topology()
+            
+            if self.use_snapshot:
+                self.write_snapshot(self.osm_map_file)
+            elif self.tile_size != None:
+                self.write_tiles(self.osm_map_file)
+    
+    
+    # Loads the map and reports it ready (background thread)
+    def load_in_background(self):
+    
+        # also exit() of a missing OSM file: raised by wait_ready() / ready() in the caller
+        try:
+            self.load_map()
+        except BaseException as err:
+            self.load_future.set_exception(err)
+            return
+        self.load_future.set_result(self)
+    
+    
+    # Waits until the map is loaded
+    # @param timeout: maximum seconds to wait (float), default no limit
+    # @return: True if the map is loaded, else False; raises the error of a failed load
+    def wait_ready(self, timeout = None):
+    
+        try:
+            self.load_future.result(timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+    
+    
+    # Returns True if the map is loaded
+    def is_ready(self):
+        return self.load_future.done()
+    
+    
+    # Waits in asyncio until the map is loaded: "await lanelet_map.ready()"
+    # @return: the LaneletMap
+    async def ready(self):
+        return await asyncio.wrap_future(self.load_future)
+    
+    
+    # Routing graph, built on the first use
+    @property
+    def graph(self):
+    
+        if self.routing_graph == None and (self.lanelet2_map != None or self.snapshot != None):
+            self.routing_graph = self.get_graph()
+        
+        return self.routing_graph
+    
+    
+    @graph.setter
+    def graph(self, graph):
+        self.routing_graph = graph
+
+
+
+    # Lanelet2 map. A map started from a snapshot is created on the first access,
+    # an attached shared map has none (RuntimeError): it would copy the whole map.
+    # A tiled map has none either (RuntimeError): it would load all tiles.
+    @property
+    def lmap(self):
+    
+        if self.lanelet2_map_changed:
+            self.rebuild_lanelet2_map()
+        
+        if self.lanelet2_map == None and self.snapshot != None:
+            self.check_whole_map("lmap")
+            if self.shared_map != None:
+                raise RuntimeError("the shared map %s is read-only and has no Lanelet2 map" % self.shared_map)
+            
+            with self.phase("materialize"):
+                self.lanelet2_map = self.snapshot.to_lanelet2()
+            
+            # the neighbour table of the snapshot is still valid
+            topology = self.snapshot.get_topology()
+            self.snapshot = None
+            self.build_index()
+            self.topology = topology
+            
+        return self.lanelet2_map
+    
+    
+    @lmap.setter
+    def lmap(self, lmap):
+        self.lanelet2_map = lmap
+        self.lanelet2_map_changed = False
 
 
     # Add and get a new Point for the Lanelet2 Map
@@ -52,22 +339,217 @@ class LaneletMap:
     # @return: A new Point of the Lanelet2 Map
     def add_and_get_Point(self, x: float, y: float):
     
+        # an existing Point within the snapping tolerance
+        if self.point_grid != None:
+            point = self.find_snap_Point(x, y, 0.0)
+            if point != None:
+                return point
+        
         # add a new Point
         point = Point3d(getId(), x, y, 0)
         self.lmap.add(point)
+        self.point_index[point.id] = point
+        if self.point_grid != None:
+            self.add_Point_to_grid(point)
         
         return point
+    
+    
+    # Switches on the snapping of new Points: add_and_get_Point() and build_corridor()
+    # return an existing Point within tolerance instead of a new one, add_and_get_lineString()
+    # and build_corridor() an existing LineString through the same Points (see snap_LineString())
+    # @param tolerance: distance in meter (float)
+    def enable_snapping(self, tolerance = SNAP_TOLERANCE):
+    
+        if tolerance <= 0.0:
+            print("The snapping tolerance must be positive")
+            return None
+        
+        self.snap_tolerance = float(tolerance)
+        self.point_grid = {}
+        for point in self.point_index.values():
+            self.add_Point_to_grid(point)
+        self.line_lookup = {}
+        for line in self.line_index.values():
+            self.snap_LineString(line)
+    
+    
+    # Returns an existing Point within the snapping tolerance, else adds the Point to the grid hash
+    # @param point: a new Point
+    # @return: the existing or the new Point
+    def snap_Point(self, point):
+    
+        existing = self.find_snap_Point(point.x, point.y, point.z)
+        if existing != None:
+            return existing
+        
+        self.add_Point_to_grid(point)
+        return point
+    
+    
+    # Returns an existing LineString through the same Points with the same attributes,
+    # else adds the LineString to the lookup of the snapping
+    # @param line: a new LineString (not inverted)
+    # @return: the existing LineString, inverted if its Points are in reverse order, or the new LineString
+    def snap_LineString(self, line):
+    
+        ids = tuple(point.id for point in line)
+        existing = self.line_lookup.get(ids)
+        if existing != None and dict(existing.attributes) == dict(line.attributes):
+            return existing
+        
+        existing = self.line_lookup.get(ids[::-1])
+        if existing != None and len(ids) > 1 and dict(existing.attributes) == dict(line.attributes):
+            return existing.invert()
+        
+        self.line_lookup.setdefault(ids, line)
+        return line
+    
+    
+    # Switches off the snapping of new Points and LineStrings
+    def disable_snapping(self):
+    
+        self.snap_tolerance = None
+        self.point_grid = None
+        self.line_lookup = None
+    
+    
+    # Adds a Point to the grid hash of the snapping
+    # @param point: a Point of the Lanelet2 map
+    def add_Point_to_grid(self, point):
+    
+        cell_size = 2.0 * self.snap_tolerance
+        cell = (math.floor(point.x / cell_size), math.floor(point.y / cell_size))
+        self.point_grid.setdefault(cell, []).append((point.x, point.y, point.z, point))
+    
+    
+    # Returns the first Point of the grid hash within the snapping tolerance
+    # @param x, y, z: coordinates (float)
+    # @return: a Point of the Lanelet2 map, None if there is none
+    def find_snap_Point(self, x: float, y: float, z: float):
+    
+        tolerance = self.snap_tolerance
+        fx = x / (2.0 * tolerance)
+        fy = y / (2.0 * tolerance)
+        cx = math.floor(fx)
+        cy = math.floor(fy)
+        
+        # the cells are twice the tolerance: a Point within tolerance lies in the cell
+        # or in the neighbour cells towards the nearer cell borders (2 x 2 cells)
+        nx = cx - 1 if fx - cx < 0.5 else cx + 1
+        ny = cy - 1 if fy - cy < 0.5 else cy + 1
+        grid = self.point_grid
+        for cell in ((cx, cy), (nx, cy), (cx, ny), (nx, ny)):
+            for px, py, pz, point in grid.get(cell, ()):
+                if (px - x)**2 + (py - y)**2 + (pz - z)**2 <= tolerance**2:
+                    return point
+        
+        return None
+    
+    
+    # Merges all Points of the map within tolerance of each other into the first of them
+    # The LineStrings with merged Points are replaced (same ID and attributes). LineStrings
+    # through the same Points (also in reverse order) with the same attributes are merged
+    # into the first of them, so adjacent Lanelets share their bound. The Lanelet2 map is
+    # rebuilt without the merged Points and LineStrings.
+    # @param tolerance: distance in meter (float), default the snapping tolerance or SNAP_TOLERANCE
+    # @return: number of merged Points and LineStrings, None for a tiled map or a map with Areas,
+    #          Polygons or Regulatory Elements
+    def dedupe_points(self, tolerance = None):
+    
+        if tolerance == None:
+            tolerance = self.snap_tolerance if self.snap_tolerance != None else SNAP_TOLERANCE
+        
+        if isinstance(self.snapshot, LaneletTiles):
+            print("A tiled map cannot be updated")
+            return None
+        
+        lmap = self.lmap
+        if len(lmap.areaLayer) > 0 or len(lmap.polygonLayer) > 0 or len(lmap.regulatoryElementLayer) > 0:
+            print("dedupe_points() only supports maps of Lanelets, LineStrings and Points")
+            return None
+        
+        # the grid hash of the snapping with the first Point of each group
+        snap_tolerance = self.snap_tolerance
+        self.snap_tolerance = float(tolerance)
+        self.point_grid = {}
+        self.line_lookup = {}
+        
+        # merged Point ID -> the first Point within tolerance
+        merged = {}
+        for point in self.point_index.values():
+            first = self.snap_Point(point)
+            if first is not point:
+                merged[point.id] = first
+        
+        # LineStrings with merged Points, merged LineString ID -> the first LineString through the same Points
+        new_lines = {}
+        merged_lines = {}
+        for line in self.line_index.values():
+            if any(point.id in merged for point in line):
+                line = LineString3d(line.id, [merged.get(point.id, point) for point in line], line.attributes)
+                new_lines[line.id] = line
+            first = self.snap_LineString(line)
+            if first.id != line.id:
+                merged_lines[line.id] = first
+                new_lines.pop(line.id, None)
+        
+        self.disable_snapping()
+        if snap_tolerance != None:
+            self.enable_snapping(snap_tolerance)
+        
+        if len(merged) == 0 and len(merged_lines) == 0:
+            return 0
+        
+        def replaced(line):
+            new_line = merged_lines.get(line.id, new_lines.get(line.id))
+            if new_line == None:
+                return line
+            return new_line.invert() if line.inverted() else new_line
+        
+        has_centerlines = len(self.line_index) > len({line.id for lane in self.lanelet_index.values()
+                                                       for line in (lane.leftBound, lane.rightBound)})
+        for lane in self.lanelet_index.values():
+            lane.leftBound = replaced(lane.leftBound)
+            lane.rightBound = replaced(lane.rightBound)
+            if has_centerlines and (lane.centerline.id in new_lines or lane.centerline.id in merged_lines):
+                lane.centerline = replaced(lane.centerline)
+        
+        new_map = lanelet2.core.LaneletMap()
+        for point in self.point_index.values():
+            if point.id not in merged:
+                new_map.add(point)
+        for line in self.line_index.values():
+            if line.id not in merged_lines:
+                new_map.add(new_lines.get(line.id, line))
+        for lane in self.lanelet_index.values():
+            new_map.add(lane)
+        
+        self.lmap = new_map
+        self.build_index()
+        self.graph = None
+        if snap_tolerance != None:
+            self.enable_snapping(snap_tolerance)
+        
+        return len(merged) + len(merged_lines)
         
     
     # Add and get a new LineString (first -> second) for the Lanelet2 Map. 
     # @param first_point: first Point from a Line
     # @param second_point: second Point from a Line
-    # @return: A new LineString of the Lanelet2 Map
+    # @return: A new LineString of the Lanelet2 Map, with snapping an existing one through the same Points
     def add_and_get_lineString(self, first_point, second_point):
 
-        # add a new LineString
+        # add a new LineString, an existing one through the same Points with snapping
         lineString = LineString3d(getId(), [first_point, second_point])
+        if self.line_lookup != None:
+            snapped = self.snap_LineString(lineString)
+            if snapped is not lineString:
+                return snapped
         self.lmap.add(lineString)
+        self.line_index[lineString.id] = lineString
+        self.add_to_point_lines([lineString])
+        self.geometry_arrays = None
 
         return lineString
         
@@ -80,12 +562,11 @@ class LaneletMap:
         new_lanelet = Lanelet(getId(), line_left, line_right)
 
         # add attributes to the Lanelet
-        new_lanelet.attributes["location"] = "nonurban"
-        new_lanelet.attributes["one_way"] = "yes"
-        new_lanelet.attributes["region"] = "de"
-        new_lanelet.attributes["subtype"] = "highway"
+        for name, value in LANELET_ATTRIBUTES.items():
+            new_lanelet.attributes[name] = value
         
         self.lmap.add(new_lanelet)
+        self.add_Lanelet_to_index(new_lanelet)
     
     
     # Add a new Lanelet to the Lanelet2 Map with a define Centerline
@@ -98,14 +579,98 @@ class LaneletMap:
         new_lanelet.centerline = centerline
         
         # add attributes to the Lanelet
-        new_lanelet.attributes["location"] = "nonurban"
-        new_lanelet.attributes["one_way"] = "yes"
-        new_lanelet.attributes["region"] = "de"
-        new_lanelet.attributes["subtype"] = "highway"
+        for name, value in LANELET_ATTRIBUTES.items():
+            new_lanelet.attributes[name] = value
         
         self.lmap.add(new_lanelet)
+        self.add_Lanelet_to_index(new_lanelet)
         
-  
+    
+    # Add a corridor of K - 1 parallel Lanelets between K boundaries to the Lanelet2 Map
+    # Each segment (row i -> row i + 1) of the boundaries k and k + 1 is a Lanelet. The IDs are
+    # assigned in the same order as a loop over the rows with add_and_get_Point(),
+    # add_and_get_lineString() and add_Lanelet() / add_Lanelet_with_Centerline().
+    # @param boundaries: K boundaries of N (x,y)-points each, left to right (ndarray[K, N, 2])
+    # @param closed: closes the ring from the last to the first row (bool)
+    # @param centerline: adds the midline of the two bounds as centerline (bool)
+    # @param attributes: attributes of the Lanelets (dict), default LANELET_ATTRIBUTES
+    # @return: the new Lanelets as list per lane [K - 1][segments]
+    def build_corridor(self, boundaries, closed = True, centerline = False, attributes = None):
+    
+        boundaries = np.asarray(boundaries, dtype=np.float64)
+        n_bounds, n_rows = boundaries.shape[:2]
+        n_lanes = n_bounds - 1
+        
+        if n_lanes < 1 or n_rows < 2:
+            print("A corridor needs at least two boundaries of two points")
+            return []
+        
+        if attributes == None:
+            attributes = LANELET_ATTRIBUTES
+        
+        # polylines per row: the boundaries, then the centerlines
+        polylines = boundaries
+        if centerline:
+            polylines = np.concatenate((boundaries, (boundaries[:-1] + boundaries[1:]) / 2))
+        n_lines = len(polylines)
+        n_segments = n_rows - 1 if not closed else n_rows
+        
+        # IDs: first row points, then per segment points, lines and lanelets (ring closure without points)
+        step = 2 * n_lines + n_lanes
+        base = getId()
+        seg_start = base + n_lines + np.arange(n_segments) * step
+        no_points = np.arange(n_segments) >= n_rows - 1
+        
+        point_ids = np.empty((n_lines, n_rows), dtype=np.int64)
+        point_ids[:, 0] = base + np.arange(n_lines)
+        point_ids[:, 1:] = seg_start[None, :n_rows - 1] + np.arange(n_lines)[:, None]
+        line_ids = (seg_start + np.where(no_points, 0, n_lines))[None, :] + np.arange(n_lines)[:, None]
+        lanelet_ids = (seg_start + np.where(no_points, n_lines, 2 * n_lines))[None, :] + np.arange(n_lanes)[:, None]
+        lncore.registerId(int(lanelet_ids[-1, -1]))
+        
+        # Points, LineStrings (row i -> row i + 1) and Lanelets
+        points = [[Point3d(ID, x, y, 0) for ID, (x, y) in zip(ids, xy)]
+                  for ids, xy in zip(point_ids.tolist(), polylines.tolist())]
+        if self.point_grid != None:
+            points = [[self.snap_Point(point) for point in row] for row in points]
+        lines = [[LineString3d(ID, [row[i], row[(i + 1) % n_rows]]) for i, ID in enumerate(ids)]
+                 for ids, row in zip(line_ids.tolist(), points)]
+        if self.line_lookup != None:
+            lines = [[self.snap_LineString(line) for line in row] for row in lines]
+        
+        attribute_map = lncore.AttributeMap(dict(attributes))
+        lanelets = [[Lanelet(ID, left, right, attribute_map) for ID, left, right in zip(ids, lines[k], lines[k + 1])]
+                    for k, ids in enumerate(lanelet_ids.tolist())]
+        if centerline:
+            for lane_k, center_k in zip(lanelets, lines[n_bounds:]):
+                for new_lanelet, center in zip(lane_k, center_k):
+                    new_lanelet.centerline = center
+        
+        # add the Lanelets with their LineStrings and Points
+        lmap = self.lmap
+        for lane_k in lanelets:
+            for new_lanelet in lane_k:
+                lmap.add(new_lanelet)
+        
+        for row in points:
+            self.point_index.update((point.id, point) for point in row)
+        for row in lines:
+            self.line_index.update((line.id, line) for line in row if not line.inverted())
+            self.add_to_point_lines(line for line in row if not line.inverted())
+        for lane_k in lanelets:
+            self.lanelet_index.update((lane.id, lane) for lane in lane_k)
+        self.spatial_index = None
+        self.geometry_arrays = None
+        
+        if self.topology != None:
+            traffic_rules = self.get_traffic_rules()
+            for lane_k in lanelets:
+                for lane in lane_k:
+                    self.topology.add(LaneletTopology.row_of(lane, traffic_rules))
+        
+        return lanelets
+    
+    
     # load an osm file to a lanelete map
     # @param osm_map_file : Path of a OSM map (String)
     # @param lat : center latitude (float)
@@ -122,26 +687,644 @@ class LaneletMap:
         print("using OSM: %s" % (osm_path))
 
         # Make a Lanelet2 map
-        projector = lanelet2.projection.UtmProjector(lanelet2.io.Origin(lat, lon))
-        lmap, err_list = lanelet2.io.loadRobust(osm_path, projector)
+        if (lat, lon) == (self.lat, self.lon):
+            projector = self.get_projector()
+        else:
+            projector = lanelet2.projection.UtmProjector(lanelet2.io.Origin(lat, lon))
+        with self.phase("xml_parse"):
+            if osm_path.endswith(".gz"):
+                # lanelet2 reads only plain XML
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    xml_path = os.path.join(tmp_dir, os.path.basename(osm_path)[:-3])
+                    with gzip.open(osm_path, "rb") as gz_file, open(xml_path, "wb") as xml_file:
+                        shutil.copyfileobj(gz_file, xml_file)
+                    lmap, err_list = lanelet2.io.loadRobust(xml_path, projector)
+            else:
+                lmap, err_list = lanelet2.io.loadRobust(osm_path, projector)
   
         # Report possible errors
         if len(err_list) != 0:
            for err in err_list:
              print(err)
+        self.load_errors = list(err_list)
   
         print("%d errors, %d lanes dectected" % (len(err_list), len([l for l in lmap.laneletLayer])))
 
         return lmap
 
 
+    # Returns the path of the snapshot of an osm file
+    # @param osm_map_file : Path of a OSM map (String)
+    # @return: path of the snapshot (String)
+    def get_snapshot_path(self, osm_map_file: str):
+        return os.path.join(os.path.abspath(os.getcwd()), osm_map_file) + ".snapshot"
+    
+    
+    # Opens the snapshot of an osm file, if it matches the file content and the origin
+    # @param osm_map_file : Path of a OSM map (String)
+    # @param lat : center latitude (float)
+    # @param lon : center longitude (float)
+    # @return: a MapSnapshot else None
+    def load_snapshot(self, osm_map_file: str, lat: float, lon: float):
+    
+        osm_path = os.path.join(os.path.abspath(os.getcwd()), osm_map_file)
+        if not os.path.exists(osm_path):
+            return None
+        
+        with self.phase("snapshot_open"):
+            snapshot = MapSnapshot.open(self.get_snapshot_path(osm_map_file), snapshot_key(osm_path, lat, lon))
+        if snapshot != None:
+            print("using snapshot: %s" % self.get_snapshot_path(osm_map_file))
+        
+        return snapshot
+    
+    
+    # Writes the snapshot of the loaded osm file
+    # @param osm_map_file : Path of the OSM map the Lanelet2 map was loaded from (String)
+    def write_snapshot(self, osm_map_file: str):
+    
+        osm_path = os.path.join(os.path.abspath(os.getcwd()), osm_map_file)
+        key = snapshot_key(osm_path, self.lat, self.lon)
+        
+        try:
+            with self.phase("snapshot_write"):
+                MapSnapshot.from_LaneletMap(self, key).save(self.get_snapshot_path(osm_map_file))
+        except (OSError, ValueError) as err:
+            print("Snapshot not written: %s" % err)
+    
+    
+    # Returns the path of the tiles of an osm file
+    # @param osm_map_file : Path of a OSM map (String)
+    # @return: path of the directory of the tiles (String)
+    def get_tiles_path(self, osm_map_file: str):
+        return os.path.join(os.path.abspath(os.getcwd()), osm_map_file) + ".tiles"
+    
+    
+    # Opens the tiles of an osm file around the origin, if they match the file content, the origin and tile_size
+    # @param osm_map_file : Path of a OSM map (String)
+    # @param lat : center latitude (float)
+    # @param lon : center longitude (float)
+    # @return: a LaneletTiles else None
+    def load_tiles(self, osm_map_file: str, lat: float, lon: float):
+    
+        osm_path = os.path.join(os.path.abspath(os.getcwd()), osm_map_file)
+        if not os.path.exists(osm_path):
+            return None
+        
+        with self.phase("tiles_open"):
+            tiles = LaneletTiles.open(self.get_tiles_path(osm_map_file), snapshot_key(osm_path, lat, lon),
+                                      self.tile_size, self.max_tiles)
+            if tiles != None:
+                tiles.set_position(0.0, 0.0)
+        if tiles != None:
+            print("using tiles: %s (%d open)" % (self.get_tiles_path(osm_map_file), len(tiles.tiles)))
+        
+        return tiles
+    
+    
+    # Splits the loaded osm file into tiles of tile_size
+    # @param osm_map_file : Path of the OSM map the Lanelet2 map was loaded from (String)
+    def write_tiles(self, osm_map_file: str):
+    
+        osm_path = os.path.join(os.path.abspath(os.getcwd()), osm_map_file)
+        key = snapshot_key(osm_path, self.lat, self.lon)
+        
+        try:
+            with self.phase("tiles_write"):
+                write_tiles(self, self.get_tiles_path(osm_map_file), self.tile_size, key)
+        except (OSError, ValueError) as err:
+            print("Tiles not written: %s" % err)
+    
+    
+    # Raises a RuntimeError for an operation on the whole map of a tiled map: it would load all tiles
+    # (or return the open tiles only). The lookups of a tiled map open further tiles on demand.
+    # @param operation : name of the operation (String)
+    def check_whole_map(self, operation: str):
+    
+        if isinstance(self.snapshot, LaneletTiles):
+            raise RuntimeError("%s needs the whole map, a tiled map only has the tiles around the position: "
+                               "load the map without tile_size" % operation)
+    
+    
+    # Moves the position: opens the tiles around it (only with tile_size)
+    # @param x: x-value of the position in meter (float)
+    # @param y: y-value of the position in meter (float)
+    # @return: number of open tiles, None without tiles
+    def set_position(self, x: float, y: float):
+    
+        if not isinstance(self.snapshot, LaneletTiles):
+            return None
+        
+        return self.snapshot.set_position(x, y)
+    
+    
+    # Returns the snapshot of the map: the opened one or a new export
+    # @param complete : raise a ValueError if the map has areas, polygons or regulatory elements (see LaneletSnapshot.py)
+    # @return: a MapSnapshot
+    def get_snapshot(self, complete = True):
+    
+        if isinstance(self.snapshot, MapSnapshot):
+            return self.snapshot
+        
+        return MapSnapshot.from_LaneletMap(self, complete=complete)
+    
+    
+    # Publishes the map read-only into a block of shared memory, see LaneletMap(shared_map=name)
+    # @param name : name of the block (String), default a random name
+    # @return: the multiprocessing.shared_memory.SharedMemory (name: .name); keep it while
+    #          other processes are attached, then close() and unlink() it
+    def publish_shared_map(self, name = None):
+    
+        try:
+            with self.phase("snapshot_write"):
+                return self.get_snapshot().publish(name)
+        except (OSError, ValueError) as err:
+            print("Shared map not published: %s" % err)
+            return None
+    
+    
+    # Writes the map read-only into a snapshot file, see LaneletMap(shared_map=path)
+    # @param path : path of the snapshot file (String)
+    def export_snapshot(self, path: str):
+    
+        try:
+            with self.phase("snapshot_write"):
+                self.get_snapshot().save(path)
+        except (OSError, ValueError) as err:
+            print("Snapshot not written: %s" % err)
+    
+    
+    # Attaches a published map
+    # @param shared_map : name of a block of shared memory or path of a snapshot file (String)
+    # @return: a MapSnapshot else None
+    def attach_shared_map(self, shared_map: str):
+    
+        with self.phase("snapshot_open"):
+            if os.path.isfile(shared_map):
+                snapshot = MapSnapshot.open(shared_map)
+            else:
+                snapshot = MapSnapshot.attach(shared_map)
+        
+        if snapshot == None:
+            print("No shared map %s found!" % shared_map)
+        
+        return snapshot
+    
+    
+    # Returns the UTM projector of the map origin (lat, lon), creates it only once per origin
+    # @return: a lanelet2 UtmProjector
+    def get_projector(self):
+    
+        if self.stats_recorder != None:
+            self.stats_recorder.count("projector", self.projector_origin == (self.lat, self.lon))
+        
+        if self.projector_origin != (self.lat, self.lon):
+            with self.phase("projection"):
+                self.projector = lanelet2.projection.UtmProjector(lanelet2.io.Origin(self.lat, self.lon))
+                self.batch_projector = UtmBatchProjector(self.lat, self.lon)
+                self.projector_origin = (self.lat, self.lon)
+            
+        return self.projector
+    
+    
+    # Projects a batch of GPS points (lat, lon) to local points (x, y)
+    # @param lat: latitudes (ndarray[N])
+    # @param lon: longitudes (ndarray[N])
+    # @return: x- and y-values in meter (ndarray[N, 2])
+    def project_ll_to_xy(self, lat, lon):
+    
+        self.get_projector()
+        return self.batch_projector.forward(lat, lon)
+    
+    
+    # Projects a batch of local points (x, y) back to GPS points (lat, lon)
+    # @param xy: x- and y-values in meter (ndarray[N, 2])
+    # @return: latitudes and longitudes (two ndarray[N])
+    def project_xy_to_ll(self, xy):
+    
+        self.get_projector()
+        return self.batch_projector.reverse(xy)
+    
+    
+    # Builds the ID index of all Lanelets, LineStrings and Points of the Lanelet2 map
+    # The index holds the LineStrings as stored (not inverted), like the OSM ways.
+    def build_index(self):
+    
+        with self.phase("index"):
+            self.lanelet_index = {lane.id: lane for lane in self.lmap.laneletLayer}
+            self.line_index = {line.id: line.invert() if line.inverted() else line for line in self.lmap.lineStringLayer}
+            self.point_index = {point.id: point for point in self.lmap.pointLayer}
+        self.point_lines = None
+        self.spatial_index = None
+        self.geometry_arrays = None
+        self.topology = None
+    
+    
+    # Adds a Lanelet and its bounds to the ID index
+    # @param lane: a Lanelet of the Lanelet2 map
+    def add_Lanelet_to_index(self, lane):
+    
+        self.lanelet_index[lane.id] = lane
+        self.spatial_index = None
+        self.geometry_arrays = None
+        if self.topology != None:
+            self.topology.add(LaneletTopology.row_of(lane, self.get_traffic_rules()))
+        
+        # the bounds are added to the map together with the Lanelet (not inverted, see build_index())
+        for line in (lane.leftBound, lane.rightBound):
+            if line.id not in self.line_index:
+                if line.inverted():
+                    line = line.invert()
+                self.line_index[line.id] = line
+                self.add_to_point_lines([line])
+                for point in line:
+                    self.point_index.setdefault(point.id, point)
+    
+    
+    # Returns the reverse index of the Points, builds it from the ID index if needed
+    # @return: dict Point ID -> set of the IDs of the LineStrings through the Point
+    def get_point_lines(self):
+    
+        if self.point_lines == None:
+            self.point_lines = {}
+            self.add_to_point_lines(self.line_index.values())
+        
+        return self.point_lines
+    
+    
+    # Adds LineStrings to the reverse index of the Points, if it is built
+    # @param lines: LineStrings of the ID index (not inverted)
+    def add_to_point_lines(self, lines):
+    
+        if self.point_lines == None:
+            return
+        
+        for line in lines:
+            for point in line:
+                self.point_lines.setdefault(point.id, set()).add(line.id)
+    
+    
+    # Removes a LineString from the reverse index of the Points, if it is built
+    # @param line: a LineString of the ID index (not inverted)
+    def remove_from_point_lines(self, line):
+    
+        if self.point_lines == None:
+            return
+        
+        for point in line:
+            line_ids = self.point_lines.get(point.id)
+            if line_ids != None:
+                line_ids.discard(line.id)
+    
+    
+    # Returns the polygon of a Lanelet: left bound forward, right bound backward
+    # @param lane: a Lanelet
+    # @return: list of (x, y)
+    def get_Polygon_of_Lanelet(self, lane):
+    
+        ring = [(point.x, point.y) for point in lane.leftBound]
+        ring.extend((point.x, point.y) for point in reversed(list(lane.rightBound)))
+        
+        return ring
+    
+    
+    # Applies changes to the map without reloading it
+    # Elements with the ID of an existing element replace it, unchanged elements are skipped.
+    # Only the changed Lanelets are updated in the ID index, the spatial index and the
+    # neighbour table, the LineStrings of the moved Points are found with the reverse index
+    # of the Points. A lanelet2 RoutingGraph cannot be changed, only built again from the
+    # whole map: a routing graph in use is rebuilt here, not on the next route, together
+    # with the Lanelet2 map (without parsing). Else the Lanelet2 map is rebuilt on the next
+    # access of lmap and the routing graph on its next use.
+    # @param points: new or moved Points
+    # @param lines: new or changed LineStrings (with their Points)
+    # @param lanelets: new or changed Lanelets (with their bounds)
+    # @param remove_ids: IDs of the Lanelets, LineStrings and Points to remove
+    # @param rebuild_graph: rebuild a routing graph in use now, False e.g. for a series of
+    #                       updates without routes in between
+    # @return: dict with the number of "added", "changed" and "removed" elements, None if not possible
+    def update_map(self, points = (), lines = (), lanelets = (), remove_ids = (), rebuild_graph = True):
+    
+        if isinstance(self.snapshot, LaneletTiles):
+            print("A tiled map cannot be updated")
+            return None
+        
+        # a map of a snapshot is created now
+        if self.snapshot != None:
+            self.lmap
+        if self.lanelet2_map == None:
+            print("No Lanelet2 map loaded")
+            return None
+        
+        with self.phase("update"):
+            counts = {"added": 0, "changed": 0, "removed": 0}
+            new_elements = []
+            moved = set()
+            new_lines = {}
+            changed_lanelets = set()
+            replaced = False
+            
+            def update_attributes(existing, element):
+                attributes = dict(element.attributes)
+                if dict(existing.attributes) == attributes:
+                    return False
+                for name in list(existing.attributes.keys()):
+                    if name not in attributes:
+                        del existing.attributes[name]
+                for name, value in attributes.items():
+                    existing.attributes[name] = value
+                return True
+            
+            # Points are moved in place, so all their LineStrings follow
+            def update_point(point):
+                existing = self.point_index.get(point.id)
+                if existing == None:
+                    self.point_index[point.id] = point
+                    new_elements.append(point)
+                    counts["added"] += 1
+                    return point
+                if existing is not point:
+                    if (existing.x, existing.y, existing.z) != (point.x, point.y, point.z):
+                        existing.x, existing.y, existing.z = point.x, point.y, point.z
+                        moved.add(point.id)
+                        counts["changed"] += 1
+                    elif update_attributes(existing, point):
+                        counts["changed"] += 1
+                return existing
+            
+            # LineStrings are replaced by a new LineString of the same ID
+            def update_line(line):
+                inverted = line.inverted()
+                if inverted:
+                    line = line.invert()
+                points = [update_point(point) for point in line]
+                
+                existing = self.line_index.get(line.id)
+                if existing != None and (existing is line or (
+                        [point.id for point in existing] == [point.id for point in points] and
+                        dict(existing.attributes) == dict(line.attributes))):
+                    result = existing
+                else:
+                    result = new_lines.get(line.id)
+                    if result == None:
+                        result = LineString3d(line.id, points, line.attributes)
+                        new_lines[line.id] = result
+                        self.line_index[line.id] = result
+                        if existing != None:
+                            self.remove_from_point_lines(existing)
+                        self.add_to_point_lines([result])
+                        counts["changed" if existing != None else "added"] += 1
+                        if existing == None:
+                            new_elements.append(result)
+                
+                return result.invert() if inverted else result
+            
+            for point in points:
+                update_point(point)
+            for line in lines:
+                update_line(line)
+            
+            for lane in lanelets:
+                left = update_line(lane.leftBound)
+                right = update_line(lane.rightBound)
+                existing = self.lanelet_index.get(lane.id)
+                
+                if existing != None and existing is not lane:
+                    same_bounds = all(new.id == old.id and new.inverted() == old.inverted() and new.id not in new_lines
+                                      for new, old in ((left, existing.leftBound), (right, existing.rightBound)))
+                    if same_bounds:
+                        if update_attributes(existing, lane):
+                            counts["changed"] += 1
+                            changed_lanelets.add(lane.id)
+                        continue
+                
+                lane.leftBound = left
+                lane.rightBound = right
+                self.lanelet_index[lane.id] = lane
+                changed_lanelets.add(lane.id)
+                counts["changed" if existing != None else "added"] += 1
+                if existing != None:
+                    replaced = True
+                else:
+                    new_elements.append(lane)
+            
+            # the Lanelets bounded by a replaced LineString or by a moved Point
+            topology = self.get_topology()
+            topology.update()
+            changed_lines = set(new_lines)
+            if len(moved) > 0:
+                point_lines = self.get_point_lines()
+                for ID in moved:
+                    changed_lines.update(point_lines.get(ID, ()))
+            
+            if len(changed_lines) > 0:
+                line_ids = np.array(list(changed_lines), dtype=np.int64)
+                columns = topology.columns
+                bounded = np.isin(columns["left_line"], line_ids) | np.isin(columns["right_line"], line_ids)
+                for ID in columns["ids"][bounded].tolist():
+                    lane = self.lanelet_index.get(ID)
+                    if lane == None or ID in changed_lanelets:
+                        continue
+                    for name in ("leftBound", "rightBound"):
+                        bound = getattr(lane, name)
+                        if bound.id in new_lines:
+                            setattr(lane, name, new_lines[bound.id].invert() if bound.inverted() else new_lines[bound.id])
+                    changed_lanelets.add(ID)
+                replaced = True
+            
+            # removals, LineStrings and Points only if they are no longer used
+            removed_lanelets = [ID for ID in remove_ids if ID in self.lanelet_index]
+            for ID in removed_lanelets:
+                del self.lanelet_index[ID]
+                changed_lanelets.discard(ID)
+            
+            remove_lines = [ID for ID in remove_ids if ID in self.line_index]
+            if len(remove_lines) > 0:
+                used = {line.id for lane in self.lanelet_index.values() for line in (lane.leftBound, lane.rightBound)}
+                for ID in remove_lines:
+                    if ID in used:
+                        print("LineString %d still bounds a Lanelet" % ID)
+                        continue
+                    self.remove_from_point_lines(self.line_index.pop(ID))
+                    counts["removed"] += 1
+            
+            remove_points = [ID for ID in remove_ids if ID in self.point_index]
+            if len(remove_points) > 0:
+                point_lines = self.get_point_lines()
+                for ID in remove_points:
+                    if len(point_lines.get(ID, ())) > 0:
+                        print("Point %d still belongs to a LineString" % ID)
+                        continue
+                    del self.point_index[ID]
+                    point_lines.pop(ID, None)
+                    counts["removed"] += 1
+            
+            counts["removed"] += len(removed_lanelets)
+            replaced = replaced or counts["removed"] > 0 or len(moved) > 0
+            
+            # the Lanelet2 map: new elements are added, else it is rebuilt on the next access
+            if replaced or self.lanelet2_map_changed:
+                self.lanelet2_map_changed = True
+            else:
+                for element in new_elements:
+                    self.lanelet2_map.add(element)
+            
+            # neighbour table and spatial index of the changed Lanelets
+            affected = list(changed_lanelets) + removed_lanelets
+            topology.remove(affected)
+            traffic_rules = self.get_traffic_rules()
+            for ID in changed_lanelets:
+                topology.add(LaneletTopology.row_of(self.lanelet_index[ID], traffic_rules))
+            topology.update()
+            
+            if self.spatial_index != None and len(affected) > 0:
+                polygons = [self.get_Polygon_of_Lanelet(self.lanelet_index[ID]) for ID in changed_lanelets]
+                poly_offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+                poly_offsets[1:] = np.cumsum([len(polygon) for polygon in polygons])
+                poly_xy = [xy for polygon in polygons for xy in polygon]
+                self.spatial_index = self.spatial_index.updated(affected, list(changed_lanelets), poly_xy, poly_offsets)
+            
+            if len(affected) > 0 or len(new_elements) > 0:
+                self.geometry_arrays = None
+                
+                # the routes of the old map are dropped with the routing graph (see check_route_cache())
+                if self.routing_graph != None and rebuild_graph:
+                    self.route_cache.clear()
+                    self.route_cache_topology = (topology, topology.version)
+                    self.lanelet_lengths = {}
+                    self.graph = self.get_graph()
+                else:
+                    self.graph = None
+            
+            if self.point_grid != None:
+                self.enable_snapping(self.snap_tolerance)
+        
+        return counts
+    
+    
+    # Loads a delta file against the loaded map and applies it with update_map()
+    # The delta is a Lanelet2 OSM file with the new and changed elements (with the ways and
+    # nodes they use, IDs as in the base map). Elements with action="delete" are removed.
+    # @param delta_file: path of the delta OSM file (str)
+    # @return: dict with the number of "added", "changed" and "removed" elements, None on errors
+    def load_delta(self, delta_file: str):
+    
+        delta_path = os.path.join(os.path.abspath(os.getcwd()), delta_file)
+        if not os.path.exists(delta_path):
+            print("OSM delta %s not found!" % (delta_path))
+            return None
+        
+        # the removed elements are taken out, the rest is loaded by lanelet2
+        with self.phase("xml_parse"):
+            tree = ElementTree.parse(delta_path)
+            root = tree.getroot()
+            remove_ids = []
+            for element in list(root):
+                if element.tag in ("node", "way", "relation") and element.get("action") == "delete":
+                    remove_ids.append(int(element.get("id")))
+                    root.remove(element)
+            
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                changed_path = os.path.join(tmp_dir, os.path.basename(delta_path))
+                tree.write(changed_path)
+                delta_map, err_list = lanelet2.io.loadRobust(changed_path, self.get_projector())
+        
+        # Report possible errors
+        if len(err_list) != 0:
+            for err in err_list:
+                print(err)
+        
+        return self.update_map(list(delta_map.pointLayer), list(delta_map.lineStringLayer),
+                               list(delta_map.laneletLayer), remove_ids)
+    
+    
+    # Builds the Lanelet2 map again from the ID index (after update_map())
+    def rebuild_lanelet2_map(self):
+    
+        with self.phase("rebuild"):
+            old_map = self.lanelet2_map
+            new_map = lanelet2.core.createMapFromLanelets(list(self.lanelet_index.values()))
+            
+            for line in self.line_index.values():
+                if not new_map.lineStringLayer.exists(line.id):
+                    new_map.add(line)
+            for point in self.point_index.values():
+                if not new_map.pointLayer.exists(point.id):
+                    new_map.add(point)
+            
+            if old_map != None:
+                for layer in (old_map.polygonLayer, old_map.areaLayer, old_map.regulatoryElementLayer):
+                    for element in layer:
+                        new_map.add(element)
+            
+            self.lanelet2_map = new_map
+            self.lanelet2_map_changed = False
+    
+    
+    # Returns the spatial index of the Lanelet polygons, builds it if the map has changed
+    # @return: a LaneletGridIndex
+    def get_spatial_index(self):
+    
+        if self.snapshot != None:
+            return self.snapshot.get_spatial_index()
+        
+        if self.stats_recorder != None:
+            self.stats_recorder.count("spatial_index", self.spatial_index != None)
+        
+        if self.spatial_index == None:
+            with self.phase("spatial_index"):
+                lanelet_ids = []
+                poly_xy = []
+                poly_offsets = [0]
+                
+                for lane in self.lanelet_index.values():
+                    ring = self.get_Polygon_of_Lanelet(lane)
+                    
+                    lanelet_ids.append(lane.id)
+                    poly_xy.extend(ring)
+                    poly_offsets.append(len(poly_xy))
+                
+                self.spatial_index = LaneletGridIndex(lanelet_ids, poly_xy, poly_offsets)
+        
+        return self.spatial_index
+    
+    
+    # Returns the neighbour table of the Lanelets, builds it if necessary
+    # @return: a LaneletTopology
+    def get_topology(self):
+    
+        if self.snapshot != None:
+            return self.snapshot.get_topology()
+        
+        if self.topology == None:
+            with self.phase("topology"):
+                traffic_rules = self.get_traffic_rules()
+                topology = LaneletTopology()
+                for lane in self.lanelet_index.values():
+                    topology.add(LaneletTopology.row_of(lane, traffic_rules))
+                topology.update()
+                self.topology = topology
+        
+        return self.topology
+    
+    
+    # Returns the traffic rules (Germany, vehicle) of the routing graph
+    # @return: lanelet2 traffic rules
+    def get_traffic_rules(self):
+    
+        if self.traffic_rules == None:
+            self.traffic_rules = lanelet2.traffic_rules.create(lanelet2.traffic_rules.Locations.Germany,
+                                                               lanelet2.traffic_rules.Participants.Vehicle)
+        
+        return self.traffic_rules
+    
+    
     # Generates a routing graph from the Lanelet2 map
     # @return: routing graph
     def get_graph(self):
-        traffic_rules = lanelet2.traffic_rules.create(lanelet2.traffic_rules.Locations.Germany,
-                                                  lanelet2.traffic_rules.Participants.Vehicle)
                                                   
-        return lanelet2.routing.RoutingGraph(self.lmap, traffic_rules)
+        with self.phase("routing_graph"):
+            return lanelet2.routing.RoutingGraph(self.lmap, self.get_traffic_rules())
 
 
     # Set a routing graph from the Lanelet2 map
@@ -152,7 +1335,8 @@ class LaneletMap:
     # Set a Lanelet2 map    
     # @param lmap : A new Lanelet2 map
     def set_lamp(self, lmap):
-        self.lmap = lamp              
+        self.lmap = lmap
+        self.build_index()
       
                     
     # write the lanelet2 map to an osm file
@@ -162,27 +1346,266 @@ class LaneletMap:
         # Current directory
         path = os.path.join(os.path.abspath(os.getcwd()), target_map)
         
-        projector = lanelet2.projection.UtmProjector(lanelet2.io.Origin(self.lat, self.lon))
-        write_err = lanelet2.io.writeRobust(path, self.lmap, projector)
+        with self.phase("write"):
+            write_err = lanelet2.io.writeRobust(path, self.lmap, self.get_projector())
   
         # Report possible errors
         if len(write_err) != 0:
            for err in write_err:
                print(err)
+    
+    
+    # write the lanelet2 map to an osm file, element by element with bounded memory (see LaneletWriter.py)
+    # @param target_map : Name of the OSM map, gzip compressed if it ends with ".gz"
+    # @param merge_collinear : merge chains of collinear two-point LineStrings into one way, only
+    #                          LineStrings which are no bounds of a Lanelet: a map of Lanelets only
+    #                          like Data_Map.osm keeps its ways (see LaneletWriter.py)
+    # @param workers : number of processes formatting the chunks (int), 0 in the calling thread
+    # @return: number of written nodes, ways and relations (dict), None on errors
+    def stream_LaneletMap_to_file(self, target_map = 'target_map.osm', merge_collinear = False, workers = 0):
+    
+        # Current directory
+        path = os.path.join(os.path.abspath(os.getcwd()), target_map)
+        
+        self.check_whole_map("writing")
+        
+        try:
+            with self.phase("write"):
+                return write_osm_stream(self, path, merge_collinear=merge_collinear, workers=workers)
+        except OSError as err:
+            print("OSM %s not written: %s" % (path, err))
+            return None
       
 
+    # Returns the coordinates of all LineStrings as packed arrays
+    # The points of the LineString k are xy[offsets[k]:offsets[k+1]].
+    # @return: (LineString IDs ndarray[S], offsets ndarray[S + 1], xy ndarray[M, 2])
+    def get_LineString_arrays(self):
+    
+        geometry = self.get_geometry_arrays()
+        return geometry["line_ids"], geometry["line_offsets"], geometry["xy"]
+    
+    
+    # Returns the geometry of all LineStrings and Lanelets as packed, read-only arrays (see pack_geometry()).
+    # Built once and cached until the map changes; a map of a snapshot returns its arrays.
+    # @return: dict with "line_ids", "line_offsets", "xyz", "xy" and "lanelet_ids", "lanelet_lines",
+    #          "lanelet_left", "lanelet_right", "lanelet_center" ((begin, end) in xyz), "lanelet_inverted"
+    def get_geometry_arrays(self):
+    
+        self.check_whole_map("get_geometry_arrays()")
+        
+        if self.snapshot != None:
+            return self.snapshot.get_geometry_arrays()
+        
+        if self.stats_recorder != None:
+            self.stats_recorder.count("geometry_arrays", self.geometry_arrays != None)
+        
+        if self.geometry_arrays == None:
+            lines = list(self.line_index.values())
+            line_pos = {line.id: k for k, line in enumerate(lines)}
+            lengths = [len(line) for line in lines]
+            offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(lengths)
+            
+            # the LineStrings of the index are not inverted (see build_index()): the
+            # flags of the Lanelets give the direction of their bounds
+            # indexing a LineString is about twice as fast as iterating it
+            points = [line[i] for line, n in zip(lines, lengths) for i in range(n)]
+            xyz = np.array([(point.x, point.y, point.z) for point in points], dtype=np.float64).reshape(-1, 3)
+            
+            lanelets = list(self.lanelet_index.values())
+            left = [line_pos[lane.leftBound.id] for lane in lanelets]
+            right = [line_pos[lane.rightBound.id] for lane in lanelets]
+            
+            # a stored centerline is a LineString of the map which is not a bound
+            # (lane.centerline computes one, if there is none)
+            center = [-1] * len(lanelets)
+            if len(set(left) | set(right)) < len(lines):
+                center = [line_pos.get(ID, -1) if ID != 0 else -1 for ID in [lane.centerline.id for lane in lanelets]]
+            flags = [int(lane.leftBound.inverted()) | (int(lane.rightBound.inverted()) << 1) for lane in lanelets]
+            
+            self.geometry_arrays = pack_geometry([line.id for line in lines], offsets, xyz,
+                                                 [lane.id for lane in lanelets], left, right, center, flags)
+        
+        return self.geometry_arrays
+    
+    
+    # Returns the centerlines of all Lanelets as packed, read-only arrays (see LaneletCenterline.py).
+    # Computed for all Lanelets at once and cached per spacing until the map changes.
+    # @param spacing: resamples the centerlines uniformly at (at most) spacing meter, default the bound vertices
+    # @param write_back: sets the centerlines as centerline of the Lanelets of the map (bool)
+    # @return: dict with "lanelet_ids", "offsets", "xyz" and "lengths"
+    def get_centerlines(self, spacing = None, write_back = False):
+    
+        geometry = self.get_geometry_arrays()
+        if self.centerline_geometry is not geometry:
+            self.centerline_cache = {}
+            self.centerline_geometry = geometry
+        
+        centerlines = self.centerline_cache.get(spacing)
+        if self.stats_recorder != None:
+            self.stats_recorder.count("centerlines", centerlines != None)
+        
+        if centerlines == None:
+            with self.phase("centerlines"):
+                centerlines = compute_centerlines(geometry, spacing)
+            self.centerline_cache[spacing] = centerlines
+        
+        if write_back:
+            self.set_Centerlines(centerlines)
+        
+        return centerlines
+    
+    
+    # Sets packed centerlines (see get_centerlines()) as centerline of the Lanelets of the map.
+    # Each centerline becomes a new LineString of the map, like in add_Lanelet_with_Centerline().
+    # @param centerlines: dict with "lanelet_ids", "offsets" and "xyz"
+    def set_Centerlines(self, centerlines):
+    
+        if isinstance(self.snapshot, LaneletTiles):
+            print("A tiled map cannot be updated")
+            return None
+        
+        lmap = self.lmap
+        if lmap == None:
+            print("No Lanelet2 map loaded")
+            return None
+        
+        offsets = centerlines["offsets"].tolist()
+        xyz = centerlines["xyz"].tolist()
+        
+        for k, ID in enumerate(centerlines["lanelet_ids"].tolist()):
+            lane = self.lanelet_index.get(ID)
+            if lane == None or offsets[k + 1] - offsets[k] < 2:
+                continue
+            
+            points = [Point3d(getId(), x, y, z) for x, y, z in xyz[offsets[k]:offsets[k + 1]]]
+            centerline = LineString3d(getId(), points)
+            lane.centerline = centerline
+            lmap.add(centerline)
+            
+            self.line_index[centerline.id] = centerline
+            self.add_to_point_lines([centerline])
+            self.point_index.update((point.id, point) for point in points)
+        
+        self.geometry_arrays = None
+    
+    
+    # Returns the Frenet coordinates along the lanes (see LaneletFrenet.py), rebuilt if the map has changed
+    # @param spacing: spacing of the centerlines (see get_centerlines())
+    # @return: a LaneletFrenet
+    def get_frenet(self, spacing = None):
+    
+        centerlines = self.get_centerlines(spacing)
+        topology = self.get_topology()
+        topology.update()
+        
+        frenet = self.frenet
+        if self.stats_recorder != None:
+            self.stats_recorder.count("frenet", frenet != None and frenet.centerlines is centerlines and
+                                      frenet.topology is topology and frenet.topology_version == topology.version)
+        
+        if (frenet == None or frenet.centerlines is not centerlines or frenet.topology is not topology or
+                frenet.topology_version != topology.version):
+            with self.phase("frenet"):
+                self.frenet = LaneletFrenet(centerlines, topology)
+        
+        return self.frenet
+    
+    
+    # Converts a batch of points (x, y) to Frenet coordinates (s, d) along the lanes
+    # @param xy: x- and y-values (ndarray[N, 2])
+    # @param lanelet_ids: Lanelet IDs of the points, default the map matching points_xy_over_Lanelets()
+    # @param spacing: spacing of the centerlines (see get_centerlines())
+    # @return: dict with "lane_ids" (ID of the first Lanelet of the lane), "s" (arc length) and
+    #          "d" (lateral offset, positive to the left), NaN / -1 if a point is not over a Lanelet
+    def xy_to_sd(self, xy, lanelet_ids = None, spacing = None):
+    
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        # an array is never compared to None elementwise
+        if lanelet_ids is None:
+            lanelet_ids = self.points_xy_over_Lanelets(xy)
+        
+        return self.get_frenet(spacing).xy_to_sd(xy, lanelet_ids)
+    
+    
+    # Converts a batch of Frenet coordinates (s, d) along the lanes to points (x, y)
+    # @param lane_ids: lanes, the IDs of their first Lanelets (ndarray[N], see xy_to_sd())
+    # @param s: arc length along the lane (ndarray[N])
+    # @param d: lateral offset, positive to the left (ndarray[N])
+    # @param spacing: spacing of the centerlines (see get_centerlines())
+    # @return: x- and y-values (ndarray[N, 2]), NaN for unknown lanes
+    def sd_to_xy(self, lane_ids, s, d, spacing = None):
+    
+        return self.get_frenet(spacing).sd_to_xy(lane_ids, s, d)
+    
+    
     # Draws a local map (in meter) based on the Lanelet data
-    def draw_map(self):
+    # All LineStrings are drawn as one LineCollection.
+    # @param bbox: only draw LineStrings within the viewport (xmin, ymin, xmax, ymax), default all
+    # @param min_spacing: level of detail, drops inner points closer than min_spacing meter (float)
+    # @param output_file: renders into a file (e.g. .png, .svg) without a display instead of showing the map
+    # @param dpi: resolution of a rendered file
+    def draw_map(self, bbox = None, min_spacing = 0.0, output_file = None, dpi = 100):
 
-        for line in self.lmap.lineStringLayer:
-            x = [] 
-            y = []
-            for point in line:
-                x.append(point.x)
-                y.append(point.y)
-            plt.plot(x,y) 
-
-        plt.show()    
+        line_ids, offsets, xy = self.get_LineString_arrays()
+        n_points = np.diff(offsets)
+        line_of_point = np.repeat(np.arange(len(line_ids)), n_points)
+        keep = n_points > 0
+        
+        # Viewport culling: LineStrings whose bounding box intersects the viewport
+        if bbox != None and len(xy) > 0:
+            xmin, ymin, xmax, ymax = bbox
+            starts = offsets[:-1][keep]
+            lower = np.minimum.reduceat(xy, starts, axis=0)
+            upper = np.maximum.reduceat(xy, starts, axis=0)
+            visible = (upper[:, 0] >= xmin) & (lower[:, 0] <= xmax) & (upper[:, 1] >= ymin) & (lower[:, 1] <= ymax)
+            keep[np.nonzero(keep)[0][~visible]] = False
+        
+        # Level of detail: keep the first and last point and one point per grid cell of min_spacing
+        point_keep = keep[line_of_point]
+        if min_spacing > 0.0 and len(xy) > 0:
+            cells = np.floor(xy / min_spacing)
+            new_cell = np.ones(len(xy), dtype=bool)
+            new_cell[1:] = np.any(cells[1:] != cells[:-1], axis=1)
+            ends = np.zeros(len(xy), dtype=bool)
+            ends[offsets[:-1][n_points > 0]] = True
+            ends[offsets[1:][n_points > 0] - 1] = True
+            point_keep &= new_cell | ends
+        
+        kept_xy = xy[point_keep]
+        kept_offsets = np.zeros(len(line_ids) + 1, dtype=np.int64)
+        kept_offsets[1:] = np.cumsum(np.bincount(line_of_point[point_keep], minlength=len(line_ids)))
+        segments = [segment for segment in np.split(kept_xy, kept_offsets[1:-1]) if len(segment) > 1]
+        
+        # matplotlib is only imported for drawing
+        import matplotlib
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+        
+        # same colors as single plots
+        colors = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+        collection = LineCollection(segments, colors=[colors[k % len(colors)] for k in range(len(segments))])
+        
+        if output_file == None:
+            import matplotlib.pyplot as plt
+            figure, axes = plt.subplots()
+        else:
+            # no pyplot: renders without a display
+            figure = Figure()
+            axes = figure.add_subplot()
+        
+        axes.add_collection(collection)
+        if bbox != None:
+            axes.set_xlim(bbox[0], bbox[2])
+            axes.set_ylim(bbox[1], bbox[3])
+        else:
+            axes.autoscale_view()
+        
+        if output_file == None:
+            plt.show()
+        else:
+            figure.savefig(output_file, dpi=dpi)
 
 
     # Prints infos of the lanelet map
@@ -202,9 +1625,11 @@ class LaneletMap:
     # @return: a Lanelet else None
     def get_Lanelet_with_Id(self, ID: int):
     
-        for lane in self.lmap.laneletLayer:
-            if lane.id == ID:
-                return lane
+        lane = self.lanelet_index.get(ID)
+        if lane == None and self.snapshot != None:
+            lane = self.snapshot.get_lanelet(ID)
+        if lane != None:
+            return lane
                 
         print("No Lanelet with ID %s found!" % ID)
         return None    
@@ -250,9 +1675,11 @@ class LaneletMap:
     # @return: a Line else None
     def get_Line_with_Id(self, ID: int):
     
-        for line in self.lmap.lineStringLayer:
-            if line.id == ID:
-                return line
+        line = self.line_index.get(ID)
+        if line == None and self.snapshot != None:
+            line = self.snapshot.get_line(ID)
+        if line != None:
+            return line
         
         print("No Line with ID %s found!" % ID)
         return None       
@@ -281,9 +1708,11 @@ class LaneletMap:
     # @return: a Point else None
     def get_Point_with_Id(self, ID: int):
     
-        for point in self.lmap.pointLayer:
-            if point.id == ID:
-                return point
+        point = self.point_index.get(ID)
+        if point == None and self.snapshot != None:
+            point = self.snapshot.get_point(ID)
+        if point != None:
+            return point
                 
         print("No point with ID %s found!" % ID)
         return None    
@@ -295,32 +1724,39 @@ class LaneletMap:
     # @return: a Lanelet ID, matching the coordinates
     def point_ll_over_Lanelet(self, lat: float, lon: float):
     
-        gpsPoint = GPSPoint(lat, lon)
-        projector = lanelet2.projection.UtmProjector(lanelet2.io.Origin(self.lat, self.lon))
+        xyPoint = self.get_projector().forward(GPSPoint(lat, lon))
         
-        xyPoint = to2D(projector.forward(gpsPoint))
-        nearest_lanelet = lanelet2.geometry.findNearest(self.lmap.laneletLayer, xyPoint, 1)
-
-        # If this lanelet contains the point, return the id of the lanelet, otherwise None
-        if lanelet2.geometry.inside(nearest_lanelet[0][1], xyPoint):
-            return nearest_lanelet[0][1].id
-        else:
-            return None
+        return self.point_xy_over_Lanelet(xyPoint.x, xyPoint.y)
     
     
     # Returns the Lanelet ID, if a point (x, y) is over a Lanelet
+    # The spatial index (built on the first query) tests all Lanelets near the point,
+    # not only the nearest one: Lanelets overlap at forks and merges.
     # @param x: a x-value (float)
     # @param y: a y-value (float)
     # @return: a Lanelet ID, matching the coordinates
     def point_xy_over_Lanelet(self, x: float, y: float):
         
-        xyPoint = BasicPoint2d(x, y)
-        nearest_lanelet = lanelet2.geometry.findNearest(self.lmap.laneletLayer, xyPoint, 1)
-        # If this lanelet contains the point, return the id of the lanelet, otherwise None
-        if lanelet2.geometry.inside(nearest_lanelet[0][1], xyPoint):
-            return nearest_lanelet[0][1].id
-        else:
-            return None    
+        ID = self.get_spatial_index().match_point(float(x), float(y))
+        
+        return ID if ID >= 0 else None
+    
+    
+    # Returns the Lanelet IDs for a batch of points (x, y)
+    # @param xy: x- and y-values (ndarray[N, 2])
+    # @return: Lanelet IDs (ndarray[N]), -1 if a point is not over a Lanelet
+    def points_xy_over_Lanelets(self, xy):
+    
+        return self.get_spatial_index().match(xy)
+    
+    
+    # Returns the Lanelet IDs for a batch of GPS points (lat, lon)
+    # @param lat: latitudes (ndarray[N])
+    # @param lon: longitudes (ndarray[N])
+    # @return: Lanelet IDs (ndarray[N]), -1 if a point is not over a Lanelet
+    def points_ll_over_Lanelets(self, lat, lon):
+    
+        return self.points_xy_over_Lanelets(self.project_ll_to_xy(lat, lon))
       
        
     # Returns the left bounded Lanelet
@@ -328,15 +1764,11 @@ class LaneletMap:
     # @return: a left bounded Lanelet else None
     def get_leftBound_Lanelet(self, lane):
     
-        lanelets = self.lmap.laneletLayer.findUsages(lane.leftBound)
-        # In the list are the lane and the leftBound one 
-        if lane in lanelets:
-            lanelets.remove(lane) # remove the reference lanelet from list
-        
-        if len(lanelets) == 0:
+        left_id = self.get_topology().left_id(lane.id)
+        if left_id == None:
             return None
             
-        return lanelets[0]
+        return self.get_Lanelet_with_Id(left_id)
         
                         
     # Returns the right bounded lanelet
@@ -344,26 +1776,326 @@ class LaneletMap:
     # @return: a right bounded Lanelet else None
     def get_rightBound_Lanelet(self, lane):
     
-        lanelets = self.lmap.laneletLayer.findUsages(lane.rightBound)
-        # In the list are the lane and the rightBound one 
-        if lane in lanelets:
-            lanelets.remove(lane) # remove the reference lanelet from list
-        
-        if len(lanelets) == 0:
+        right_id = self.get_topology().right_id(lane.id)
+        if right_id == None:
             return None
                 
-        return lanelets[0]
+        return self.get_Lanelet_with_Id(right_id)
         
         
     # Return the directly following Lanlet
     # @param lane: a Lanelet
-    # @return: a following Lanelet    
+    # @return: a following Lanelet else None
     def get_following_Lanelet(self, lane):
     
-        if self.graph == None:
-            self.graph = self.get_graph()
-               
-        following_Lanelet_id = (self.graph.following(lane))[0].id
+        following_ids = self.get_topology().following_ids(lane.id)
+        if len(following_ids) == 0:
+            print("No following Lanelet of %s found!" % lane.id)
+            return None
+        
+        return self.get_Lanelet_with_Id(following_ids[0])
+    
+    
+    # Return all directly following Lanelets (e.g. at a fork)
+    # @param lane: a Lanelet
+    # @return: a list of following Lanelets
+    def get_following_Lanelets(self, lane):
+    
+        return [self.get_Lanelet_with_Id(ID) for ID in self.get_topology().following_ids(lane.id)]
+    
+    
+    # Return all directly preceding Lanelets (e.g. at a merge)
+    # @param lane: a Lanelet
+    # @return: a list of preceding Lanelets
+    def get_preceding_Lanelets(self, lane):
+    
+        return [self.get_Lanelet_with_Id(ID) for ID in self.get_topology().preceding_ids(lane.id)]
+    
+    
+    # Returns the neighbours of a batch of Lanelet IDs
+    # @param ids: Lanelet IDs (ndarray[N])
+    # @return: dict with "left", "right" (ndarray[N] of IDs, -1 if none) and
+    #          "following", "preceding" (offsets ndarray[N + 1], IDs) in CSR format
+    def get_neighbour_ids(self, ids):
+    
+        return self.get_topology().neighbours(ids)
+
+    
+    
+    # Returns the length of a Lanelet (length of the centerline)
+    # @param lane: a Lanelet
+    # @return: the length in meter (float)
+    def get_Lanelet_length(self, lane):
+    
+        length = self.lanelet_lengths.get(lane.id)
+        if length == None:
+            length = lanelet2.geometry.length2d(lane)
+            self.lanelet_lengths[lane.id] = length
+        
+        return length
+    
+    
+    # Returns the corridor ahead: the chain of following Lanelets with their neighbours
+    # At a fork the first following Lanelet is taken (as get_following_Lanelet()).
+    # The results are cached per (lane, n_or_distance) in an LRU cache of corridor_cache_size.
+    # @param lane: the start Lanelet
+    # @param n_or_distance: number of Lanelets (int) or distance in meter (float) incl. the start Lanelet,
+    #                       at most the number of Lanelets of the map
+    # @return: dict of read-only arrays "ids", "left", "right" (IDs, -1 if none) and
+    #          "length" (length of each Lanelet), else None
+    def get_corridor_ahead(self, lane, n_or_distance):
+    
+        topology = self.get_topology()
+        topology.update()
+        
+        # the map has changed
+        if self.corridor_cache_topology != (topology, topology.version):
+            self.corridor_cache.clear()
+            self.lanelet_lengths = {}
+            self.corridor_cache_topology = (topology, topology.version)
+        
+        key = (lane.id, n_or_distance)
+        corridor = self.corridor_cache.get(key)
+        if self.stats_recorder != None:
+            self.stats_recorder.count("corridor", corridor != None)
+        if corridor != None:
+            self.corridor_cache.move_to_end(key)
+            return corridor
+        
+        k = topology.row(lane.id)
+        if k < 0:
+            print("No Lanelet with ID %s found!" % lane.id)
+            return None
+        
+        ids_of = topology.columns["ids"]
+        lengths = []
+        
+        if isinstance(n_or_distance, (int, np.integer)):
+            rows = topology.chain(k, lambda row, n: n < n_or_distance)
+        else:
+            # go on until the distance is covered
+            covered = 0.0
+            def accept(row, n):
+                nonlocal covered
+                if covered >= n_or_distance:
+                    return False
+                lengths.append(self.get_Lanelet_length(self.get_Lanelet_with_Id(int(ids_of[row]))))
+                covered += lengths[-1]
+                return True
+            rows = topology.chain(k, accept)
+        
+        rows = np.array(rows, dtype=np.int64)
+        if len(lengths) != len(rows):
+            lengths = [self.get_Lanelet_length(self.get_Lanelet_with_Id(ID)) for ID in ids_of[rows].tolist()]
+        
+        left = topology.left[rows]
+        right = topology.right[rows]
+        corridor = {"ids": ids_of[rows],
+                    "left": np.where(left >= 0, ids_of[np.maximum(left, 0)], -1),
+                    "right": np.where(right >= 0, ids_of[np.maximum(right, 0)], -1),
+                    "length": np.array(lengths, dtype=np.float64)}
+        for array in corridor.values():
+            array.flags.writeable = False
+        
+        self.corridor_cache[key] = corridor
+        if len(self.corridor_cache) > self.corridor_cache_size:
+            self.corridor_cache.popitem(last=False)
+        
+        return corridor
+    
+    
+    # Clears the route cache and the routing graph if the map has changed
+    def check_route_cache(self):
+    
+        self.check_whole_map("routing")
+        
+        topology = self.get_topology()
+        topology.update()
+        
+        if self.route_cache_topology != (topology, topology.version):
+            if self.route_cache_topology != None:
+                self.graph = None
+                self.lanelet_lengths = {}
+            self.route_cache.clear()
+            self.route_cache_topology = (topology, topology.version)
+    
+    
+    # Returns the shortest path between two Lanelet IDs and its length, cached in an LRU cache of route_cache_size
+    # The length is the distance from the start of the first to the end of the last Lanelet,
+    # a lane change counts as a change without distance.
+    # @param from_id: ID of the start Lanelet (int)
+    # @param to_id: ID of the destination Lanelet (int)
+    # @return: (tuple of Lanelet IDs, length in meter), (None, None) if there is no route
+    def get_route_of_Ids(self, from_id: int, to_id: int):
+    
+        self.check_route_cache()
+        
+        key = (from_id, to_id)
+        route = self.route_cache.get(key)
+        if self.stats_recorder != None:
+            self.stats_recorder.count("route", route != None)
+        if route != None:
+            self.route_cache.move_to_end(key)
+            return route
+        
+        route = (None, None)
+        from_lane = self.get_Lanelet_with_Id(from_id)
+        to_lane = self.get_Lanelet_with_Id(to_id)
+        if from_lane != None and to_lane != None:
+            path = self.graph.shortestPath(from_lane, to_lane)
+            if path != None:
+                lanes = list(path)
+                successor = lanelet2.routing.RelationType.Successor
+                cost = sum(self.get_Lanelet_length(lane) for lane, next_lane in zip(lanes, lanes[1:])
+                           if self.graph.routingRelation(lane, next_lane) == successor)
+                route = (tuple(lane.id for lane in lanes), cost + self.get_Lanelet_length(lanes[-1]))
+        
+        self.route_cache[key] = route
+        if len(self.route_cache) > self.route_cache_size:
+            self.route_cache.popitem(last=False)
+        
+        return route
+    
+    
+    # Returns the shortest path between two Lanelets (routing graph, cached)
+    # @param from_lane: the start Lanelet
+    # @param to_lane: the destination Lanelet
+    # @return: tuple of Lanelet IDs from from_lane to to_lane, else None
+    def get_shortest_path(self, from_lane, to_lane):
+    
+        return self.get_route_of_Ids(from_lane.id, to_lane.id)[0]
+    
+    
+    # Returns the cost to go from a Lanelet to another: the length of the shortest path (cached)
+    # @param from_lane: the start Lanelet
+    # @param to_lane: the destination Lanelet
+    # @return: the distance in meter (float), else None
+    def get_cost_to_go(self, from_lane, to_lane):
+    
+        return self.get_route_of_Ids(from_lane.id, to_lane.id)[1]
+    
+    
+    # Returns the Lanelets reachable from a Lanelet within a routing cost (cached)
+    # @param lane: the start Lanelet
+    # @param max_cost: maximum routing cost, about meter (lane changes add a fixed cost)
+    # @return: tuple of Lanelet IDs
+    def get_reachable_set(self, lane, max_cost: float):
+    
+        self.check_route_cache()
+        
+        key = ("reachable", lane.id, float(max_cost))
+        reachable = self.route_cache.get(key)
+        if self.stats_recorder != None:
+            self.stats_recorder.count("route", reachable != None)
+        if reachable != None:
+            self.route_cache.move_to_end(key)
+            return reachable
+        
+        reachable = tuple(reached.id for reached in self.graph.reachableSet(lane, float(max_cost)))
+        
+        self.route_cache[key] = reachable
+        if len(self.route_cache) > self.route_cache_size:
+            self.route_cache.popitem(last=False)
+        
+        return reachable
+    
+    
+    # Returns the shortest paths and costs to go of a batch of origin-destination pairs
+    # Repeated pairs are routed once, known pairs come from the route cache.
+    # @param od_ids: pairs of Lanelet IDs (from, to) (ndarray[N, 2])
+    # @return: dict with "paths" (list of tuples of Lanelet IDs or None) and "costs" (ndarray[N], inf if no route)
+    def get_routes(self, od_ids):
+    
+        od_ids = np.asarray(od_ids, dtype=np.int64).reshape(-1, 2)
+        pairs, inverse = np.unique(od_ids, axis=0, return_inverse=True)
+        
+        routes = [self.get_route_of_Ids(from_id, to_id) for from_id, to_id in pairs.tolist()]
+        
+        costs = np.array([np.inf if cost == None else cost for _, cost in routes], dtype=np.float64)
+        paths = [routes[k][0] for k in inverse.reshape(-1).tolist()]
+        
+        return {"paths": paths, "costs": costs[inverse.reshape(-1)]}
+    
+    
+    # Validates the topology and geometry of the map on its snapshot arrays (see LaneletValidation.py)
+    # @param workers: number of worker processes for large maps, default os.cpu_count()
+    # @param tolerance: distance in meter below which two Points are duplicates (float)
+    # @param gap_tolerance: distance in meter of Lanelet ends to starts which should be connected (float)
+    # @return: the report (dict), with the errors of loadRobust in "load_errors" if the OSM file was parsed
+    def validate(self, workers = None, tolerance = DUPLICATE_TOLERANCE, gap_tolerance = GAP_TOLERANCE):
+    
+        with self.phase("validate"):
+            self.check_whole_map("validate()")
+            report = validate_snapshot(self.get_snapshot(complete=False), workers, tolerance, gap_tolerance)
+        
+        report["load_errors"] = self.load_errors
+        if self.load_errors:
+            report["errors"] += len(self.load_errors)
+            report["passed"] = False
+        
+        return report
+    
+    
+    # Switches on the statistics: calls and latencies of the methods of STATS_API_METHODS,
+    # load / write phases and cache hit rates. A call within another recorded call
+    # (e.g. get_Lanelet_with_Id() in get_following_Lanelet()) counts for the outer one only.
+    # @param window: number of latencies kept per method for the percentiles (int)
+    def enable_stats(self, window = 4096):
+    
+        if self.stats_recorder != None:
+            return
+        
+        self.stats_recorder = LaneletStats(window)
+        
+        # the timed wrappers shadow the methods of the class on this object only
+        for name in STATS_API_METHODS:
+            setattr(self, name, self.stats_recorder.wrap(name, getattr(self, name)))
+            self.stats_wrapped.append(name)
+    
+    
+    # Switches off the statistics and restores the plain methods
+    def disable_stats(self):
+    
+        if self.stats_recorder == None:
+            return
+        
+        self.stats_recorder.stop_dump()
+        for name in self.stats_wrapped:
+            delattr(self, name)
+        self.stats_wrapped = []
+        self.stats_recorder = None
+    
+    
+    # Returns the collected statistics
+    # @return: dict with "uptime_s", "methods" (calls, total_s, mean_us, p50_us, p90_us, p99_us, max_us),
+    #          "phases" (count, total_s, last_s) and "caches" (hits, misses, hit_rate), None if switched off
+    def stats(self):
+    
+        if self.stats_recorder == None:
+            print("Statistics are not enabled!")
+            return None
+        
+        return self.stats_recorder.snapshot()
+    
+    
+    # Dumps the statistics periodically in a background thread
+    # @param interval: seconds between two dumps (float)
+    # @param output: path of a file the statistics are appended to as JSON lines, or a function called with the dict
+    def dump_stats(self, interval: float, output):
+    
+        if self.stats_recorder == None:
+            print("Statistics are not enabled!")
+            return None
+        
+        self.stats_recorder.start_dump(interval, output)
+    
+    
+    # Returns a context that records the duration of a phase (e.g. "xml_parse") if the statistics are on
+    # @param name: name of the phase (str)
+    def phase(self, name: str):
+    
+        if self.stats_recorder == None:
+            return NO_PHASE
         
-        return self.get_Lanelet_with_Id(following_Lanelet_id)
+        return PhaseTimer(self.stats_recorder, name)
 
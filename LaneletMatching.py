@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from LaneletMap import LaneletMap
+
+# Streaming map matching of large trajectory CSV files in a process pool.
+#
+#   python LaneletMatching.py Data_Map.osm trajectory.csv matched.csv --columns x y --workers 8
+#   python LaneletMatching.py Data_Map.osm gnss.csv matched.csv --lat 49.0 --lon 8.4 --columns lat lon --ll
+#
+# The CSV file is read in chunks of lines by a generator, the chunks are parsed
+# and matched by the workers (LaneletMap.points_xy_over_Lanelets()) and written
+# back in input order, each line with the Lanelet ID (-1: not over a Lanelet)
+# as an additional column. Each worker opens the map once from its snapshot
+# (memory-mapped, see LaneletSnapshot.py). At most max_pending chunks are in
+# flight, so the memory stays bounded for files of any size.
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# map of a worker process ( later e.g. with init_worker() )
+worker_map = None
+
+
+# Reads a CSV file in chunks of lines
+# @param csv_file: path of the CSV file (str)
+# @param chunk_size: number of lines per chunk (int)
+# @param skip_header: skips the first line (bool)
+# @return: generator of lists of lines (without line break)
+def read_line_chunks(csv_file: str, chunk_size = DEFAULT_CHUNK_SIZE, skip_header = False):
+
+    with open(csv_file) as trajectory_file:
+        if skip_header:
+            trajectory_file.readline()
+
+        chunk = []
+        for line in trajectory_file:
+            line = line.rstrip("\r\n")
+            if line == "":
+                continue
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+        if len(chunk) > 0:
+            yield chunk
+
+
+# Returns the header of a CSV file, None if the first line is numeric
+# @param csv_file: path of the CSV file (str)
+# @return: list of column names or None
+def read_header(csv_file: str):
+
+    with open(csv_file) as trajectory_file:
+        first_line = trajectory_file.readline().rstrip("\r\n")
+
+    names = [name.strip() for name in first_line.split(",")]
+    try:
+        [float(name) for name in names]
+    except ValueError:
+        return names
+
+    return None
+
+
+# Loads the map of a worker process
+# @param lat, lon: origin of the map
+# @param osm_map_file: path of the OSM map (str)
+def init_worker(lat: float, lon: float, osm_map_file: str):
+
+    global worker_map
+
+    # the LaneletMap reports on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        worker_map = LaneletMap(lat, lon, osm_map_file, use_snapshot=True)
+
+
+# Parses and map-matches a chunk of CSV lines
+# @param lines: list of CSV lines
+# @param columns: indices of the (x, y) or (lat, lon) columns
+# @param ll: True for GPS points (lat, lon), False for local points (x, y) in meter
+# @param lanelet_map: the map, default the map of the worker process
+# @return: Lanelet IDs (ndarray[N])
+def match_lines(lines, columns, ll = False, lanelet_map = None):
+
+    if lanelet_map == None:
+        lanelet_map = worker_map
+
+    points = np.loadtxt(lines, delimiter=",", usecols=columns, dtype=np.float64, ndmin=2)
+
+    if ll:
+        return lanelet_map.points_ll_over_Lanelets(points[:, 0], points[:, 1])
+
+    return lanelet_map.points_xy_over_Lanelets(points)
+
+
+# Map-matches a chunk of CSV lines and formats it for the output file
+# @return: the lines with the Lanelet ID as an additional column (str)
+def match_chunk(lines, columns, ll = False, lanelet_map = None):
+
+    ids = match_lines(lines, columns, ll, lanelet_map)
+
+    return "".join("%s,%d\n" % (line, ID) for line, ID in zip(lines, ids.tolist()))
+
+
+# Map-matches a trajectory CSV file and writes it with an additional column of Lanelet IDs
+# @param osm_map_file: path of the OSM map (str)
+# @param csv_file: path of the trajectory CSV file (str)
+# @param output_file: path of the written CSV file (str)
+# @param lat, lon: origin of the map
+# @param columns: indices or header names of the (x, y) or (lat, lon) columns
+# @param ll: True for GPS points (lat, lon), False for local points (x, y) in meter
+# @param workers: number of worker processes, default os.cpu_count(); 1 matches in this process
+# @param chunk_size: number of lines per chunk (int)
+# @param max_pending: maximum number of chunks in flight, default 2 * workers
+# @return: number of matched lines
+def match_trajectory_file(osm_map_file: str, csv_file: str, output_file: str, lat = 0.0, lon = 0.0,
+                          columns = (0, 1), ll = False, workers = None, chunk_size = DEFAULT_CHUNK_SIZE,
+                          max_pending = None):
+
+    osm_map_file = os.path.abspath(osm_map_file)
+    if not os.path.exists(osm_map_file):
+        print("OSM map %s not found!" % osm_map_file)
+        return None
+
+    header = read_header(csv_file)
+    if any(isinstance(column, str) for column in columns):
+        if header == None or not all(column in header for column in columns):
+            print("Columns %s not found in the header of %s!" % (list(columns), csv_file))
+            return None
+        columns = tuple(header.index(column) for column in columns)
+
+    if workers == None:
+        workers = os.cpu_count() or 1
+    if max_pending == None:
+        max_pending = 2 * workers
+
+    # the snapshot is written once here, the workers only open it
+    lanelet_map = LaneletMap(lat, lon, osm_map_file, use_snapshot=True)
+
+    chunks = read_line_chunks(csv_file, chunk_size, skip_header=header != None)
+    n_lines = 0
+
+    with open(output_file, "w") as matched_file:
+        if header != None:
+            matched_file.write(",".join(header) + ",lanelet_id\n")
+
+        if workers == 1:
+            for lines in chunks:
+                matched_file.write(match_chunk(lines, columns, ll, lanelet_map))
+                n_lines += len(lines)
+            return n_lines
+
+        del lanelet_map
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(lat, lon, osm_map_file)) as pool:
+            pending = deque()
+            for lines in chunks:
+                pending.append((len(lines), pool.submit(match_chunk, lines, columns, ll)))
+
+                # in input order, bounded number of chunks in flight
+                while len(pending) >= max_pending or (len(pending) > 0 and pending[0][1].done()):
+                    n_done, future = pending.popleft()
+                    matched_file.write(future.result())
+                    n_lines += n_done
+
+            while len(pending) > 0:
+                n_done, future = pending.popleft()
+                matched_file.write(future.result())
+                n_lines += n_done
+
+    return n_lines
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Map-matches a trajectory CSV file against a Lanelet2 map")
+    parser.add_argument("osm_map_file")
+    parser.add_argument("csv_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--lat", type=float, default=0.0)
+    parser.add_argument("--lon", type=float, default=0.0)
+    parser.add_argument("--columns", nargs=2, default=["0", "1"], help="indices or header names of the point columns")
+    parser.add_argument("--ll", action="store_true", help="the columns are GPS points (lat, lon)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    columns = tuple(int(column) if column.isdigit() else column for column in args.columns)
+
+    start = time.perf_counter()
+    n_lines = match_trajectory_file(args.osm_map_file, args.csv_file, args.output_file, args.lat, args.lon,
+                                    columns, args.ll, args.workers, args.chunk_size)
+    if n_lines == None:
+        sys.exit(1)
+
+    seconds = time.perf_counter() - start
+    print("%d points matched in %.2f s (%.0f points/s)" % (n_lines, seconds, n_lines / max(seconds, 1e-9)))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import math
+import numpy as np
+
+# A vectorized UTM projection of whole arrays of GPS points (lat, lon).
+#
+# It reproduces lanelet2.projection.UtmProjector(lanelet2.io.Origin(lat, lon)):
+# all points are projected into the UTM zone of the origin and the local (x, y)
+# in meter is relative to the projected origin. The transverse Mercator
+# projection uses the Krueger series of 4th order in n (accuracy well below 1 mm
+# within a UTM zone).
+
+# WGS84 ellipsoid and UTM scale
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+UTM_K0 = 0.9996
+
+
+# Returns the standard UTM zone of a GPS point (incl. the Norway and Svalbard exceptions)
+# @param lat: latitude (float)
+# @param lon: longitude (float)
+# @return: the UTM zone (int)
+def utm_zone(lat: float, lon: float):
+
+    lon = (lon + 180.0) % 360.0 - 180.0
+    zone = int(math.floor((lon + 180.0) / 6.0)) + 1
+    zone = min(max(zone, 1), 60)
+
+    if 56.0 <= lat < 64.0 and 3.0 <= lon < 12.0:
+        zone = 32
+    if 72.0 <= lat < 84.0 and lon >= 0.0:
+        if lon < 9.0:
+            zone = 31
+        elif lon < 21.0:
+            zone = 33
+        elif lon < 33.0:
+            zone = 35
+        elif lon < 42.0:
+            zone = 37
+
+    return zone
+
+
+class UtmBatchProjector:
+    def __init__(self, lat = 0.0, lon = 0.0):
+
+        # Origin of the local map
+        self.lat = lat
+        self.lon = lon
+
+        # Central meridian of the UTM zone of the origin
+        self.zone = utm_zone(lat, lon)
+        self.lon0 = math.radians(6.0 * self.zone - 183.0)
+
+        # Krueger series coefficients
+        n = WGS84_F / (2 - WGS84_F)
+        self.e = 2 * math.sqrt(n) / (1 + n)
+        self.scale = UTM_K0 * WGS84_A / (1 + n) * (1 + n**2 / 4 + n**4 / 64)
+
+        self.alpha = np.array([n / 2 - 2 * n**2 / 3 + 5 * n**3 / 16 + 41 * n**4 / 180,
+                               13 * n**2 / 48 - 3 * n**3 / 5 + 557 * n**4 / 1440,
+                               61 * n**3 / 240 - 103 * n**4 / 140,
+                               49561 * n**4 / 161280])
+        self.beta = np.array([n / 2 - 2 * n**2 / 3 + 37 * n**3 / 96 - n**4 / 360,
+                              n**2 / 48 + n**3 / 15 - 437 * n**4 / 1440,
+                              17 * n**3 / 480 - 37 * n**4 / 840,
+                              4397 * n**4 / 161280])
+        self.delta = np.array([2 * n - 2 * n**2 / 3 - 2 * n**3 + 116 * n**4 / 45,
+                               7 * n**2 / 3 - 8 * n**3 / 5 - 227 * n**4 / 45,
+                               56 * n**3 / 15 - 136 * n**4 / 35,
+                               4279 * n**4 / 630])
+        self.j2 = 2 * np.arange(1, 5)
+
+        # Projected origin
+        self.offset = np.zeros(2)
+        self.offset = self.forward(np.array([lat]), np.array([lon]))[0]
+
+
+    # Projects GPS points to local (x, y) points
+    # @param lat: latitudes (ndarray[N])
+    # @param lon: longitudes (ndarray[N])
+    # @return: local points (ndarray[N, 2]) in meter
+    def forward(self, lat, lon):
+
+        phi = np.radians(np.asarray(lat, dtype=np.float64)).reshape(-1, 1)
+        lam = np.radians(np.asarray(lon, dtype=np.float64)).reshape(-1, 1) - self.lon0
+        lam = (lam + np.pi) % (2 * np.pi) - np.pi
+
+        sin_phi = np.sin(phi)
+        t = np.sinh(np.arctanh(sin_phi) - self.e * np.arctanh(self.e * sin_phi))
+        xi_ = np.arctan2(t, np.cos(lam))
+        eta_ = np.arctanh(np.sin(lam) / np.sqrt(1 + t**2))
+
+        xi = xi_ + np.sum(self.alpha * np.sin(self.j2 * xi_) * np.cosh(self.j2 * eta_), axis=1, keepdims=True)
+        eta = eta_ + np.sum(self.alpha * np.cos(self.j2 * xi_) * np.sinh(self.j2 * eta_), axis=1, keepdims=True)
+
+        return np.hstack((self.scale * eta, self.scale * xi)) - self.offset
+
+
+    # Projects local (x, y) points back to GPS points
+    # @param xy: local points (ndarray[N, 2]) in meter
+    # @return: (latitudes, longitudes) as two ndarray[N]
+    def reverse(self, xy):
+
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2) + self.offset
+        eta = xy[:, :1] / self.scale
+        xi = xy[:, 1:] / self.scale
+
+        xi_ = xi - np.sum(self.beta * np.sin(self.j2 * xi) * np.cosh(self.j2 * eta), axis=1, keepdims=True)
+        eta_ = eta - np.sum(self.beta * np.cos(self.j2 * xi) * np.sinh(self.j2 * eta), axis=1, keepdims=True)
+
+        chi = np.arcsin(np.sin(xi_) / np.cosh(eta_))
+        phi = chi + np.sum(self.delta * np.sin(self.j2 * chi), axis=1, keepdims=True)
+        lam = self.lon0 + np.arctan2(np.sinh(eta_), np.cos(xi_))
+
+        lon = (np.degrees(lam) + 180.0) % 360.0 - 180.0
+        return np.degrees(phi)[:, 0], lon[:, 0]
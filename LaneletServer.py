@@ -0,0 +1,639 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from LaneletMap import LaneletMap
+
+# Local map server: one resident LaneletMap for many tools.
+#
+#   python LaneletServer.py serve Data_Map.osm                     (Unix socket DEFAULT_SOCKET)
+#   python LaneletServer.py serve Data_Map.osm --port 8765         (localhost TCP)
+#   python LaneletServer.py loadtest --osm Data_Map.osm --clients 64 --requests 500
+#
+#   client = LaneletMapClient()
+#   ID = client.point_xy_over_Lanelet(x, y)
+#   following_id = client.get_following_Lanelet(ID)
+#
+# Protocol: one JSON object per line, {"id": 1, "method": "point_xy_over_Lanelet",
+# "args": [x, y]} is answered by {"id": 1, "result": ...} or {"id": 1, "error": "..."}.
+# A client may send further requests before the answers arrive; the answers
+# carry the id of their request.
+#
+# The server collects the requests of all clients per method and answers them
+# together with one vectorized call (points_xy_over_Lanelets(), get_neighbour_ids()):
+# a batch is run once the event loop has read all data received so far (or after
+# max_delay seconds), or at once when it holds max_batch requests.
+#
+# The client mirrors the LaneletMap API, but takes and returns Lanelet IDs
+# instead of Lanelets (a Lanelet is accepted as well).
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "lanelet_map.sock")
+DEFAULT_HOST = "127.0.0.1"
+
+
+# Returns a Lanelet ID or None of a batch result (-1: none)
+def optional_id(ID):
+    return ID if ID >= 0 else None
+
+
+# Returns the ID of a Lanelet or a Lanelet ID
+def lanelet_id(lane):
+    return int(getattr(lane, "id", lane))
+
+
+# Splits CSR results (offsets, IDs) into lists
+def split_ids(offsets, ids):
+    ids = ids.tolist()
+    offsets = offsets.tolist()
+    return [ids[begin:end] for begin, end in zip(offsets[:-1], offsets[1:])]
+
+
+class LaneletMapServer:
+    def __init__(self, lanelet_map, max_batch = 4096, max_delay = 0.0):
+
+        self.lanelet_map = lanelet_map
+
+        # Requests waiting for their batch: method -> list of (args, future)
+        self.pending = {}
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        # Methods answered in batches: name -> (function converting the args, function list of args -> list of results)
+        self.batched_methods = {
+            "point_xy_over_Lanelet": (lambda x, y: (float(x), float(y)), self.batch_point_xy),
+            "point_ll_over_Lanelet": (lambda lat, lon: (float(lat), float(lon)), self.batch_point_ll),
+            "get_leftBound_Lanelet": (int, lambda ids: self.batch_neighbours("left", ids)),
+            "get_rightBound_Lanelet": (int, lambda ids: self.batch_neighbours("right", ids)),
+            "get_following_Lanelet": (int, lambda ids: self.batch_neighbours("following_first", ids)),
+            "get_following_Lanelets": (int, lambda ids: self.batch_neighbours("following", ids)),
+            "get_preceding_Lanelets": (int, lambda ids: self.batch_neighbours("preceding", ids))}
+
+        # Methods answered one by one (already vectorized or rare)
+        self.direct_methods = {
+            "points_xy_over_Lanelets": self.points_xy_over_Lanelets,
+            "points_ll_over_Lanelets": self.points_ll_over_Lanelets,
+            "get_neighbour_ids": self.get_neighbour_ids,
+            "get_map_info": self.get_map_info,
+            "get_server_stats": self.get_server_stats}
+
+        # number of requests and batches
+        self.n_requests = 0
+        self.n_batches = 0
+
+        # asyncio server ( later e.g. with start() )
+        self.server = None
+        self.socket_path = None
+
+
+    # Starts listening on a Unix socket or on a TCP port of localhost
+    # @param socket_path: path of the Unix socket (String), used if port is None
+    # @param host: host of the TCP port (String)
+    # @param port: TCP port (int)
+    async def start(self, socket_path = DEFAULT_SOCKET, host = DEFAULT_HOST, port = None):
+
+        if port != None:
+            self.server = await asyncio.start_server(self.handle_client, host, port)
+            return
+
+        # a socket file left by a stopped server
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.server = await asyncio.start_unix_server(self.handle_client, socket_path)
+        self.socket_path = socket_path
+
+
+    # Serves until cancelled, then removes the socket file
+    async def serve_forever(self):
+
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            if self.socket_path != None and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+    # Reads the requests of one client and answers them when their batch is done
+    # The answers of a batch are drained together before the next batch, so a client
+    # which does not read its answers stops the reading of its requests.
+    async def handle_client(self, reader, writer):
+
+        # drain of the answers written by the last batch ( later e.g. with respond() )
+        draining = None
+
+        async def drain():
+            with contextlib.suppress(ConnectionError):
+                await writer.drain()
+
+        def respond(response):
+            nonlocal draining
+            if writer.is_closing():
+                return
+            writer.write((json.dumps(response) + "\n").encode())
+            if draining == None or draining.done():
+                draining = asyncio.ensure_future(drain())
+
+        def answer(request_id, future):
+            if future.exception() != None:
+                respond({"id": request_id, "error": str(future.exception())})
+            else:
+                respond({"id": request_id, "result": future.result()})
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                    future = self.submit(request["method"], request.get("args", []))
+                except (ValueError, KeyError, TypeError, AttributeError) as err:
+                    respond({"id": None, "error": "invalid request: %s" % err})
+                    continue
+
+                future.add_done_callback(lambda done, request_id=request_id: answer(request_id, done))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if draining != None:
+                await draining
+            writer.close()
+
+
+    # Submits a request
+    # @param method: name of the LaneletMap method (String)
+    # @param args: list of arguments
+    # @return: an asyncio Future of the result
+    def submit(self, method: str, args):
+
+        self.n_requests += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if method in self.direct_methods:
+            try:
+                future.set_result(self.direct_methods[method](*args))
+            except Exception as err:
+                future.set_exception(err)
+            return future
+
+        if method not in self.batched_methods:
+            future.set_exception(ValueError("unknown method %s" % method))
+            return future
+
+        # the arguments are checked here, so a bad request does not fail its batch
+        convert, _ = self.batched_methods[method]
+        try:
+            args = convert(*args)
+        except (ValueError, TypeError) as err:
+            future.set_exception(ValueError("invalid arguments of %s: %s" % (method, err)))
+            return future
+
+        pending = self.pending.setdefault(method, [])
+        if len(pending) == 0:
+            if self.max_delay > 0.0:
+                loop.call_later(self.max_delay, self.flush, method)
+            else:
+                loop.call_soon(self.flush, method)
+        pending.append((args, future))
+
+        if len(pending) >= self.max_batch:
+            self.flush(method)
+
+        return future
+
+
+    # Answers the pending requests of a method with one vectorized call
+    # @param method: name of the LaneletMap method (String)
+    def flush(self, method: str):
+
+        pending = self.pending.get(method)
+        if not pending:
+            return
+        self.pending[method] = []
+        self.n_batches += 1
+
+        _, batch = self.batched_methods[method]
+        try:
+            results = batch([args for args, _ in pending])
+        except Exception as err:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+    # Batch of point_xy_over_Lanelet(): list of (x, y) -> list of IDs or None
+    def batch_point_xy(self, points):
+
+        ids = self.lanelet_map.points_xy_over_Lanelets(np.array(points, dtype=np.float64).reshape(-1, 2))
+        return [optional_id(ID) for ID in ids.tolist()]
+
+
+    # Batch of point_ll_over_Lanelet(): list of (lat, lon) -> list of IDs or None
+    def batch_point_ll(self, points):
+
+        points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        ids = self.lanelet_map.points_ll_over_Lanelets(points[:, 0], points[:, 1])
+        return [optional_id(ID) for ID in ids.tolist()]
+
+
+    # Batch of the neighbour queries
+    # @param name: "left", "right", "following_first", "following" or "preceding"
+    # @param ids: list of Lanelet IDs
+    # @return: list of IDs or None ("left", "right", "following_first"), else list of lists of IDs
+    def batch_neighbours(self, name: str, ids):
+
+        neighbours = self.lanelet_map.get_neighbour_ids(np.array(ids, dtype=np.int64))
+
+        if name in ("left", "right"):
+            return [optional_id(ID) for ID in neighbours[name].tolist()]
+
+        lists = split_ids(*neighbours["following" if name == "following_first" else name])
+        if name == "following_first":
+            return [following[0] if len(following) > 0 else None for following in lists]
+
+        return lists
+
+
+    # points_xy_over_Lanelets(): list of (x, y) -> list of IDs (-1: none)
+    def points_xy_over_Lanelets(self, points):
+
+        return self.lanelet_map.points_xy_over_Lanelets(np.array(points, dtype=np.float64).reshape(-1, 2)).tolist()
+
+
+    # points_ll_over_Lanelets(): lists of lat and lon -> list of IDs (-1: none)
+    def points_ll_over_Lanelets(self, lat, lon):
+
+        return self.lanelet_map.points_ll_over_Lanelets(np.array(lat, dtype=np.float64),
+                                                        np.array(lon, dtype=np.float64)).tolist()
+
+
+    # get_neighbour_ids(): list of IDs -> dict of "left", "right" (lists) and "following", "preceding" (lists of lists)
+    def get_neighbour_ids(self, ids):
+
+        neighbours = self.lanelet_map.get_neighbour_ids(np.array(ids, dtype=np.int64))
+        return {"left": neighbours["left"].tolist(), "right": neighbours["right"].tolist(),
+                "following": split_ids(*neighbours["following"]), "preceding": split_ids(*neighbours["preceding"])}
+
+
+    # Returns the origin, the extent (xmin, ymin, xmax, ymax) and a sample of the Lanelet IDs of the map
+    # @param n_samples: number of sampled Lanelet IDs (int)
+    def get_map_info(self, n_samples = 1000):
+
+        topology = self.lanelet_map.get_topology()
+        topology.update()
+        ids = topology.columns["ids"]
+        xy = self.lanelet_map.get_geometry_arrays()["xy"]
+
+        bbox = xy.min(axis=0).tolist() + xy.max(axis=0).tolist() if len(xy) > 0 else None
+        sample = ids[np.linspace(0, len(ids) - 1, min(n_samples, len(ids))).astype(np.int64)] if len(ids) > 0 else ids
+
+        return {"origin": [self.lanelet_map.lat, self.lanelet_map.lon], "lanelets": len(ids), "bbox": bbox,
+                "lanelet_ids": sample.tolist()}
+
+
+    # Returns the number of requests, batches and the mean batch size
+    def get_server_stats(self):
+
+        return {"requests": self.n_requests, "batches": self.n_batches,
+                "mean_batch": self.n_requests / self.n_batches if self.n_batches > 0 else 0.0}
+
+
+# Loads a map and serves it until interrupted
+# @param osm_map_file: path of the OSM map (String)
+# @param lat, lon: origin of the map
+# @param socket_path, host, port: address (see LaneletMapServer.start())
+# @param max_batch, max_delay: batching (see LaneletMapServer)
+def serve(osm_map_file: str, lat = 0.0, lon = 0.0, socket_path = DEFAULT_SOCKET, host = DEFAULT_HOST, port = None,
+          max_batch = 4096, max_delay = 0.0):
+
+    # the snapshot makes a restart fast
+    lanelet_map = LaneletMap(lat, lon, osm_map_file, use_snapshot=True)
+    server = LaneletMapServer(lanelet_map, max_batch, max_delay)
+
+    # the spatial index and the neighbour table are built before the first client
+    lanelet_map.points_xy_over_Lanelets(np.zeros((1, 2)))
+    lanelet_map.get_topology().update()
+
+    async def run():
+        await server.start(socket_path, host, port)
+        print("serving %s on %s" % (osm_map_file, "%s:%d" % (host, port) if port != None else socket_path), flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+class LaneletMapClient:
+    def __init__(self, socket_path = DEFAULT_SOCKET, host = DEFAULT_HOST, port = None, timeout = None):
+
+        # blocking connection to the server
+        if port != None:
+            self.connection = socket.create_connection((host, port), timeout)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.settimeout(timeout)
+            self.connection.connect(socket_path)
+        self.stream = self.connection.makefile("rwb")
+        self.request_id = 0
+
+
+    # Calls a method of the map on the server
+    # @param method: name of the LaneletMap method (String)
+    # @return: the result, None on errors
+    def call(self, method: str, *args):
+
+        self.request_id += 1
+        self.stream.write((json.dumps({"id": self.request_id, "method": method, "args": list(args)}) + "\n").encode())
+        self.stream.flush()
+
+        response = json.loads(self.stream.readline())
+        if "error" in response:
+            print("%s failed: %s" % (method, response["error"]))
+            return None
+
+        return response["result"]
+
+
+    # Returns the Lanelet ID, if a point (x, y) is over a Lanelet, else None
+    def point_xy_over_Lanelet(self, x: float, y: float):
+        return self.call("point_xy_over_Lanelet", float(x), float(y))
+
+    # Returns the Lanelet ID, if a point (lat, lon) is over a Lanelet, else None
+    def point_ll_over_Lanelet(self, lat: float, lon: float):
+        return self.call("point_ll_over_Lanelet", float(lat), float(lon))
+
+
+    # Returns the Lanelet IDs for a batch of points (x, y) (ndarray[N], -1 if none)
+    def points_xy_over_Lanelets(self, xy):
+        ids = self.call("points_xy_over_Lanelets", np.asarray(xy, dtype=np.float64).reshape(-1, 2).tolist())
+        return np.array(ids, dtype=np.int64) if ids != None else None
+
+    # Returns the Lanelet IDs for a batch of GPS points (lat, lon) (ndarray[N], -1 if none)
+    def points_ll_over_Lanelets(self, lat, lon):
+        ids = self.call("points_ll_over_Lanelets", np.asarray(lat, dtype=np.float64).tolist(),
+                        np.asarray(lon, dtype=np.float64).tolist())
+        return np.array(ids, dtype=np.int64) if ids != None else None
+
+
+    # Returns the ID of the left / right Lanelet, else None
+    # @param lane: a Lanelet or a Lanelet ID
+    def get_leftBound_Lanelet(self, lane):
+        return self.call("get_leftBound_Lanelet", lanelet_id(lane))
+
+    def get_rightBound_Lanelet(self, lane):
+        return self.call("get_rightBound_Lanelet", lanelet_id(lane))
+
+
+    # Returns the ID of the directly following Lanelet, else None
+    # @param lane: a Lanelet or a Lanelet ID
+    def get_following_Lanelet(self, lane):
+        return self.call("get_following_Lanelet", lanelet_id(lane))
+
+    # Returns the IDs of all directly following / preceding Lanelets
+    # @param lane: a Lanelet or a Lanelet ID
+    def get_following_Lanelets(self, lane):
+        return self.call("get_following_Lanelets", lanelet_id(lane))
+
+    def get_preceding_Lanelets(self, lane):
+        return self.call("get_preceding_Lanelets", lanelet_id(lane))
+
+
+    # Returns the neighbours of a batch of Lanelet IDs
+    # @return: dict with "left", "right" (lists of IDs, -1 if none), "following" and "preceding" (lists of lists)
+    def get_neighbour_ids(self, ids):
+        return self.call("get_neighbour_ids", np.asarray(ids, dtype=np.int64).reshape(-1).tolist())
+
+
+    # Closes the connection
+    def close(self):
+
+        self.stream.close()
+        self.connection.close()
+
+
+class AsyncLaneletMapClient:
+    def __init__(self, reader, writer):
+
+        # connection and the requests waiting for their answer: id -> Future
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}
+        self.request_id = 0
+        self.receiver = asyncio.ensure_future(self.receive())
+
+
+    # Connects to the server
+    # @param socket_path, host, port: address (see LaneletMapServer.start())
+    # @return: an AsyncLaneletMapClient
+    @classmethod
+    async def connect(cls, socket_path = DEFAULT_SOCKET, host = DEFAULT_HOST, port = None):
+
+        if port != None:
+            reader, writer = await asyncio.open_connection(host, port)
+        else:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+
+        return cls(reader, writer)
+
+
+    # Dispatches the answers to the waiting requests
+    async def receive(self):
+
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.waiting.pop(response.get("id"), None)
+                if future != None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to the map server closed"))
+            self.waiting = {}
+
+
+    # Calls a method of the map on the server; several calls may wait at the same time
+    # @param method: name of the LaneletMap method (String)
+    # @return: the result, None on errors
+    async def call(self, method: str, *args):
+
+        self.request_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.request_id] = future
+        self.writer.write((json.dumps({"id": self.request_id, "method": method, "args": list(args)}) + "\n").encode())
+
+        response = await future
+        if "error" in response:
+            print("%s failed: %s" % (method, response["error"]))
+            return None
+
+        return response["result"]
+
+
+    async def point_xy_over_Lanelet(self, x: float, y: float):
+        return await self.call("point_xy_over_Lanelet", float(x), float(y))
+
+    async def point_ll_over_Lanelet(self, lat: float, lon: float):
+        return await self.call("point_ll_over_Lanelet", float(lat), float(lon))
+
+    async def get_leftBound_Lanelet(self, lane):
+        return await self.call("get_leftBound_Lanelet", lanelet_id(lane))
+
+    async def get_rightBound_Lanelet(self, lane):
+        return await self.call("get_rightBound_Lanelet", lanelet_id(lane))
+
+    async def get_following_Lanelet(self, lane):
+        return await self.call("get_following_Lanelet", lanelet_id(lane))
+
+    async def get_following_Lanelets(self, lane):
+        return await self.call("get_following_Lanelets", lanelet_id(lane))
+
+    async def get_preceding_Lanelets(self, lane):
+        return await self.call("get_preceding_Lanelets", lanelet_id(lane))
+
+
+    # Closes the connection
+    async def close(self):
+
+        self.writer.close()
+        with contextlib.suppress(ConnectionError):
+            await self.writer.wait_closed()
+        self.receiver.cancel()
+
+
+# Queries of the load test
+LOAD_TEST_METHODS = ("point_xy_over_Lanelet", "get_following_Lanelet", "get_leftBound_Lanelet", "get_rightBound_Lanelet")
+
+
+# Runs many concurrent clients against a server, each sending its next request after the answer
+# @param n_clients: number of connections (int)
+# @param n_requests: requests per client (int)
+# @param socket_path, host, port: address (see LaneletMapServer.start())
+# @param methods: the queries, chosen at random
+# @return: dict with "requests", "seconds", "throughput" (requests/s), "p50_ms", "p99_ms", "max_ms" and "server"
+async def load_test(n_clients = 64, n_requests = 500, socket_path = DEFAULT_SOCKET, host = DEFAULT_HOST, port = None,
+                    methods = LOAD_TEST_METHODS):
+
+    clients = [await AsyncLaneletMapClient.connect(socket_path, host, port) for _ in range(n_clients)]
+    info = await clients[0].call("get_map_info")
+    stats_before = await clients[0].call("get_server_stats")
+
+    xmin, ymin, xmax, ymax = info["bbox"]
+    lanelet_ids = info["lanelet_ids"]
+
+    async def run_client(client, k):
+        client_rng = np.random.default_rng(k)
+        latencies = []
+        for method in client_rng.choice(methods, n_requests).tolist():
+            if method.startswith("point_xy"):
+                args = (float(client_rng.uniform(xmin, xmax)), float(client_rng.uniform(ymin, ymax)))
+            else:
+                args = (int(client_rng.choice(lanelet_ids)),)
+            start = time.perf_counter()
+            await client.call(method, *args)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    latencies = np.concatenate(await asyncio.gather(*(run_client(client, k) for k, client in enumerate(clients))))
+    seconds = time.perf_counter() - start
+
+    stats_after = await clients[0].call("get_server_stats")
+    for client in clients:
+        await client.close()
+
+    batches = stats_after["batches"] - stats_before["batches"]
+    requests = stats_after["requests"] - stats_before["requests"] - 1
+
+    return {"requests": len(latencies), "seconds": seconds, "throughput": len(latencies) / seconds,
+            "p50_ms": float(np.percentile(latencies, 50) * 1e3), "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+            "max_ms": float(latencies.max() * 1e3),
+            "server": {"lanelets": info["lanelets"], "batches": batches,
+                       "mean_batch": requests / batches if batches > 0 else 0.0}}
+
+
+# Starts a server in a new process and waits until it accepts connections
+# @return: the subprocess.Popen
+def start_server_process(osm_map_file: str, lat: float, lon: float, socket_path: str, host: str, port, timeout = 300.0):
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.abspath(__file__), "serve", osm_map_file, "--lat", str(lat), "--lon", str(lon)]
+    command += ["--port", str(port), "--host", host] if port != None else ["--socket", socket_path]
+    if port == None and os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (package_dir, os.environ.get("PYTHONPATH")))))
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, env=env)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() == None:
+        try:
+            LaneletMapClient(socket_path, host, port).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError("map server did not start")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Local map server with batched queries")
+    parser.add_argument("command", choices=("serve", "loadtest"))
+    parser.add_argument("osm_map_file", nargs="?", default=None)
+    parser.add_argument("--lat", type=float, default=0.0)
+    parser.add_argument("--lon", type=float, default=0.0)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path of the Unix socket")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=None, help="serve on localhost TCP instead of the Unix socket")
+    parser.add_argument("--max-batch", type=int, default=4096)
+    parser.add_argument("--max-delay", type=float, default=0.0, help="seconds a batch waits for more requests")
+    parser.add_argument("--osm", default=None, help="loadtest: start a server of this map first")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=500, help="requests per client")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.osm_map_file == None:
+            parser.error("serve needs the osm_map_file")
+        serve(args.osm_map_file, args.lat, args.lon, args.socket, args.host, args.port, args.max_batch, args.max_delay)
+
+    else:
+        process = None
+        if args.osm != None:
+            process = start_server_process(args.osm, args.lat, args.lon, args.socket, args.host, args.port)
+        try:
+            report = asyncio.run(load_test(args.clients, args.requests, args.socket, args.host, args.port))
+        finally:
+            if process != None:
+                process.terminate()
+                process.wait()
+
+        print("%d clients, %d requests in %.2f s: %.0f requests/s, p50 %.3f ms, p99 %.3f ms, max %.3f ms, mean batch %.1f" %
+              (args.clients, report["requests"], report["seconds"], report["throughput"], report["p50_ms"],
+               report["p99_ms"], report["max_ms"], report["server"]["mean_batch"]))
@@ -0,0 +1,573 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import lanelet2.core as lncore
+from lanelet2.core import (LineString3d, Point3d, Lanelet)
+from LaneletIndex import LaneletGridIndex, LaneletTopology
+
+# A compact binary snapshot of a Lanelet2 map for a fast start.
+#
+# File layout:
+#   8 bytes    magic "LLSNAP01"
+#   8 bytes    length of the JSON header (little endian)
+#   header     JSON: key, origin, string table and the table of arrays
+#   arrays     raw little endian arrays, each aligned to 64 bytes
+#
+# All arrays are opened with np.memmap, so opening a snapshot only reads the
+# header. Elements are sorted by ID, an ID is found with a binary search.
+# Points, LineStrings and Lanelets are created on demand. Areas, polygons and
+# regulatory elements are not part of the snapshot: a map with any of them is not
+# exported (ValueError), so it always starts from its OSM file and a warm start
+# never gives another map or routing graph than a cold start.
+#
+# The neighbour table (LaneletTopology) is stored, so neighbour queries,
+# corridors and map matching run on the arrays. lanelet2 cannot restore a
+# RoutingGraph from arrays: the first routing query of a map started from a
+# snapshot creates its Lanelet2 map and builds the RoutingGraph, i.e. the warm
+# start defers this cost to the first route, it does not save it.
+#
+# The same layout can be published into a block of shared memory
+# (MapSnapshot.publish()) and attached by other processes
+# (MapSnapshot.attach()). Like the memory-mapped file, all processes then read
+# the same pages: the arrays are never copied into a process.
+#
+# Arrays:
+#   point_ids [P], point_xyz [P, 3]
+#   line_ids [S], line_offsets [S + 1], line_points [..]    (CSR of point indices)
+#   lanelet_ids [L], lanelet_left [L], lanelet_right [L], lanelet_center [L]
+#   lanelet_flags [L]                                      (bit 0/1: left/right bound inverted)
+#   attr_kind [A], attr_owner [A], attr_key [A], attr_value [A]
+#   attr_owner_key [A]                                     (kind << 48 | owner, sorted)
+#   poly_offsets [L + 1], poly_xy [.., 2]                  (Lanelet polygons)
+#   grid_* [..]                                            (LaneletGridIndex.to_arrays())
+#   topology_* [L], left, right, following, preceding, .. (LaneletTopology.to_arrays())
+
+SNAPSHOT_MAGIC = b"LLSNAP01"
+SNAPSHOT_VERSION = 5
+SNAPSHOT_ALIGN = 64
+
+# Names of the blocks of shared memory published by this process (and inherited by forked workers):
+# their resource tracker is the one of the publisher
+PUBLISHED_BLOCKS = set()
+
+# owner kinds of the attributes
+KIND_POINT = 0
+KIND_LINE = 1
+KIND_LANELET = 2
+
+
+# Returns the layers of a Lanelet2 map a snapshot does not hold
+# @param lmap: a lanelet2.core.LaneletMap
+# @return: names of the non-empty layers (list), empty if the map fits into a snapshot
+def unsupported_layers(lmap):
+
+    return [name for name, layer in (("areas", lmap.areaLayer), ("polygons", lmap.polygonLayer),
+                                     ("regulatory elements", lmap.regulatoryElementLayer)) if len(layer) > 0]
+
+
+# Returns the snapshot key of an OSM file: hash of the file content and the origin
+# @param osm_path: path of the OSM file (str)
+# @param lat: origin latitude (float)
+# @param lon: origin longitude (float)
+# @return: the key (str)
+def snapshot_key(osm_path: str, lat: float, lon: float):
+
+    digest = hashlib.sha256()
+    with open(osm_path, "rb") as osm_file:
+        for block in iter(lambda: osm_file.read(1 << 20), b""):
+            digest.update(block)
+
+    digest.update(("%d|%r|%r" % (SNAPSHOT_VERSION, float(lat), float(lon))).encode())
+    return digest.hexdigest()
+
+
+# Lays out a header and a dict of arrays
+# @param header: JSON serializable dict
+# @param arrays: dict name -> ndarray
+# @return: (prefix: magic, length and header (bytes), start of the data, table of arrays, total size)
+def snapshot_layout(header: dict, arrays: dict):
+
+    header = dict(header)
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {"dtype": array.dtype.newbyteorder("<").str, "shape": list(array.shape), "offset": offset}
+        offset += (array.nbytes + SNAPSHOT_ALIGN - 1) // SNAPSHOT_ALIGN * SNAPSHOT_ALIGN
+    header["arrays"] = table
+
+    # the data starts aligned behind the header
+    encoded = json.dumps(header).encode()
+    data_start = (16 + len(encoded) + SNAPSHOT_ALIGN - 1) // SNAPSHOT_ALIGN * SNAPSHOT_ALIGN
+    encoded = encoded.ljust(data_start - 16)
+    prefix = SNAPSHOT_MAGIC + len(encoded).to_bytes(8, "little") + encoded
+
+    return prefix, data_start, table, data_start + offset
+
+
+# Writes a header and a dict of arrays into a snapshot file
+# @param path: path of the snapshot file (str)
+# @param header: JSON serializable dict
+# @param arrays: dict name -> ndarray
+def write_snapshot_file(path: str, header: dict, arrays: dict):
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    prefix, data_start, table, size = snapshot_layout(header, arrays)
+
+    # write to a temporary file, then replace: readers never see a half written snapshot
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "wb") as snap_file:
+        snap_file.write(prefix)
+        for name, array in arrays.items():
+            snap_file.seek(data_start + table[name]["offset"])
+            snap_file.write(array.astype(table[name]["dtype"], copy=False).tobytes())
+        snap_file.truncate(size)
+
+    os.replace(tmp_path, path)
+
+
+# Writes a header and a dict of arrays into a new block of shared memory
+# @param header: JSON serializable dict
+# @param arrays: dict name -> ndarray
+# @param name: name of the block (str), default a random name
+# @return: the multiprocessing.shared_memory.SharedMemory, the caller closes and unlinks it
+def write_snapshot_shared(header: dict, arrays: dict, name = None):
+
+    arrays = {name_: np.ascontiguousarray(array) for name_, array in arrays.items()}
+    prefix, data_start, table, size = snapshot_layout(header, arrays)
+
+    block = shared_memory.SharedMemory(name=name, create=True, size=size)
+    PUBLISHED_BLOCKS.add(block.name)
+    block.buf[:len(prefix)] = prefix
+    for array_name, array in arrays.items():
+        entry = table[array_name]
+        target = np.ndarray(array.shape, dtype=entry["dtype"], buffer=block.buf, offset=data_start + entry["offset"])
+        target[...] = array
+        del target
+
+    return block
+
+
+# Reads the header of a snapshot in a buffer (e.g. shared memory) and returns views of its arrays
+# @param buffer: a buffer holding a snapshot
+# @return: (header, dict name -> read-only ndarray) else (None, None)
+def read_snapshot_buffer(buffer):
+
+    if bytes(buffer[:8]) != SNAPSHOT_MAGIC:
+        return None, None
+    header_len = int.from_bytes(bytes(buffer[8:16]), "little")
+    header = json.loads(bytes(buffer[16:16 + header_len]))
+
+    data_start = 16 + header_len
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        array = np.ndarray(tuple(entry["shape"]), dtype=entry["dtype"], buffer=buffer,
+                           offset=data_start + entry["offset"])
+        array.flags.writeable = False
+        arrays[name] = array
+
+    return header, arrays
+
+
+# Reads the header of a snapshot file and maps its arrays into memory
+# @param path: path of the snapshot file (str)
+# @return: (header, dict name -> read-only ndarray) else (None, None)
+def read_snapshot_file(path: str):
+
+    if not os.path.exists(path):
+        return None, None
+
+    with open(path, "rb") as snap_file:
+        if snap_file.read(8) != SNAPSHOT_MAGIC:
+            return None, None
+        header_len = int.from_bytes(snap_file.read(8), "little")
+        header = json.loads(snap_file.read(header_len))
+
+    data_start = 16 + header_len
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        shape = tuple(entry["shape"])
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype=entry["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=entry["dtype"], mode="r",
+                                     offset=data_start + entry["offset"], shape=shape)
+
+    return header, arrays
+
+
+# Packs the LineStrings and the bounds of the Lanelets into read-only arrays
+# @param line_ids: IDs of the LineStrings [S]
+# @param line_offsets: the points of the LineString k are xyz[line_offsets[k]:line_offsets[k + 1]] [S + 1]
+# @param xyz: points of all LineStrings [M, 3]
+# @param lanelet_ids: IDs of the Lanelets [L]
+# @param left, right, center: index of the left / right bound and the centerline LineString [L], -1 if none
+# @param flags: bit 0/1: left/right bound inverted [L]
+# @return: dict with "line_ids", "line_offsets", "xyz", "xy" (view of xyz), "lanelet_ids",
+#          "lanelet_lines" [L, 3] (left, right, center), "lanelet_left", "lanelet_right",
+#          "lanelet_center" [L, 2] ((begin, end) in xyz, (-1, -1) if none) and "lanelet_inverted" [L, 2]
+def pack_geometry(line_ids, line_offsets, xyz, lanelet_ids, left, right, center, flags):
+
+    line_offsets = np.asarray(line_offsets, dtype=np.int64)
+    xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+    lanelet_lines = np.stack([np.asarray(lines, dtype=np.int64).reshape(-1) for lines in (left, right, center)], axis=1)
+    flags = np.asarray(flags, dtype=np.int64).reshape(-1)
+
+    geometry = {"line_ids": np.asarray(line_ids, dtype=np.int64), "line_offsets": line_offsets,
+                "xyz": xyz, "xy": xyz[:, :2],
+                "lanelet_ids": np.asarray(lanelet_ids, dtype=np.int64), "lanelet_lines": lanelet_lines}
+
+    for j, name in enumerate(("left", "right", "center")):
+        lines = lanelet_lines[:, j]
+        pairs = np.stack((line_offsets[np.maximum(lines, 0)], line_offsets[np.maximum(lines, 0) + 1]), axis=1)
+        pairs[lines < 0] = -1
+        geometry["lanelet_" + name] = pairs
+
+    geometry["lanelet_inverted"] = np.stack(((flags & 1) != 0, (flags & 2) != 0), axis=1)
+
+    for array in geometry.values():
+        array.flags.writeable = False
+
+    return geometry
+
+
+class MapSnapshot:
+    def __init__(self, header: dict, arrays: dict):
+
+        # key, origin and string table
+        self.header = header
+        self.key = header.get("key")
+        self.strings = header.get("strings", [])
+
+        # read-only arrays (see above)
+        self.arrays = arrays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+        # Points, LineStrings and Lanelets created so far: ID -> object
+        self.points = {}
+        self.lines = {}
+        self.lanelets = {}
+
+        # Neighbour table ( later e.g. with get_topology() )
+        self.topology = None
+
+        # Spatial index of the Lanelet polygons ( later e.g. with get_spatial_index() )
+        self.spatial_index = None
+
+        # Packed geometry ( later e.g. with get_geometry_arrays() )
+        self.geometry = None
+
+        # Block of shared memory holding the arrays ( later e.g. with attach() )
+        self.shared_block = None
+
+        # new IDs of the process must not collide with the IDs of the snapshot
+        max_id = 0
+        for ids in (self.point_ids, self.line_ids, self.lanelet_ids):
+            if len(ids) > 0:
+                max_id = max(max_id, int(ids[-1]))
+        lncore.registerId(max_id)
+
+
+    # Opens a snapshot file
+    # @param path: path of the snapshot file (str)
+    # @param key: expected key (str) or None to accept any snapshot
+    # @return: a MapSnapshot else None, if the file is missing, invalid or stale
+    @staticmethod
+    def open(path: str, key = None):
+
+        try:
+            header, arrays = read_snapshot_file(path)
+        except (OSError, ValueError):
+            return None
+
+        if header == None or header.get("version") != SNAPSHOT_VERSION:
+            return None
+        if key != None and header.get("key") != key:
+            return None
+
+        return MapSnapshot(header, arrays)
+
+
+    # Attaches a snapshot published into shared memory by another process
+    # @param name: name of the block of shared memory (str)
+    # @param key: expected key (str) or None to accept any snapshot
+    # @return: a MapSnapshot else None, if the block is missing, invalid or stale
+    @staticmethod
+    def attach(name: str, key = None):
+
+        # the publisher owns the block: the resource tracker of an attached process must not
+        # unlink it at the exit of the process (before Python 3.13 every attach is tracked;
+        # the tracker of POSIX shared memory knows the name with a leading slash)
+        try:
+            if sys.version_info >= (3, 13):
+                block = shared_memory.SharedMemory(name=name, track=False)
+            else:
+                block = shared_memory.SharedMemory(name=name)
+                if os.name == "posix" and block.name not in PUBLISHED_BLOCKS:
+                    resource_tracker.unregister("/" + block.name, "shared_memory")
+        except (OSError, ValueError):
+            return None
+
+        header, arrays = read_snapshot_buffer(block.buf)
+        if header == None or header.get("version") != SNAPSHOT_VERSION or (key != None and header.get("key") != key):
+            arrays = None
+            block.close()
+            return None
+
+        snapshot = MapSnapshot(header, arrays)
+        snapshot.shared_block = block
+        return snapshot
+
+
+    # Publishes the snapshot into a new block of shared memory
+    # @param name: name of the block (str), default a random name
+    # @return: the multiprocessing.shared_memory.SharedMemory; the publisher keeps it
+    #          while other processes are attached and unlinks it at the end
+    def publish(self, name = None):
+        return write_snapshot_shared(self.header, dict(self.arrays), name)
+
+
+    # Exports the points, LineStrings, Lanelets and the topology of a LaneletMap
+    # @param lanelet_map: a LaneletMap
+    # @param key: key of the snapshot (str)
+    # @param complete: raise a ValueError if the map has elements a snapshot does not hold (see above),
+    #                  False exports the Lanelets anyway, e.g. to validate them
+    # @return: a MapSnapshot (in memory)
+    @staticmethod
+    def from_LaneletMap(lanelet_map, key = None, complete = True):
+
+        lmap = lanelet_map.lmap
+        layers = unsupported_layers(lmap)
+        if complete and len(layers) > 0:
+            raise ValueError("a snapshot does not hold the %s of the map" % ", ".join(layers))
+
+        return MapSnapshot.from_elements(lmap.pointLayer, lmap.lineStringLayer, lmap.laneletLayer,
+                                         (lanelet_map.lat, lanelet_map.lon), key,
+                                         lanelet_map.get_topology().to_arrays())
+
+
+    # Exports points, LineStrings and Lanelets (e.g. a part of a map)
+    # @param points, lines, lanelets: the elements; the bounds, centerlines and
+    #                                 their points must be part of lines and points
+    # @param origin: (lat, lon) of the map
+    # @param key: key of the snapshot (str)
+    # @param arrays: additional arrays, e.g. of LaneletTopology.to_arrays()
+    # @return: a MapSnapshot (in memory)
+    @staticmethod
+    def from_elements(points, lines, lanelets, origin, key = None, arrays = None):
+
+        strings = {}
+
+        def string_index(text):
+            return strings.setdefault(text, len(strings))
+
+        # Points
+        points = sorted(points, key=lambda point: point.id)
+        point_ids = np.array([point.id for point in points], dtype=np.int64)
+        point_xyz = np.array([(point.x, point.y, point.z) for point in points], dtype=np.float64).reshape(-1, 3)
+        point_pos = {ID: k for k, ID in enumerate(point_ids.tolist())}
+
+        # LineStrings (CSR of point indices) as stored: an inverted bound is marked in lanelet_flags
+        lines = sorted((line.invert() if line.inverted() else line for line in lines), key=lambda line: line.id)
+        line_ids = np.array([line.id for line in lines], dtype=np.int64)
+        line_points = [[point_pos[point.id] for point in line] for line in lines]
+        line_offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+        line_offsets[1:] = np.cumsum([len(ring) for ring in line_points])
+        line_points = np.array([k for ring in line_points for k in ring], dtype=np.int64)
+        line_pos = {ID: k for k, ID in enumerate(line_ids.tolist())}
+
+        # Lanelets
+        lanelets = sorted(lanelets, key=lambda lane: lane.id)
+        lanelet_ids = np.array([lane.id for lane in lanelets], dtype=np.int64)
+        lanelet_left = np.array([line_pos[lane.leftBound.id] for lane in lanelets], dtype=np.int64)
+        lanelet_right = np.array([line_pos[lane.rightBound.id] for lane in lanelets], dtype=np.int64)
+        lanelet_center = np.array([line_pos.get(lane.centerline.id, -1) if lane.centerline.id != 0 else -1
+                                   for lane in lanelets], dtype=np.int64)
+        lanelet_flags = np.array([int(lane.leftBound.inverted()) | (int(lane.rightBound.inverted()) << 1)
+                                  for lane in lanelets], dtype=np.int8)
+
+        # Attributes
+        attributes = []
+        for kind, elements in ((KIND_POINT, points), (KIND_LINE, lines), (KIND_LANELET, lanelets)):
+            for k, element in enumerate(elements):
+                for name, value in element.attributes.items():
+                    attributes.append((kind, k, string_index(name), string_index(str(value))))
+        # grouped by (kind, owner) in this order, see get_attributes()
+        attributes = np.array(attributes, dtype=np.int64).reshape(-1, 4)
+
+        # Lanelet polygons: left bound forward, right bound backward
+        poly_xy = []
+        poly_offsets = [0]
+        for lane in lanelets:
+            poly_xy.extend((point.x, point.y) for point in lane.leftBound)
+            poly_xy.extend((point.x, point.y) for point in reversed(list(lane.rightBound)))
+            poly_offsets.append(len(poly_xy))
+        poly_offsets = np.array(poly_offsets, dtype=np.int64)
+        poly_xy = np.array(poly_xy, dtype=np.float64).reshape(-1, 2)
+
+        header = {"version": SNAPSHOT_VERSION, "key": key,
+                  "origin": list(origin),
+                  "strings": list(strings)}
+        extra_arrays = arrays
+        arrays = {"point_ids": point_ids, "point_xyz": point_xyz,
+                  "line_ids": line_ids, "line_offsets": line_offsets, "line_points": line_points,
+                  "lanelet_ids": lanelet_ids, "lanelet_left": lanelet_left, "lanelet_right": lanelet_right,
+                  "lanelet_center": lanelet_center, "lanelet_flags": lanelet_flags,
+                  "attr_kind": attributes[:, 0].astype(np.int8), "attr_owner": attributes[:, 1],
+                  "attr_key": attributes[:, 2].astype(np.int32), "attr_value": attributes[:, 3].astype(np.int32),
+                  "attr_owner_key": attributes[:, 0] << 48 | attributes[:, 1],
+                  "poly_offsets": poly_offsets, "poly_xy": poly_xy}
+        arrays.update(LaneletGridIndex(lanelet_ids, poly_xy, poly_offsets).to_arrays())
+        if extra_arrays != None:
+            arrays.update(extra_arrays)
+
+        return MapSnapshot(header, arrays)
+
+
+    # Writes the snapshot into a file
+    # @param path: path of the snapshot file (str)
+    def save(self, path: str):
+        write_snapshot_file(path, self.header, dict(self.arrays))
+
+
+    # Returns the index of an ID in a sorted ID array
+    # @param ids: sorted ID array
+    # @param ID: an ID (int)
+    # @return: the index else -1
+    @staticmethod
+    def find(ids, ID: int):
+
+        k = int(np.searchsorted(ids, ID))
+        if k < len(ids) and ids[k] == ID:
+            return k
+        return -1
+
+
+    # Returns the attributes of an element as list of (key, value)
+    # @param kind: KIND_POINT, KIND_LINE or KIND_LANELET
+    # @param k: index of the element
+    def get_attributes(self, kind: int, k: int):
+
+        owner_key = kind << 48 | k
+        begin, end = np.searchsorted(self.attr_owner_key, [owner_key, owner_key + 1])
+
+        return [(self.strings[self.attr_key[j]], self.strings[self.attr_value[j]]) for j in range(begin, end)]
+
+
+    # Returns (creates) the Point with the index k
+    def point_at(self, k: int):
+
+        ID = int(self.point_ids[k])
+        point = self.points.get(ID)
+        if point == None:
+            x, y, z = self.point_xyz[k]
+            point = Point3d(ID, float(x), float(y), float(z))
+            for name, value in self.get_attributes(KIND_POINT, k):
+                point.attributes[name] = value
+            self.points[ID] = point
+
+        return point
+
+
+    # Returns (creates) the LineString with the index k
+    def line_at(self, k: int):
+
+        ID = int(self.line_ids[k])
+        line = self.lines.get(ID)
+        if line == None:
+            points = [self.point_at(int(j)) for j in self.line_points[self.line_offsets[k]:self.line_offsets[k + 1]]]
+            line = LineString3d(ID, points)
+            for name, value in self.get_attributes(KIND_LINE, k):
+                line.attributes[name] = value
+            self.lines[ID] = line
+
+        return line
+
+
+    # Returns (creates) the Lanelet with the index k
+    def lanelet_at(self, k: int):
+
+        ID = int(self.lanelet_ids[k])
+        lane = self.lanelets.get(ID)
+        if lane == None:
+            flags = int(self.lanelet_flags[k])
+            line_left = self.line_at(int(self.lanelet_left[k]))
+            line_right = self.line_at(int(self.lanelet_right[k]))
+            lane = Lanelet(ID, line_left.invert() if flags & 1 else line_left,
+                           line_right.invert() if flags & 2 else line_right)
+            if self.lanelet_center[k] >= 0:
+                lane.centerline = self.line_at(int(self.lanelet_center[k]))
+            for name, value in self.get_attributes(KIND_LANELET, k):
+                lane.attributes[name] = value
+            self.lanelets[ID] = lane
+
+        return lane
+
+
+    # Returns a Point, LineString or Lanelet by an ID
+    # @param ID : Id of the element (int)
+    # @return: the element else None
+    def get_point(self, ID: int):
+        k = self.find(self.point_ids, ID)
+        return self.point_at(k) if k >= 0 else None
+
+    def get_line(self, ID: int):
+        k = self.find(self.line_ids, ID)
+        return self.line_at(k) if k >= 0 else None
+
+    def get_lanelet(self, ID: int):
+        k = self.find(self.lanelet_ids, ID)
+        return self.lanelet_at(k) if k >= 0 else None
+
+
+    # Returns the geometry of all LineStrings and Lanelets as packed arrays (see pack_geometry())
+    def get_geometry_arrays(self):
+
+        if self.geometry == None:
+            self.geometry = pack_geometry(self.line_ids, self.line_offsets, self.point_xyz[self.line_points],
+                                          self.lanelet_ids, self.lanelet_left, self.lanelet_right,
+                                          self.lanelet_center, self.lanelet_flags)
+        return self.geometry
+
+
+    # Returns the neighbour table of the Lanelets
+    # @return: a LaneletTopology
+    def get_topology(self):
+
+        if self.topology == None:
+            self.topology = LaneletTopology.from_arrays(self.arrays)
+        return self.topology
+
+
+    # Returns the spatial index of the Lanelet polygons
+    # @return: a LaneletGridIndex
+    def get_spatial_index(self):
+
+        if self.spatial_index == None:
+            self.spatial_index = LaneletGridIndex.from_arrays(self.lanelet_ids, self.poly_xy, self.poly_offsets,
+                                                              self.arrays)
+        return self.spatial_index
+
+
+    # Creates the complete Lanelet2 map of the snapshot
+    # @return: a lanelet2.core.LaneletMap
+    def to_lanelet2(self):
+
+        lmap = lncore.LaneletMap()
+        for k in range(len(self.lanelet_ids)):
+            lmap.add(self.lanelet_at(k))
+
+        # LineStrings and Points which are not part of a Lanelet
+        for k in range(len(self.line_ids)):
+            if not lmap.lineStringLayer.exists(int(self.line_ids[k])):
+                lmap.add(self.line_at(k))
+        for k in range(len(self.point_ids)):
+            if not lmap.pointLayer.exists(int(self.point_ids[k])):
+                lmap.add(self.point_at(k))
+
+        return lmap
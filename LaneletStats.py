@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Call counters, latencies, cache hit rates and phase timings of a LaneletMap.
+#
+# A LaneletStats object only exists while the statistics of a LaneletMap are
+# switched on (LaneletMap.enable_stats()); without it the LaneletMap runs
+# its plain methods. The latency percentiles are computed from the last
+# `window` calls of each method.
+
+class LaneletStats:
+    def __init__(self, window = 4096):
+
+        # number of latencies kept per method for the percentiles
+        self.window = window
+
+        # method -> [calls, total seconds, deque of the last latencies]
+        self.methods = {}
+
+        # phase (e.g. xml_parse, routing_graph) -> [count, total seconds, last seconds]
+        self.phases = {}
+
+        # cache -> [hits, misses]
+        self.caches = {}
+
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+        # per thread: a wrapped function is running (see wrap())
+        self.active = threading.local()
+
+        # periodic dump ( later e.g. with start_dump() )
+        self.dump_thread = None
+        self.dump_stop = threading.Event()
+
+
+    # Records one call of a method
+    # @param name: name of the method (str)
+    # @param seconds: latency of the call (float)
+    def record(self, name: str, seconds: float):
+
+        with self.lock:
+            entry = self.methods.get(name)
+            if entry == None:
+                entry = self.methods[name] = [0, 0.0, deque(maxlen=self.window)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2].append(seconds)
+
+
+    # Records a hit or a miss of a cache
+    # @param name: name of the cache (str)
+    # @param hit: True on a hit (bool)
+    def count(self, name: str, hit: bool):
+
+        with self.lock:
+            entry = self.caches.setdefault(name, [0, 0])
+            entry[0 if hit else 1] += 1
+
+
+    # Records the duration of a phase
+    # @param name: name of the phase (str)
+    # @param seconds: duration (float)
+    def record_phase(self, name: str, seconds: float):
+
+        with self.lock:
+            entry = self.phases.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = seconds
+
+
+    # Returns a function that calls func and records its latency under name
+    # A call while another wrapped function runs in the same thread is not recorded:
+    # its time is part of the outer call.
+    def wrap(self, name: str, func):
+
+        record = self.record
+        perf_counter = time.perf_counter
+        active = self.active
+
+        def timed(*args, **kwargs):
+            if getattr(active, "call", False):
+                return func(*args, **kwargs)
+
+            active.call = True
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, perf_counter() - start)
+                active.call = False
+
+        timed.__name__ = getattr(func, "__name__", name)
+        timed.__doc__ = getattr(func, "__doc__", None)
+        return timed
+
+
+    # Returns a snapshot of all statistics
+    # @return: dict with "uptime_s", "methods", "phases" and "caches"
+    def snapshot(self):
+
+        with self.lock:
+            methods = {name: (calls, total, np.array(latencies)) for name, (calls, total, latencies) in self.methods.items()}
+            phases = {name: list(entry) for name, entry in self.phases.items()}
+            caches = {name: list(entry) for name, entry in self.caches.items()}
+
+        result = {"uptime_s": time.time() - self.start_time, "methods": {}, "phases": {}, "caches": {}}
+
+        for name, (calls, total, latencies) in sorted(methods.items()):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e6 if len(latencies) > 0 else (0.0, 0.0, 0.0)
+            result["methods"][name] = {"calls": calls, "total_s": total, "mean_us": total / calls * 1e6,
+                                       "p50_us": float(p50), "p90_us": float(p90), "p99_us": float(p99),
+                                       "max_us": float(latencies.max() * 1e6) if len(latencies) > 0 else 0.0}
+
+        for name, (count, total, last) in sorted(phases.items()):
+            result["phases"][name] = {"count": count, "total_s": total, "last_s": last}
+
+        for name, (hits, misses) in sorted(caches.items()):
+            result["caches"][name] = {"hits": hits, "misses": misses,
+                                      "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.0}
+
+        return result
+
+
+    # Starts a background thread that dumps the statistics periodically
+    # @param interval: seconds between two dumps (float)
+    # @param output: path of a file the snapshots are appended to as JSON lines,
+    #                or a function called with the snapshot dict
+    def start_dump(self, interval: float, output):
+
+        self.stop_dump()
+        self.dump_stop.clear()
+
+        def dump():
+            while not self.dump_stop.wait(interval):
+                snapshot = self.snapshot()
+                if callable(output):
+                    output(snapshot)
+                else:
+                    with open(output, "a") as dump_file:
+                        dump_file.write(json.dumps(snapshot) + "\n")
+
+        self.dump_thread = threading.Thread(target=dump, name="LaneletStats dump", daemon=True)
+        self.dump_thread.start()
+
+
+    # Stops the periodic dump
+    def stop_dump(self):
+
+        if self.dump_thread != None:
+            self.dump_stop.set()
+            self.dump_thread.join()
+            self.dump_thread = None
+
+
+
+# Records the duration of a "with" block as a phase of the statistics
+class PhaseTimer:
+    def __init__(self, stats_recorder, name):
+
+        self.stats_recorder = stats_recorder
+        self.name = name
+        self.start = 0.0
+
+
+    def __enter__(self):
+
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stats_recorder.record_phase(self.name, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+import os
+from collections import OrderedDict
+import numpy as np
+import lanelet2.core as lncore
+from LaneletIndex import LaneletTopology
+from LaneletSnapshot import SNAPSHOT_VERSION, MapSnapshot, read_snapshot_file, unsupported_layers, write_snapshot_file
+
+# A Lanelet2 map split into square tiles to load only the region around a position.
+#
+# Directory layout (<osm_map_file>.tiles):
+#   tiles.index              arrays of the whole map in the snapshot layout (see LaneletSnapshot.py):
+#                            tile_codes [T], the home tile of every Lanelet, LineString and
+#                            Point (sorted by ID) and the neighbour table of all Lanelets
+#   tile_<i>_<j>.snapshot    MapSnapshot of the tile (i, j) = floor((x, y) / tile_size): the
+#                            Lanelets whose bounding box overlaps it, their LineStrings and Points
+#
+# A Lanelet crossing a tile border is part of every tile it overlaps, so the tile
+# of a point holds all Lanelets containing the point. A lookup by ID opens the
+# home tile of the element. Neighbours and following Lanelets come from the
+# neighbour table of the whole map, so queries across tile borders open the next
+# tiles transparently. At most max_tiles tiles stay open (LRU); the index is
+# memory-mapped like a snapshot, so only its used pages are loaded. The tiles
+# never form a map of the whole region: a Lanelet2 map, routing graph or the
+# geometry of all tiles is not available (see LaneletMap.check_whole_map()).
+
+TILE_INDEX = "tiles.index"
+
+# tile (i, j) -> code i * TILE_SPAN + j, sorted like (i, j)
+TILE_SPAN = 1 << 31
+
+
+# Returns the codes of tiles
+# @param tiles: tiles (ndarray[N, 2], int64)
+# @return: codes (ndarray[N], int64)
+def tile_code(tiles):
+    return tiles[:, 0] * TILE_SPAN + tiles[:, 1]
+
+
+# Returns the path of the snapshot of a tile
+# @param tile_dir: directory of the tiles (str)
+# @param code: code of the tile (int)
+def tile_path(tile_dir: str, code: int):
+
+    i, j = divmod(int(code) + TILE_SPAN // 2, TILE_SPAN)
+    return os.path.join(tile_dir, "tile_%d_%d.snapshot" % (i, j - TILE_SPAN // 2))
+
+
+# Splits a LaneletMap into tiles
+# @param lanelet_map: a LaneletMap
+# @param tile_dir: directory of the tiles (str), created if necessary
+# @param tile_size: edge length of a tile in meter (float)
+# @param key: key of the tiles, e.g. of snapshot_key() (str)
+# @return: number of tiles; raises a ValueError if the map has elements a tile does not hold
+def write_tiles(lanelet_map, tile_dir: str, tile_size: float, key = None):
+
+    lmap = lanelet_map.lmap
+    layers = unsupported_layers(lmap)
+    if len(layers) > 0:
+        raise ValueError("a tile does not hold the %s of the map" % ", ".join(layers))
+
+    os.makedirs(tile_dir, exist_ok=True)
+    line_index = {line.id: line for line in lmap.lineStringLayer}
+
+    # tiles -> elements; a Lanelet / LineString is part of all tiles its bounding box overlaps
+    tile_elements = {}
+
+    def add_to_tiles(xy, lanes, lines, points):
+        low = np.floor(xy.min(axis=0) / tile_size).astype(np.int64)
+        high = np.floor(xy.max(axis=0) / tile_size).astype(np.int64)
+        for i in range(low[0], high[0] + 1):
+            for j in range(low[1], high[1] + 1):
+                elements = tile_elements.setdefault(i * TILE_SPAN + j, ({}, {}, {}))
+                for target, source in zip(elements, (lanes, lines, points)):
+                    target.update(source)
+
+    used_lines = set()
+    for lane in lmap.laneletLayer:
+        lines = {lane.leftBound.id: line_index[lane.leftBound.id], lane.rightBound.id: line_index[lane.rightBound.id]}
+        if lane.centerline.id != 0 and lane.centerline.id in line_index:
+            lines[lane.centerline.id] = line_index[lane.centerline.id]
+        points = {point.id: point for line in lines.values() for point in line}
+        used_lines.update(lines)
+        add_to_tiles(np.array([(point.x, point.y) for point in points.values()]), {lane.id: lane}, lines, points)
+
+    # LineStrings and Points which are not part of a Lanelet
+    used_points = set()
+    for line in lmap.lineStringLayer:
+        points = {point.id: point for point in line}
+        if line.id not in used_lines and len(points) > 0:
+            add_to_tiles(np.array([(point.x, point.y) for point in points.values()]), {}, {line.id: line}, points)
+        used_points.update(points)
+    for point in lmap.pointLayer:
+        if point.id not in used_points:
+            add_to_tiles(np.array([(point.x, point.y)]), {}, {}, {point.id: point})
+
+    # the home tile of an element: the first tile holding it
+    codes = np.array(sorted(tile_elements), dtype=np.int64)
+    homes = ({}, {}, {})
+    origin = (lanelet_map.lat, lanelet_map.lon)
+    for k, code in enumerate(codes.tolist()):
+        lanes, lines, points = tile_elements[code]
+        for home, elements in zip(homes, (lanes, lines, points)):
+            for ID in elements:
+                home.setdefault(ID, k)
+        MapSnapshot.from_elements(points.values(), lines.values(), lanes.values(), origin, key).save(
+            tile_path(tile_dir, code))
+
+    max_id = 0
+    arrays = {"tile_codes": codes}
+    for name, home in zip(("lanelet", "line", "point"), homes):
+        ids = np.array(sorted(home), dtype=np.int64)
+        arrays[name + "_ids"] = ids
+        arrays[name + "_tile"] = np.array([home[ID] for ID in ids.tolist()], dtype=np.int64)
+        if len(ids) > 0:
+            max_id = max(max_id, int(ids[-1]))
+    arrays.update(lanelet_map.get_topology().to_arrays())
+
+    # the index is written last: an interrupted split is never used
+    header = {"version": SNAPSHOT_VERSION, "key": key, "origin": list(origin),
+              "tile_size": float(tile_size), "max_id": max_id}
+    write_snapshot_file(os.path.join(tile_dir, TILE_INDEX), header, arrays)
+
+    return len(codes)
+
+
+class LaneletTiles:
+    def __init__(self, tile_dir: str, header: dict, arrays: dict, max_tiles = 64):
+
+        # directory, key, origin and edge length of the tiles
+        self.tile_dir = tile_dir
+        self.header = header
+        self.key = header.get("key")
+        self.tile_size = float(header["tile_size"])
+
+        # read-only arrays of the index (see above)
+        self.arrays = arrays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+        # open tiles: index of the tile -> MapSnapshot, least recently used first
+        self.tiles = OrderedDict()
+        self.max_tiles = max_tiles
+
+        # Points, LineStrings and Lanelets created by the open tiles: ID -> object,
+        # shared by all tiles, so a Point on a tile border is one object
+        self.points = {}
+        self.lines = {}
+        self.lanelets = {}
+
+        # Neighbour table of the whole map ( later e.g. with get_topology() )
+        self.topology = None
+
+        # new IDs of the process must not collide with the IDs of the map
+        lncore.registerId(int(header.get("max_id", 0)))
+
+
+    # Opens the tiles of a directory
+    # @param tile_dir: directory of the tiles (str)
+    # @param key: expected key (str) or None to accept any tiles
+    # @param tile_size: expected edge length of the tiles (float) or None
+    # @param max_tiles: maximum number of open tiles (int)
+    # @return: a LaneletTiles else None, if the index is missing, invalid or stale
+    @staticmethod
+    def open(tile_dir: str, key = None, tile_size = None, max_tiles = 64):
+
+        try:
+            header, arrays = read_snapshot_file(os.path.join(tile_dir, TILE_INDEX))
+        except (OSError, ValueError):
+            return None
+
+        if header == None or header.get("version") != SNAPSHOT_VERSION or "tile_size" not in header:
+            return None
+        if key != None and header.get("key") != key:
+            return None
+        if tile_size != None and header["tile_size"] != float(tile_size):
+            return None
+
+        return LaneletTiles(tile_dir, header, arrays, max_tiles)
+
+
+    # Returns the codes of the tiles of points
+    # @param xy: points (ndarray[N, 2])
+    # @return: codes (ndarray[N], int64)
+    def tile_codes_of(self, xy):
+        return tile_code(np.floor(np.asarray(xy, dtype=np.float64).reshape(-1, 2) / self.tile_size).astype(np.int64))
+
+
+    # Returns the index of a tile, -1 if the map has no such tile
+    # @param code: code of the tile (int)
+    def find_tile(self, code: int):
+        return MapSnapshot.find(self.tile_codes, code)
+
+
+    # Returns (opens) the tile with the index k
+    # @param k: index of the tile
+    # @return: a MapSnapshot else None
+    def get_tile(self, k: int):
+
+        tile = self.tiles.get(k)
+        if tile != None:
+            self.tiles.move_to_end(k)
+            return tile
+
+        path = tile_path(self.tile_dir, self.tile_codes[k])
+        tile = MapSnapshot.open(path, self.key)
+        if tile == None:
+            print("Tile %s not found!" % path)
+            return None
+
+        tile.points = self.points
+        tile.lines = self.lines
+        tile.lanelets = self.lanelets
+        self.tiles[k] = tile
+
+        if len(self.tiles) > self.max_tiles:
+            self.evict(self.tiles.popitem(last=False)[1])
+
+        return tile
+
+
+    # Drops the created elements of a closed tile, unless another open tile holds them
+    # @param tile: the closed MapSnapshot
+    def evict(self, tile):
+
+        for cache, name in ((self.lanelets, "lanelet_ids"), (self.lines, "line_ids"), (self.points, "point_ids")):
+            ids = getattr(tile, name)
+            still_open = [getattr(other, name) for other in self.tiles.values()]
+            if len(still_open) > 0:
+                ids = ids[~np.isin(ids, np.concatenate(still_open))]
+            for ID in ids.tolist():
+                cache.pop(ID, None)
+
+
+    # Opens the tiles around a position
+    # @param x, y: position in meter
+    # @param radius: the tiles within radius (meter) are opened, default one tile
+    # @return: number of open tiles
+    def set_position(self, x: float, y: float, radius = None):
+
+        if radius == None:
+            radius = self.tile_size
+
+        low = np.floor((np.array([x, y]) - radius) / self.tile_size).astype(np.int64)
+        high = np.floor((np.array([x, y]) + radius) / self.tile_size).astype(np.int64)
+        ii, jj = np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing="ij")
+        codes = tile_code(np.stack((ii.reshape(-1), jj.reshape(-1)), axis=1))
+
+        # the tile of the position is opened last: it is the most recently used
+        here = int(self.tile_codes_of([(x, y)])[0])
+        codes = sorted(codes.tolist(), key=lambda code: code == here)
+        for code in codes[-self.max_tiles:]:
+            k = self.find_tile(code)
+            if k >= 0:
+                self.get_tile(k)
+
+        return len(self.tiles)
+
+
+    # Returns a Point, LineString or Lanelet by an ID, opens its home tile if necessary
+    # @param ID : Id of the element (int)
+    # @return: the element else None
+    def get_point(self, ID: int):
+        tile = self.home_tile(self.point_ids, self.point_tile, ID)
+        return tile.get_point(ID) if tile != None else None
+
+    def get_line(self, ID: int):
+        tile = self.home_tile(self.line_ids, self.line_tile, ID)
+        return tile.get_line(ID) if tile != None else None
+
+    def get_lanelet(self, ID: int):
+        tile = self.home_tile(self.lanelet_ids, self.lanelet_tile, ID)
+        return tile.get_lanelet(ID) if tile != None else None
+
+
+    # Returns the open home tile of an element
+    def home_tile(self, ids, tiles, ID: int):
+
+        k = MapSnapshot.find(ids, ID)
+        if k < 0:
+            return None
+        return self.get_tile(int(tiles[k]))
+
+
+    # Returns the neighbour table of all Lanelets
+    # @return: a LaneletTopology
+    def get_topology(self):
+
+        if self.topology == None:
+            self.topology = LaneletTopology.from_arrays(self.arrays)
+        return self.topology
+
+
+    # The tiles are their own spatial index, see match()
+    def get_spatial_index(self):
+        return self
+
+
+    # Returns for every point the ID of a Lanelet containing it, opens the tiles of the points
+    # @param xy: points (ndarray[N, 2])
+    # @return: Lanelet IDs (ndarray[N], int64), -1 if the point is not over a Lanelet
+    def match(self, xy):
+
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        result = np.full(len(xy), -1, dtype=np.int64)
+
+        codes, inverse = np.unique(self.tile_codes_of(xy), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for j, code in enumerate(codes.tolist()):
+            k = self.find_tile(code)
+            tile = self.get_tile(k) if k >= 0 else None
+            if tile != None:
+                here = inverse == j
+                result[here] = tile.get_spatial_index().match(xy[here])
+
+        return result
+
+
+    # Returns the ID of a Lanelet containing a single point, opens the tile of the point
+    # @param x, y: the point
+    # @return: Lanelet ID (int), -1 if the point is not over a Lanelet
+    def match_point(self, x: float, y: float):
+
+        k = self.find_tile(int(self.tile_codes_of([x, y])[0]))
+        tile = self.get_tile(k) if k >= 0 else None
+        if tile == None:
+            return -1
+        return tile.get_spatial_index().match_point(x, y)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+from lanelet2.core import GPSPoint
+
+# Map matching of a tracked vehicle, one position after the other.
+#
+# A vehicle almost always stays in its Lanelet or drives into one of its
+# neighbours. The tracker keeps the last matched Lanelet and tests it first,
+# then its following, left and right neighbours (point-in-polygon on cached
+# polygons), and only searches the whole map (LaneletMap.point_xy_over_Lanelet())
+# if none of them contains the position. The polygons and neighbours are
+# cached per neighbour table of the map: a change of the map (update_map(),
+# load_delta(), dedupe_points(), new Lanelets) rebuilds the table and clears them.
+#
+#   tracker = LaneletTracker(lanelet_map)
+#   for x, y in positions:
+#       ID = tracker.point_xy_over_Lanelet(x, y)
+#   tracker.stats()
+
+class LaneletTracker:
+    def __init__(self, lanelet_map, cache_size = 4096):
+
+        self.lanelet_map = lanelet_map
+
+        # ID of the last matched Lanelet, None if unknown or off the map
+        self.lanelet_id = None
+
+        # Neighbours of the last matched Lanelet in test order ( later e.g. with set_Lanelet() )
+        self.candidate_ids = []
+
+        # LRU cache of the Lanelet polygons: ID -> list of (x, y)
+        self.polygons = OrderedDict()
+        self.cache_size = cache_size
+
+        # neighbour table and its version the polygons and neighbours belong to ( later e.g. with check_cache() )
+        self.cache_topology = None
+
+        # matched in the last Lanelet, in a neighbour, by the search of the whole map, or off the map
+        self.hits = {"current": 0, "neighbour": 0, "global": 0, "off_map": 0}
+
+
+    # Returns the polygon of a Lanelet (left bound forward, right bound backward)
+    # @param ID: a Lanelet ID
+    # @return: list of (x, y), None if the Lanelet does not exist
+    def get_polygon(self, ID: int):
+
+        polygon = self.polygons.get(ID)
+        if polygon != None:
+            self.polygons.move_to_end(ID)
+            return polygon
+
+        lane = self.lanelet_map.get_Lanelet_with_Id(ID)
+        if lane == None:
+            return None
+
+        polygon = [(point.x, point.y) for point in lane.leftBound]
+        polygon.extend((point.x, point.y) for point in reversed(list(lane.rightBound)))
+
+        self.polygons[ID] = polygon
+        if len(self.polygons) > self.cache_size:
+            self.polygons.popitem(last=False)
+
+        return polygon
+
+
+    # Even-odd point-in-polygon test of a Lanelet
+    # @param ID: a Lanelet ID
+    # @param x, y: the position
+    # @return: True if the position lies inside the Lanelet
+    def inside(self, ID: int, x: float, y: float):
+
+        polygon = self.get_polygon(ID)
+        if polygon == None:
+            return False
+
+        inside = False
+        x0, y0 = polygon[-1]
+        for x1, y1 in polygon:
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+            x0, y0 = x1, y1
+
+        return inside
+
+
+    # Clears the polygons and the neighbours if the map has changed
+    # The last matched Lanelet is kept, if it still exists.
+    def check_cache(self):
+
+        topology = self.lanelet_map.get_topology()
+        topology.update()
+
+        if self.cache_topology != (topology, topology.version):
+            self.polygons.clear()
+            self.cache_topology = (topology, topology.version)
+
+            ID = self.lanelet_id
+            self.lanelet_id = None
+            if ID != None and topology.row(ID) >= 0:
+                self.set_Lanelet(ID)
+            else:
+                self.candidate_ids = []
+
+
+    # Sets the last matched Lanelet and the order of its neighbours
+    # @param ID: a Lanelet ID or None
+    def set_Lanelet(self, ID):
+
+        if ID == self.lanelet_id:
+            return
+
+        self.lanelet_id = ID
+        self.candidate_ids = []
+        if ID == None:
+            return
+
+        # driving on is the most frequent change, then a lane change
+        topology = self.lanelet_map.get_topology()
+        candidates = list(topology.following_ids(ID))
+        candidates.extend(neighbour for neighbour in (topology.left_id(ID), topology.right_id(ID)) if neighbour != None)
+        self.candidate_ids = candidates
+
+
+    # Returns the Lanelet ID, if a position (x, y) is over a Lanelet
+    # @param x: a x-value (float)
+    # @param y: a y-value (float)
+    # @return: a Lanelet ID, matching the coordinates, else None
+    def point_xy_over_Lanelet(self, x: float, y: float):
+
+        stats_recorder = self.lanelet_map.stats_recorder
+        self.check_cache()
+
+        if self.lanelet_id != None:
+            if self.inside(self.lanelet_id, x, y):
+                self.hits["current"] += 1
+                if stats_recorder != None:
+                    stats_recorder.count("tracker", True)
+                return self.lanelet_id
+
+            for ID in self.candidate_ids:
+                if self.inside(ID, x, y):
+                    self.hits["neighbour"] += 1
+                    if stats_recorder != None:
+                        stats_recorder.count("tracker", True)
+                    self.set_Lanelet(ID)
+                    return ID
+
+        if stats_recorder != None:
+            stats_recorder.count("tracker", False)
+
+        ID = self.lanelet_map.point_xy_over_Lanelet(x, y)
+        self.hits["global" if ID != None else "off_map"] += 1
+        self.set_Lanelet(ID)
+
+        return ID
+
+
+    # Returns the Lanelet ID, if a GPS position (lat, lon) is over a Lanelet
+    # @param lat: a latitude (float)
+    # @param lon: a longitude (float)
+    # @return: a Lanelet ID, matching the coordinates, else None
+    def point_ll_over_Lanelet(self, lat: float, lon: float):
+
+        point = self.lanelet_map.get_projector().forward(GPSPoint(lat, lon))
+        return self.point_xy_over_Lanelet(point.x, point.y)
+
+
+    # Forgets the last matched Lanelet (e.g. after a jump of the position)
+    def reset(self):
+
+        self.set_Lanelet(None)
+
+
+    # Returns the hit and miss statistics
+    # @return: dict with the counts of "current", "neighbour", "global" and "off_map",
+    #          "updates" and "hit_rate" (matched without a search of the whole map)
+    def stats(self):
+
+        updates = sum(self.hits.values())
+        result = dict(self.hits)
+        result["updates"] = updates
+        result["hit_rate"] = (self.hits["current"] + self.hits["neighbour"]) / updates if updates > 0 else 0.0
+
+        return result
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from LaneletSnapshot import MapSnapshot
+
+# Bulk validation of a map before deployment.
+#
+#   python LaneletValidation.py Data_Map.osm --workers 4 --output report.json
+#   report = lanelet_map.validate()
+#
+# The checks run vectorized on the arrays of the map snapshot (see LaneletSnapshot.py):
+#   no_successor      warning  Lanelets without following Lanelet (get_following_Lanelet() finds none)
+#   no_predecessor    warning  Lanelets without preceding Lanelet
+#   shared_bounds     error    LineStrings bounding more than two Lanelets
+#   degenerate        error    Lanelets with a bound of less than two Points or with left = right bound
+#   duplicate_points  error    different Points closer than tolerance (see LaneletMap.dedupe_points())
+#   unconnected       error    a Lanelet ends within gap_tolerance of the start of another Lanelet, but the
+#                              two do not share their Points (e.g. a ring closure that does not meet)
+#
+# The spatial checks (duplicate_points, unconnected) are split into stripes along x
+# of about the same number of Points. Each stripe reports the pairs whose first
+# element lies in it, so every pair is found exactly once. Large maps are checked
+# in worker processes which open the snapshot as memory-mapped file.
+
+# Distance in meter below which two Points are duplicates
+DUPLICATE_TOLERANCE = 0.01
+
+# Distance in meter of the end of a Lanelet to the start of another one, which should be connected
+GAP_TOLERANCE = 1.0
+
+# Maps with fewer Points are checked in the calling process
+PARALLEL_MIN_POINTS = 200000
+
+# Row stride of the combined grid cell key (cx * CELL_STRIDE + cy)
+CELL_STRIDE = 1 << 32
+
+SEVERITY = {"no_successor": "warning", "no_predecessor": "warning", "shared_bounds": "error",
+            "degenerate": "error", "duplicate_points": "error", "unconnected": "error"}
+
+# snapshot of a worker process ( later e.g. with init_worker() )
+worker_snapshot = None
+
+
+# Returns all pairs of points of a and b within a radius (grid of cells of the radius)
+# @param xy_a, xy_b: points (ndarray[N, 2], ndarray[M, 2])
+# @param radius: maximum distance in meter (float, > 0)
+# @return: indices into a, indices into b, distances (ndarray[K] each)
+def close_pairs(xy_a, xy_b, radius: float):
+
+    if len(xy_a) == 0 or len(xy_b) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    origin = np.minimum(xy_a.min(axis=0), xy_b.min(axis=0))
+    cells_a = np.floor((xy_a - origin) / radius).astype(np.int64)
+    cells_b = np.floor((xy_b - origin) / radius).astype(np.int64)
+
+    keys_b = cells_b[:, 0] * CELL_STRIDE + cells_b[:, 1]
+    order = np.argsort(keys_b, kind="stable")
+    sorted_keys = keys_b[order]
+
+    # candidates in the 3 x 3 cells around each point of a; false candidates fail the distance
+    all_a = []
+    all_b = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            keys = (cells_a[:, 0] + dx) * CELL_STRIDE + cells_a[:, 1] + dy
+            begin = np.searchsorted(sorted_keys, keys, side="left")
+            count = np.searchsorted(sorted_keys, keys, side="right") - begin
+            local = np.arange(count.sum(), dtype=np.int64) - np.repeat(np.cumsum(count) - count, count)
+            all_a.append(np.repeat(np.arange(len(xy_a), dtype=np.int64), count))
+            all_b.append(order[np.repeat(begin, count) + local])
+
+    index_a = np.concatenate(all_a)
+    index_b = np.concatenate(all_b)
+    distance = np.linalg.norm(xy_a[index_a] - xy_b[index_b], axis=1)
+    keep = distance <= radius
+
+    return index_a[keep], index_b[keep], distance[keep]
+
+
+# Returns the first and last Point of the bounds of all Lanelets in driving direction
+# @param snapshot: a MapSnapshot
+# @return: point indices (ndarray[L, 4]: start left, start right, end left, end right), -1 of a bound without Points
+def lanelet_ends(snapshot):
+
+    offsets = snapshot.line_offsets
+    ends = np.full((len(snapshot.lanelet_ids), 4), -1, dtype=np.int64)
+
+    for j, (lines, bit) in enumerate(((snapshot.lanelet_left, 1), (snapshot.lanelet_right, 2))):
+        begin = offsets[lines]
+        end = offsets[lines + 1]
+        valid = end > begin
+        first = np.where(valid, snapshot.line_points[np.where(valid, begin, 0)], -1)
+        last = np.where(valid, snapshot.line_points[np.where(valid, end - 1, 0)], -1)
+        inverted = (snapshot.lanelet_flags & bit) != 0
+        ends[:, j] = np.where(inverted, last, first)
+        ends[:, 2 + j] = np.where(inverted, first, last)
+
+    return ends
+
+
+# Runs the spatial checks on one stripe x0 <= x < x1
+# @param x0, x1: the stripe (float, may be -inf / inf)
+# @param tolerance: see DUPLICATE_TOLERANCE
+# @param gap_tolerance: see GAP_TOLERANCE
+# @param snapshot: a MapSnapshot, default the snapshot of the worker process
+# @return: dict "duplicate_points" (point indices i, j, distances) and "unconnected" (Lanelet indices from, to, gaps)
+def check_stripe(x0: float, x1: float, tolerance: float, gap_tolerance: float, snapshot = None):
+
+    if snapshot == None:
+        snapshot = worker_snapshot
+
+    # duplicate Points: pairs i < j, reported by the stripe of Point i
+    xy = np.asarray(snapshot.point_xyz[:, :2])
+    x = xy[:, 0]
+    selected = np.nonzero((x >= x0 - tolerance) & (x < x1 + tolerance))[0]
+    a, b, distance = close_pairs(xy[selected], xy[selected], tolerance)
+    i = selected[a]
+    j = selected[b]
+    keep = (i < j) & (x[i] >= x0) & (x[i] < x1)
+    duplicates = (i[keep], j[keep], distance[keep])
+
+    # unconnected: end of Lanelet k near the start of Lanelet m, reported by the stripe of the end of k
+    ends = lanelet_ends(snapshot)
+    valid = np.nonzero((ends >= 0).all(axis=1))[0]
+    start_xy = 0.5 * (xy[ends[valid, 0]] + xy[ends[valid, 1]])
+    end_xy = 0.5 * (xy[ends[valid, 2]] + xy[ends[valid, 3]])
+
+    in_stripe = valid[(end_xy[:, 0] >= x0) & (end_xy[:, 0] < x1)]
+    near = valid[(start_xy[:, 0] >= x0 - gap_tolerance) & (start_xy[:, 0] < x1 + gap_tolerance)]
+    a, b, _ = close_pairs(0.5 * (xy[ends[in_stripe, 2]] + xy[ends[in_stripe, 3]]),
+                          0.5 * (xy[ends[near, 0]] + xy[ends[near, 1]]), gap_tolerance)
+    k = in_stripe[a]
+    m = near[b]
+
+    left_gap = np.linalg.norm(xy[ends[k, 2]] - xy[ends[m, 0]], axis=1)
+    right_gap = np.linalg.norm(xy[ends[k, 3]] - xy[ends[m, 1]], axis=1)
+    connected = (ends[k, 2] == ends[m, 0]) & (ends[k, 3] == ends[m, 1])
+    keep = (k != m) & ~connected & (left_gap <= gap_tolerance) & (right_gap <= gap_tolerance)
+    unconnected = (k[keep], m[keep], np.maximum(left_gap, right_gap)[keep])
+
+    return {"duplicate_points": duplicates, "unconnected": unconnected}
+
+
+# Opens the snapshot in a worker process
+# @param snapshot_path: path of the snapshot file (str)
+def init_worker(snapshot_path: str):
+
+    global worker_snapshot
+    worker_snapshot = MapSnapshot.open(snapshot_path)
+
+
+# Returns the stripes along x with about the same number of Points
+# @param x: x-values of the Points (ndarray[P])
+# @param n_stripes: number of stripes (int)
+# @return: list of (x0, x1)
+def split_stripes(x, n_stripes: int):
+
+    if n_stripes <= 1 or len(x) == 0:
+        return [(-np.inf, np.inf)]
+
+    edges = np.unique(np.quantile(x, np.linspace(0.0, 1.0, n_stripes + 1)[1:-1]))
+    edges = np.concatenate(([-np.inf], edges, [np.inf]))
+
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+# Formats the result of a check for the report
+def check_result(name: str, **items):
+
+    count = len(next(iter(items.values())))
+    result = {"severity": SEVERITY[name], "count": count}
+    result.update(items)
+
+    return result
+
+
+# Validates a map snapshot
+# @param snapshot: a MapSnapshot
+# @param workers: number of worker processes, default os.cpu_count(); maps with fewer than
+#                 PARALLEL_MIN_POINTS Points are checked in the calling process
+# @param tolerance: see DUPLICATE_TOLERANCE
+# @param gap_tolerance: see GAP_TOLERANCE
+# @return: the report: dict with "map" (numbers of elements), "checks" (per check its "severity",
+#          "count" and the IDs), "errors", "warnings", "passed" (no errors) and "seconds"
+def validate_snapshot(snapshot, workers = None, tolerance = DUPLICATE_TOLERANCE, gap_tolerance = GAP_TOLERANCE):
+
+    start = time.perf_counter()
+    if workers == None:
+        workers = os.cpu_count() or 1
+
+    lanelet_ids = snapshot.lanelet_ids
+    line_ids = snapshot.line_ids
+    point_ids = snapshot.point_ids
+    checks = {}
+
+    # topology: Lanelets without following / preceding Lanelet
+    topology = snapshot.get_topology()
+    topology_ids = topology.columns["ids"]
+    checks["no_successor"] = check_result("no_successor", ids=topology_ids[np.diff(topology.following_offsets) == 0].tolist())
+    checks["no_predecessor"] = check_result("no_predecessor", ids=topology_ids[np.diff(topology.preceding_offsets) == 0].tolist())
+
+    # bounds used by more than two Lanelets
+    bounds = np.concatenate((snapshot.lanelet_left, snapshot.lanelet_right))
+    uses = np.bincount(bounds, minlength=len(line_ids))
+    shared = np.nonzero(uses > 2)[0]
+    owners = np.tile(np.asarray(lanelet_ids), 2)
+    checks["shared_bounds"] = check_result("shared_bounds", ids=line_ids[shared].tolist(),
+                                           lanelets=[owners[bounds == k].tolist() for k in shared.tolist()])
+
+    # bounds without two Points, left bound = right bound
+    counts = np.diff(snapshot.line_offsets)
+    degenerate = ((counts[snapshot.lanelet_left] < 2) | (counts[snapshot.lanelet_right] < 2) |
+                  (snapshot.lanelet_left == snapshot.lanelet_right))
+    checks["degenerate"] = check_result("degenerate", ids=lanelet_ids[degenerate].tolist())
+
+    # spatial checks, in stripes on worker processes for large maps
+    if workers > 1 and len(point_ids) >= PARALLEL_MIN_POINTS:
+        stripes = split_stripes(np.asarray(snapshot.point_xyz[:, 0]), 2 * workers)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_path = os.path.join(tmp_dir, "map.snapshot")
+            snapshot.save(snapshot_path)
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(snapshot_path,)) as pool:
+                parts = list(pool.map(partial(check_stripe, tolerance=tolerance, gap_tolerance=gap_tolerance),
+                                      *zip(*stripes)))
+    else:
+        parts = [check_stripe(-np.inf, np.inf, tolerance, gap_tolerance, snapshot)]
+
+    i, j, distance = (np.concatenate(arrays) for arrays in zip(*(part["duplicate_points"] for part in parts)))
+    checks["duplicate_points"] = check_result("duplicate_points", ids=np.stack((point_ids[i], point_ids[j]), axis=1).tolist(),
+                                              distances=distance.tolist())
+
+    k, m, gap = (np.concatenate(arrays) for arrays in zip(*(part["unconnected"] for part in parts)))
+    checks["unconnected"] = check_result("unconnected", ids=np.stack((lanelet_ids[k], lanelet_ids[m]), axis=1).tolist(),
+                                         gaps=gap.tolist())
+
+    errors = sum(check["count"] for check in checks.values() if check["severity"] == "error")
+    warnings = sum(check["count"] for check in checks.values() if check["severity"] == "warning")
+
+    return {"map": {"lanelets": len(lanelet_ids), "lines": len(line_ids), "points": len(point_ids)},
+            "checks": checks, "errors": errors, "warnings": warnings, "passed": errors == 0,
+            "seconds": time.perf_counter() - start}
+
+
+# Prints a short summary of a report
+# @param report: a report of validate_snapshot()
+def print_report(report):
+
+    print("%d lanelets, %d lines, %d points checked in %.2f s" %
+          (report["map"]["lanelets"], report["map"]["lines"], report["map"]["points"], report["seconds"]))
+
+    for name, check in report["checks"].items():
+        examples = ", ".join(str(ID) for ID in check["ids"][:5])
+        print("  %-17s %-8s %6d  %s" % (name, check["severity"], check["count"], examples))
+
+    if report.get("load_errors"):
+        print("  %-17s %-8s %6d" % ("load_errors", "error", len(report["load_errors"])))
+
+    print("%s: %d errors, %d warnings" % ("PASSED" if report["passed"] else "FAILED", report["errors"], report["warnings"]))
+
+
+if __name__ == '__main__':
+
+    from LaneletMap import LaneletMap
+
+    parser = argparse.ArgumentParser(description="Validates a Lanelet2 map (topology and geometry)")
+    parser.add_argument("osm_map_file")
+    parser.add_argument("--lat", type=float, default=0.0)
+    parser.add_argument("--lon", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=DUPLICATE_TOLERANCE, help="distance of duplicate points")
+    parser.add_argument("--gap-tolerance", type=float, default=GAP_TOLERANCE, help="distance of unconnected lanelets")
+    parser.add_argument("--strict", action="store_true", help="warnings fail as well")
+    parser.add_argument("--output", default=None, help="JSON file of the report")
+    args = parser.parse_args()
+
+    lanelet_map = LaneletMap(args.lat, args.lon, args.osm_map_file)
+    report = lanelet_map.validate(args.workers, args.tolerance, args.gap_tolerance)
+    print_report(report)
+
+    if args.output != None:
+        with open(args.output, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+
+    sys.exit(0 if report["passed"] and not (args.strict and report["warnings"] > 0) else 1)
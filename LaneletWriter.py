@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+
+import gzip
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+from xml.sax.saxutils import quoteattr
+import numpy as np
+
+# Streaming OSM writer of a LaneletMap.
+#
+# lanelet2.io.writeRobust() builds the whole XML document in memory before it is
+# written. write_osm_stream() walks the ID index of the map chunk by chunk and
+# writes each chunk at once into the (optionally gzip compressed) file, so only a
+# few chunks are in memory at a time. Besides the chunks the writer keeps the IDs
+# of the Lanelet bounds (and with merge_collinear the free two-point LineStrings).
+# The nodes are written without visible="true" version="1" and projected per
+# chunk with the vectorized projection of the map.
+#
+# Each chunk is serialized in two steps: its rows (IDs, coordinates, point IDs,
+# members and tags as plain tuples and arrays) are read from the lanelet2 objects
+# in the writing thread, then formatted as XML. With workers > 1 the formatting
+# runs in a pool of worker processes (not threads: it holds the GIL) while the
+# writing thread reads the next chunks and writes the finished ones in order.
+#
+# merge_collinear joins chains of two-point LineStrings (start of the next at the
+# end of the previous, same attributes, same direction) into one way with the ID
+# of the first one. Only LineStrings which are not used by a Lanelet, an Area or a
+# regulatory element are merged: a Lanelet references exactly its own bounds.
+# Maps of Lanelets only, like Data_Map.osm or the maps of Benchmark_LaneletMap.py,
+# have no such LineStrings and are written unchanged; it helps on maps with free
+# line markings (e.g. road markings or curbs drawn as many two-point ways).
+#
+#   write_osm_stream(lanelet_map, "map.osm.gz", merge_collinear=True, workers=4)
+
+# Number of elements serialized together
+CHUNK_SIZE = 4096
+
+# Maximum distance in meter of the inner points of merged ways from the straight line
+COLLINEAR_TOLERANCE = 0.01
+
+
+# Formats degrees like lanelet2: at most 11 decimals, without trailing zeros
+# @param values: ndarray[N]
+# @return: list of strings
+def format_degrees(values):
+
+    return [("%.11f" % value).rstrip("0").rstrip(".") for value in values.tolist()]
+
+
+# Returns the tags of an element as sorted (key, value) items
+# @param attributes: lanelet2 AttributeMap or dict
+# @param extra: additional tags, e.g. the type of a relation (dict)
+# @return: tuple of (key, value)
+def tag_items(attributes, extra = None):
+
+    tags = {key: str(value) for key, value in dict(attributes).items()}
+    if extra != None:
+        for key, value in extra.items():
+            tags.setdefault(key, value)
+
+    return tuple(sorted(tags.items()))
+
+
+# Returns the tags of sorted (key, value) items; the few distinct tag sets of a map are escaped only once
+@lru_cache(maxsize=4096)
+def format_tag_items(items):
+
+    return "".join('    <tag k=%s v=%s/>\n' % (quoteattr(key), quoteattr(value)) for key, value in items)
+
+
+# Returns a role as quoted XML attribute value, escaped once per role
+@lru_cache(maxsize=256)
+def quote_role(role):
+
+    return quoteattr(role)
+
+
+# Reads the rows of nodes
+# @param reverse: projection of local points to (lat, lon), e.g. UtmBatchProjector.reverse
+# @param points: list of lanelet2 Points
+# @return: IDs, latitudes, longitudes, z-values (ndarray[N]) and the tags of the nodes with tags (dict)
+def node_rows(reverse, points):
+
+    xyz = np.array([(point.x, point.y, point.z) for point in points], dtype=np.float64).reshape(-1, 3)
+    lat, lon = reverse(xyz[:, :2])
+
+    # the elevation is written from z
+    tags = {}
+    for k, point in enumerate(points):
+        if len(point.attributes) != 0:
+            tags[k] = tag_items({key: value for key, value in dict(point.attributes).items() if key != "ele"})
+
+    return np.array([point.id for point in points], dtype=np.int64), lat, lon, xyz[:, 2], tags
+
+
+# Serializes nodes
+# @param rows: rows of node_rows()
+# @return: XML (String)
+def nodes_xml(rows):
+
+    ids, lat, lon, z, tags = rows
+
+    lines = []
+    for k, (ID, z_value, lat_text, lon_text) in enumerate(zip(ids.tolist(), z.tolist(), format_degrees(lat), format_degrees(lon))):
+        items = tags.get(k, ())
+        if z_value != 0.0:
+            items = tuple(sorted(items + (("ele", "%.12g" % z_value),)))
+        if len(items) == 0:
+            lines.append('  <node id="%d" lat="%s" lon="%s"/>\n' % (ID, lat_text, lon_text))
+        else:
+            lines.append('  <node id="%d" lat="%s" lon="%s">\n%s  </node>\n' % (ID, lat_text, lon_text, format_tag_items(items)))
+
+    return "".join(lines)
+
+
+# Reads the rows of ways
+# @param area: the ways are Polygons (tag area=true)
+# @param chains: list of chains of LineStrings, each chain is written as one way
+# @return: list of (ID, point IDs, tags)
+def way_rows(area, chains):
+
+    extra = {"area": "true"} if area else None
+    rows = []
+    for chain in chains:
+        point_ids = [point.id for point in chain[0]]
+        for line in chain[1:]:
+            point_ids.extend(point.id for point in islice(line, 1, None))
+        rows.append((chain[0].id, point_ids, tag_items(chain[0].attributes, extra)))
+
+    return rows
+
+
+# Serializes ways
+# @param rows: rows of way_rows()
+# @return: XML (String)
+def ways_xml(rows):
+
+    lines = []
+    for ID, point_ids, items in rows:
+        lines.append('  <way id="%d">\n' % ID)
+        lines.extend('    <nd ref="%d"/>\n' % ref for ref in point_ids)
+        lines.append(format_tag_items(items))
+        lines.append('  </way>\n')
+
+    return "".join(lines)
+
+
+# Returns the ID of the stored centerline of a Lanelet, 0 if it has none
+# A stored centerline is a LineString of the map (lane.centerline computes one, if there is none).
+# @param line_index: the LineStrings of the map by ID (dict), None if the map has no stored centerlines
+# @param lane: a Lanelet
+def centerline_id(line_index, lane):
+
+    if line_index == None:
+        return 0
+    ID = lane.centerline.id
+    return ID if ID != 0 and ID in line_index else 0
+
+
+# Returns the members of a Lanelet
+# @param line_index: see centerline_id()
+# @param lane: a Lanelet
+# @return: list of (type, ref, role), the type tag
+def lanelet_members(line_index, lane):
+
+    members = [("way", lane.leftBound.id, "left"), ("way", lane.rightBound.id, "right")]
+    ID = centerline_id(line_index, lane)
+    if ID != 0:
+        members.append(("way", ID, "centerline"))
+    members.extend(("relation", regelem.id, "regulatory_element") for regelem in lane.regulatoryElements)
+
+    return members, "lanelet"
+
+
+# Returns the members of an Area
+# @param area: an Area
+# @return: list of (type, ref, role), the type tag
+def area_members(area):
+
+    members = [("way", line.id, "outer") for line in area.outerBound]
+    for inner in area.innerBounds:
+        members.extend(("way", line.id, "inner") for line in inner)
+    members.extend(("relation", regelem.id, "regulatory_element") for regelem in area.regulatoryElements)
+
+    return members, "multipolygon"
+
+
+# Returns the OSM type of a parameter of a regulatory element
+# @param element: a Point, LineString, Polygon, Lanelet, Area or RegulatoryElement
+def member_type(element):
+
+    name = type(element).__name__
+    if "Point" in name:
+        return "node"
+    if "LineString" in name or "Polygon" in name:
+        return "way"
+    return "relation"
+
+
+# Returns the members of a regulatory element
+# @param regelem: a RegulatoryElement
+# @return: list of (type, ref, role), the type tag
+def regulatory_element_members(regelem):
+
+    members = [(member_type(element), element.id, role)
+               for role, elements in regelem.parameters.items() for element in elements]
+
+    return members, "regulatory_element"
+
+
+# Reads the rows of relations
+# @param members: function element -> (members, type tag), e.g. lanelet_members()
+# @param elements: list of Lanelets, Areas or RegulatoryElements
+# @return: list of (ID, members, tags)
+def relation_rows(members, elements):
+
+    rows = []
+    for element in elements:
+        element_members, relation_type = members(element)
+        rows.append((element.id, element_members, tag_items(element.attributes, {"type": relation_type})))
+
+    return rows
+
+
+# Serializes relations
+# @param rows: rows of relation_rows()
+# @return: XML (String)
+def relations_xml(rows):
+
+    lines = []
+    for ID, element_members, items in rows:
+        lines.append('  <relation id="%d">\n' % ID)
+        lines.extend('    <member type="%s" ref="%d" role=%s/>\n' % (kind, ref, quote_role(role))
+                     for kind, ref, role in element_members)
+        lines.append(format_tag_items(items))
+        lines.append('  </relation>\n')
+
+    return "".join(lines)
+
+
+# Returns the LineStrings as chains of collinear two-point LineStrings (see above)
+# Only the free two-point LineStrings are held; the chains are generated in the order of the LineStrings.
+# @param lines: the LineStrings, iterated twice (e.g. the values of the ID index)
+# @param used_ids: IDs of the LineStrings used by Lanelets, Areas and regulatory elements (set)
+# @return: generator of chains (lists of LineStrings), each LineString in exactly one chain
+def collinear_chains(lines, used_ids):
+
+    # free two-point LineStrings: first and last Point
+    free = {line.id: line for line in lines if len(line) == 2 and line.id not in used_ids}
+    starts = {}
+    ends = {}
+    for ID, line in free.items():
+        starts.setdefault(line[0].id, []).append(ID)
+        ends.setdefault(line[1].id, []).append(ID)
+
+    # successor: the only free LineString starting at the end, which is the only one ending there
+    def successor(line):
+
+        following = starts.get(line[1].id, ())
+        if len(following) != 1 or len(ends[line[1].id]) != 1:
+            return None
+
+        next_line = free[following[0]]
+        if next_line.id == line.id or dict(next_line.attributes) != dict(line.attributes):
+            return None
+
+        a = np.array((line[0].x, line[0].y, line[0].z))
+        b = np.array((line[1].x, line[1].y, line[1].z))
+        c = np.array((next_line[1].x, next_line[1].y, next_line[1].z))
+        ac = c - a
+        length2 = ac.dot(ac)
+        if length2 == 0.0 or (b - a).dot(ac) <= 0.0 or (c - b).dot(ac) <= 0.0:
+            return None
+        offset = (b - a) - (b - a).dot(ac) / length2 * ac
+        if offset.dot(offset) > COLLINEAR_TOLERANCE ** 2:
+            return None
+
+        return next_line
+
+    next_of = {ID: successor(line) for ID, line in free.items()}
+    has_predecessor = {next_line.id for next_line in next_of.values() if next_line != None}
+
+    chained = set()
+    for line in lines:
+        if line.id not in free:
+            yield [line]
+            continue
+        if line.id in chained or line.id in has_predecessor:
+            continue
+        chain = [line]
+        chained.add(line.id)
+        next_line = next_of[line.id]
+        while next_line != None and next_line.id not in chained:
+            chain.append(next_line)
+            chained.add(next_line.id)
+            next_line = next_of[next_line.id]
+        yield chain
+
+    # closed rings of collinear LineStrings cannot exist, but never lose a LineString
+    for ID in free:
+        if ID not in chained:
+            yield [free[ID]]
+
+
+# Serializes chunks of elements in order
+# The rows of a chunk are read in the calling thread; with an executor they are formatted in its
+# workers and at most 2 * workers chunks are formatted ahead of the writer.
+# @param rows: function chunk -> rows, e.g. node_rows()
+# @param function: function rows -> XML, e.g. nodes_xml()
+# @param elements: iterable of elements
+# @param chunk_size: elements per chunk (int)
+# @param workers: number of worker processes of the executor (int)
+# @param executor: a ProcessPoolExecutor, None formats in the calling thread
+# @return: generator of (number of elements, XML)
+def serialize_chunks(rows, function, elements, chunk_size, workers, executor):
+
+    iterator = iter(elements)
+    chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+
+    if executor == None:
+        for chunk in chunks:
+            yield len(chunk), function(rows(chunk))
+        return
+
+    pending = deque()
+    for chunk in chunks:
+        pending.append((len(chunk), executor.submit(function, rows(chunk))))
+        if len(pending) >= 2 * workers:
+            n, future = pending.popleft()
+            yield n, future.result()
+    while pending:
+        n, future = pending.popleft()
+        yield n, future.result()
+
+
+# Writes a LaneletMap as OSM file
+# @param lanelet_map: a LaneletMap
+# @param path: path of the OSM file (String)
+# @param compress: gzip compressed, default if the path ends with ".gz"
+# @param merge_collinear: merge chains of collinear two-point LineStrings (see above); the bounds of
+#                         Lanelets are never merged, so a map of Lanelets only like Data_Map.osm
+#                         is written with the same ways
+# @param workers: number of worker processes formatting the chunks (int), 0 or 1 formats in the calling thread
+# @param chunk_size: elements per chunk (int)
+# @return: number of written nodes, ways and relations (dict)
+def write_osm_stream(lanelet_map, path: str, compress = None, merge_collinear = False, workers = 0,
+                     chunk_size = CHUNK_SIZE):
+
+    lmap = lanelet_map.lmap
+    lanelet_map.get_projector()
+    reverse = lanelet_map.batch_projector.reverse
+    line_index = lanelet_map.line_index
+
+    # IDs of the bounds: a map with other LineStrings may have stored centerlines
+    used_ids = set()
+    for lane in lanelet_map.lanelet_index.values():
+        used_ids.add(lane.leftBound.id)
+        used_ids.add(lane.rightBound.id)
+    centerlines = line_index if len(used_ids) < len(line_index) else None
+
+    if merge_collinear:
+        if centerlines != None:
+            used_ids.update(centerline_id(centerlines, lane) for lane in lanelet_map.lanelet_index.values())
+        for area in lmap.areaLayer:
+            used_ids.update(line.id for line in area.outerBound)
+            used_ids.update(line.id for inner in area.innerBounds for line in inner)
+        for regelem in lmap.regulatoryElementLayer:
+            used_ids.update(element.id for elements in regelem.parameters.values() for element in elements
+                            if member_type(element) == "way")
+        chains = collinear_chains(line_index.values(), used_ids)
+    else:
+        chains = ([line] for line in line_index.values())
+    used_ids = None
+
+    if compress == None:
+        compress = path.endswith(".gz")
+
+    parts = (("nodes", partial(node_rows, reverse), nodes_xml, lanelet_map.point_index.values()),
+             ("ways", partial(way_rows, False), ways_xml, chains),
+             ("ways", partial(way_rows, True), ways_xml, ([polygon] for polygon in lmap.polygonLayer)),
+             ("relations", partial(relation_rows, partial(lanelet_members, centerlines)), relations_xml,
+              lanelet_map.lanelet_index.values()),
+             ("relations", partial(relation_rows, area_members), relations_xml, lmap.areaLayer),
+             ("relations", partial(relation_rows, regulatory_element_members), relations_xml, lmap.regulatoryElementLayer))
+
+    counts = {"nodes": 0, "ways": 0, "relations": 0}
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        with (gzip.open(path, "wt", encoding="utf-8", compresslevel=6) if compress
+              else open(path, "w", encoding="utf-8")) as osm_file:
+            osm_file.write('<?xml version="1.0"?>\n<osm version="0.6" upload="false" generator="lanelet2">\n')
+            for kind, rows, function, elements in parts:
+                for n, xml in serialize_chunks(rows, function, elements, chunk_size, workers, executor):
+                    counts[kind] += n
+                    osm_file.write(xml)
+            osm_file.write('</osm>\n')
+    finally:
+        if executor != None:
+            executor.shutdown()
+
+    return counts
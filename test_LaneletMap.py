@@ -0,0 +1,932 @@
+#!/usr/bin/env python
+
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import Future
+import numpy as np
+import pytest
+import lanelet2
+from lanelet2.core import AttributeMap, BasicPoint2d, BasicPoint3d, GPSPoint, Lanelet, LineString3d, Point3d, TrafficLight, getId
+from LaneletMap import LaneletMap, read_boundaries_csv
+from LaneletSnapshot import MapSnapshot
+from LaneletTracker import LaneletTracker
+from LaneletServer import AsyncLaneletMapClient, LaneletMapServer
+from LaneletMatching import match_trajectory_file
+import LaneletValidation
+from LaneletValidation import validate_snapshot
+from Benchmark_LaneletMap import make_grid_map, make_ring_map, make_ring_map_by_elements
+
+# Tests of the LaneletMap (python -m pytest -q)
+
+DATA_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data_Map.osm")
+DATA_MAP_WITH_CENTERLINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data_Map_with_centerline.osm")
+POINT_DATA_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Point_Data_Map.csv")
+
+
+# Writes a ring map of about n_lanelets Lanelets into an OSM file
+# @return: path of the OSM file (str)
+def write_ring_map(tmp_path, n_lanelets: int):
+
+    osm_map_file = str(tmp_path / ("ring_%d.osm" % n_lanelets))
+    make_ring_map(n_lanelets).write_LaneletMap_to_file(osm_map_file)
+
+    return osm_map_file
+
+
+# Point IDs, coordinates and attributes of the bounds of Lanelets
+def bounds_of(lanelet_map_, ids):
+
+    def line_of(line):
+        return [(point.id, point.x, point.y, point.z) for point in line], dict(line.attributes)
+
+    return {ID: (line_of(lane.leftBound), line_of(lane.rightBound), dict(lane.attributes))
+            for ID, lane in ((ID, lanelet_map_.get_Lanelet_with_Id(ID)) for ID in ids)}
+
+
+# The ID index finds every element of a loaded map and the elements of the builder methods
+def test_lookup_by_id():
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    lmap = lanelet_map_.lmap
+    for lane in lmap.laneletLayer:
+        assert lanelet_map_.get_Lanelet_with_Id(lane.id) == lane
+    for line in lmap.lineStringLayer:
+        assert lanelet_map_.get_Line_with_Id(line.id).id == line.id
+        assert [point.id for point in lanelet_map_.get_Line_with_Id(line.id)] == [point.id for point in line]
+    for point in lmap.pointLayer:
+        assert lanelet_map_.get_Point_with_Id(point.id) == point
+    assert lanelet_map_.get_Lanelet_with_Id(-5) == None
+    assert lanelet_map_.get_Line_with_Id(-5) == None
+    assert lanelet_map_.get_Point_with_Id(-5) == None
+
+    # new elements are in the index at once
+    points = [lanelet_map_.add_and_get_Point(x, y) for x, y in ((500.0, 0.0), (510.0, 0.0), (500.0, 3.5), (510.0, 3.5),
+                                                                (500.0, 1.75), (510.0, 1.75))]
+    assert [lanelet_map_.get_Point_with_Id(point.id) for point in points] == points
+    left = lanelet_map_.add_and_get_lineString(points[2], points[3])
+    right = lanelet_map_.add_and_get_lineString(points[0], points[1])
+    center = lanelet_map_.add_and_get_lineString(points[4], points[5])
+    assert lanelet_map_.get_Line_with_Id(left.id) == left
+
+    ids = set(lanelet_map_.lanelet_index)
+    lanelet_map_.add_Lanelet(left, right)
+    lanelet_map_.add_Lanelet_with_Centerline(left, right, center)
+    new_ids = sorted(set(lanelet_map_.lanelet_index) - ids)
+    assert len(new_ids) == 2
+    assert lanelet_map_.get_Lanelet_with_Id(new_ids[1]).centerline.id == center.id
+    assert lanelet_map_.get_Lanelet_with_Id(new_ids[0]).leftBound.id == left.id
+    assert lanelet_map_.lmap.laneletLayer.exists(new_ids[0])
+    assert lanelet_map_.point_xy_over_Lanelet(505.0, 1.0) in new_ids
+
+
+# The batch projection equals the lanelet2 UtmProjector, also in the zones of Norway and
+# Svalbard, the projector is kept per origin, and the batch matching equals the single one
+def test_projection_like_lanelet2():
+
+    rng = np.random.default_rng(1)
+    for lat0, lon0 in ((0.0, 0.0), (49.0, 8.4), (60.0, 5.0), (-33.9, 151.2), (78.0, 15.0)):
+        lanelet_map_ = LaneletMap(lat0, lon0)
+        lat = lat0 + rng.uniform(-0.05, 0.05, 200)
+        lon = lon0 + rng.uniform(-0.05, 0.05, 200)
+        projector = lanelet_map_.get_projector()
+        assert lanelet_map_.get_projector() is projector
+
+        xy = lanelet_map_.project_ll_to_xy(lat, lon)
+        expected = [(point.x, point.y) for point in (projector.forward(GPSPoint(a, b)) for a, b in zip(lat, lon))]
+        assert np.abs(xy - np.array(expected)).max() < 1e-6
+
+        lat_back, lon_back = lanelet_map_.project_xy_to_ll(xy)
+        assert np.abs(lat_back - lat).max() < 1e-9 and np.abs(lon_back - lon).max() < 1e-9
+        expected = [(point.lat, point.lon) for point in (projector.reverse(BasicPoint3d(x, y, 0.0)) for x, y in xy)]
+        assert np.abs(np.stack((lat_back, lon_back), axis=1) - np.array(expected)).max() < 1e-9
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    xy = rng.uniform((-10.0, -10.0), (110.0, 110.0), (300, 2))
+    lat, lon = lanelet_map_.project_xy_to_ll(xy)
+    ids = lanelet_map_.points_ll_over_Lanelets(lat, lon)
+    expected = [lanelet_map_.point_ll_over_Lanelet(a, b) for a, b in zip(lat.tolist(), lon.tolist())]
+    assert [ID if ID >= 0 else None for ID in ids.tolist()] == expected
+    assert any(ID != None for ID in expected) and any(ID == None for ID in expected)
+
+    # a new origin, a new projector
+    projector = lanelet_map_.get_projector()
+    lanelet_map_.lat = 49.0
+    assert lanelet_map_.get_projector() is not projector
+
+
+# build_corridor() of the CSV rows gives the maps of the CSV converters, closed to a ring or open
+def test_build_corridor_like_csv_maps():
+
+    boundaries = read_boundaries_csv(POINT_DATA_MAP)
+    assert boundaries.shape == (4, 56, 2)
+
+    # Points of the bounds (and centerlines) and attributes (without the type of the OSM file) per
+    # lane, in the order of the lane centroids: lanelet2 loads the lanes of this ring (left bound on
+    # the right side) with inverted bounds, so the Points of a lane are compared without their order
+    def lanes_of(lanelet_map_, centerline):
+        lanes = []
+        for lane in lanelet_map_.lanelet_index.values():
+            lines = (lane.leftBound, lane.rightBound, lane.centerline) if centerline else (lane.leftBound, lane.rightBound)
+            xy = np.array([(point.x, point.y) for line in lines for point in line])
+            attributes = sorted((name, value) for name, value in lane.attributes.items() if name != "type")
+            key = np.round(xy, 1)
+            lanes.append((xy.mean(axis=0), xy[np.lexsort((key[:, 1], key[:, 0]))], attributes))
+        return lanes
+
+    for osm_map_file, n_bounds, centerline in ((DATA_MAP, 4, False), (DATA_MAP_WITH_CENTERLINE, 2, True)):
+        built_map = LaneletMap()
+        lanes = built_map.build_corridor(boundaries[:n_bounds], closed=True, centerline=centerline)
+        assert [len(lane_k) for lane_k in lanes] == [56] * (n_bounds - 1)
+        built = lanes_of(built_map, centerline)
+        loaded = lanes_of(LaneletMap(0, 0, osm_map_file), centerline)
+        assert len(built) == len(loaded) == 56 * (n_bounds - 1)
+        for centroid, xy, attributes in built:
+            k = int(np.argmin([np.hypot(*(centroid - other)) for other, _, _ in loaded]))
+            assert np.abs(loaded[k][1] - xy).max() < 1e-3 and loaded[k][2] == attributes
+        assert built_map.validate()["passed"]
+
+    # an open corridor ends, a ring goes on
+    open_map = LaneletMap()
+    lanes = open_map.build_corridor(boundaries, closed=False)
+    assert len(open_map.lanelet_index) == 3 * 55
+    assert open_map.get_following_Lanelet(lanes[0][-1]) == None
+    assert open_map.get_following_Lanelet(lanes[0][0]).id == lanes[0][1].id
+    assert open_map.get_leftBound_Lanelet(lanes[1][0]).id == lanes[0][0].id
+    assert open_map.build_corridor(boundaries[:1]) == []
+
+
+# The corridor ahead equals the steps of get_following_Lanelet() with the neighbours of each
+# Lanelet, by number or by distance, and is cached until the map changes
+def test_corridor_ahead():
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    lane = lanelet_map_.get_Lanelet_with_Id(sorted(lanelet_map_.lanelet_index)[1])
+
+    expected = []
+    step = lane
+    for _ in range(6):
+        left = lanelet_map_.get_leftBound_Lanelet(step)
+        right = lanelet_map_.get_rightBound_Lanelet(step)
+        expected.append((step.id, left.id if left != None else -1, right.id if right != None else -1,
+                         lanelet_map_.get_Lanelet_length(step)))
+        step = lanelet_map_.get_following_Lanelet(step)
+
+    corridor = lanelet_map_.get_corridor_ahead(lane, 6)
+    assert list(zip(corridor["ids"].tolist(), corridor["left"].tolist(), corridor["right"].tolist(),
+                    corridor["length"].tolist())) == expected
+    assert (corridor["left"] >= 0).any() and (corridor["right"] >= 0).any()
+    assert not corridor["ids"].flags.writeable
+    assert lanelet_map_.get_corridor_ahead(lane, 6) is corridor
+
+    # by distance: the Lanelets until the distance is covered
+    corridor = lanelet_map_.get_corridor_ahead(lane, 25.0)
+    lengths = corridor["length"]
+    assert lengths.sum() >= 25.0 > lengths[:-1].sum()
+    assert corridor["ids"].tolist() == [ID for ID, _, _, _ in expected[:len(lengths)]]
+
+    # at most corridor_cache_size corridors, none of the old map
+    lanelet_map_.corridor_cache_size = 2
+    for n in (1, 2, 3):
+        lanelet_map_.get_corridor_ahead(lane, n)
+    assert len(lanelet_map_.corridor_cache) == 2
+    lanelet_map_.update_map(remove_ids=[expected[2][0]])
+    assert lanelet_map_.get_corridor_ahead(lane, 6)["ids"].tolist() == [expected[0][0], expected[1][0]]
+    assert lanelet_map_.get_corridor_ahead(Lanelet(getId(), LineString3d(getId(), []), LineString3d(getId(), [])), 6) == None
+
+
+# draw_map() renders into PNG and SVG files without pyplot, drops the LineStrings outside the
+# viewport and the inner points closer than min_spacing
+def test_draw_map_headless(tmp_path):
+
+    png_file = str(tmp_path / "map.png")
+    script = "import sys; from LaneletMap import LaneletMap; LaneletMap(0, 0, %r).draw_map(output_file=%r); " \
+             "print('matplotlib.pyplot' in sys.modules)" % (DATA_MAP, png_file)
+    output = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(DATA_MAP),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split()[-1] == "False"
+    with open(png_file, "rb") as png:
+        assert png.read(8) == b"\x89PNG\r\n\x1a\n"
+
+    # a LineString of 1001 points beside the ring
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    x = np.linspace(0.0, 100.0, 1001)
+    lanelet_map_.update_map(lines=[LineString3d(getId(), [Point3d(getId(), a, 150.0 + np.sin(a), 0.0) for a in x])])
+
+    import matplotlib
+    def svg_of(**options):
+        svg_file = str(tmp_path / "map.svg")
+        with matplotlib.rc_context({"path.simplify": False}):
+            lanelet_map_.draw_map(output_file=svg_file, **options)
+        with open(svg_file) as svg:
+            return svg.read()
+
+    svg = svg_of()
+    assert svg.startswith("<?xml") and "<svg" in svg
+    assert 30 < svg_of(bbox=(-20.0, 40.0, 20.0, 70.0)).count("<path") < svg.count("<path") // 4
+    line_bbox = (-1.0, 140.0, 101.0, 160.0)
+    assert len(svg_of(bbox=line_bbox, min_spacing=5.0)) < len(svg_of(bbox=line_bbox)) // 2
+
+
+# The geometry arrays hold the points of every LineString and the bounds and centerlines of
+# every Lanelet, read-only and cached until the map changes, also of a snapshot
+def test_geometry_arrays(tmp_path):
+
+    osm_map_file = str(tmp_path / "Data_Map_with_centerline.osm")
+    shutil.copy(DATA_MAP_WITH_CENTERLINE, osm_map_file)
+    lanelet_map_ = LaneletMap(0, 0, osm_map_file)
+    geometry = lanelet_map_.get_geometry_arrays()
+
+    def xyz_of(line):
+        return [[point.x, point.y, point.z] for point in line]
+
+    xyz = geometry["xyz"]
+    offsets = geometry["line_offsets"]
+    for k, ID in enumerate(geometry["line_ids"].tolist()):
+        assert xyz[offsets[k]:offsets[k + 1]].tolist() == xyz_of(lanelet_map_.get_Line_with_Id(ID))
+    for k, ID in enumerate(geometry["lanelet_ids"].tolist()):
+        lane = lanelet_map_.get_Lanelet_with_Id(ID)
+        for name, line, inverted in (("left", lane.leftBound, geometry["lanelet_inverted"][k, 0]),
+                                     ("right", lane.rightBound, geometry["lanelet_inverted"][k, 1]),
+                                     ("center", lane.centerline, False)):
+            begin, end = geometry["lanelet_" + name][k]
+            points = xyz[begin:end].tolist()
+            assert (points[::-1] if inverted else points) == xyz_of(line)
+    assert sorted(geometry["lanelet_ids"].tolist()) == sorted(lanelet_map_.lanelet_index)
+    assert not any(array.flags.writeable for array in geometry.values())
+    assert np.shares_memory(geometry["xy"], geometry["xyz"])
+
+    line_ids, line_offsets, xy = lanelet_map_.get_LineString_arrays()
+    assert line_ids is geometry["line_ids"] and np.array_equal(xy, xyz[:, :2])
+    assert lanelet_map_.get_geometry_arrays() is geometry
+
+    # a new LineString, a new export
+    lanelet_map_.add_and_get_lineString(lanelet_map_.add_and_get_Point(200.0, 0.0), lanelet_map_.add_and_get_Point(210.0, 0.0))
+    changed = lanelet_map_.get_geometry_arrays()
+    assert changed is not geometry and len(changed["line_ids"]) == len(geometry["line_ids"]) + 1
+    assert changed["xy"][-2:].tolist() == [[200.0, 0.0], [210.0, 0.0]]
+
+    # the arrays of a snapshot
+    LaneletMap(0, 0, osm_map_file, use_snapshot=True)
+    snapshot_map = LaneletMap(0, 0, osm_map_file, use_snapshot=True)
+    assert snapshot_map.snapshot != None
+    # points of the bounds and the centerline per Lanelet ID: a snapshot holds them sorted by ID
+    def lanes_of(geometry):
+        xy = np.round(geometry["xy"], 6).tolist()
+        lanes = {}
+        for k, ID in enumerate(geometry["lanelet_ids"].tolist()):
+            pairs = [geometry["lanelet_" + name][k].tolist() for name in ("left", "right", "center")]
+            lanes[ID] = [xy[begin:end] for begin, end in pairs]
+        return lanes
+
+    assert lanes_of(snapshot_map.get_geometry_arrays()) == lanes_of(geometry)
+
+
+# A warm start from the snapshot gives the same map as the cold start; a changed OSM file
+# or origin is loaded cold and rewrites the snapshot
+def test_snapshot_warm_start(tmp_path):
+
+    osm_map_file = write_ring_map(tmp_path, 300)
+    cold_map = LaneletMap(0, 0, osm_map_file, use_snapshot=True)
+    assert cold_map.snapshot == None and os.path.exists(osm_map_file + ".snapshot")
+
+    warm_map = LaneletMap(0, 0, osm_map_file, use_snapshot=True)
+    assert warm_map.snapshot != None
+    ids = sorted(cold_map.lanelet_index)
+    assert len(warm_map.snapshot.lanelet_ids) == len(ids)
+    assert bounds_of(warm_map, ids) == bounds_of(cold_map, ids)
+
+    neighbours = warm_map.get_neighbour_ids(np.array(ids))
+    for name, expected in cold_map.get_neighbour_ids(np.array(ids)).items():
+        assert all(np.array_equal(a, b) for a, b in zip(neighbours[name], expected))
+    rng = np.random.default_rng(0)
+    _, _, xy = cold_map.get_LineString_arrays()
+    points = rng.uniform(xy.min(axis=0), xy.max(axis=0), (1000, 2))
+    assert np.array_equal(warm_map.points_xy_over_Lanelets(points), cold_map.points_xy_over_Lanelets(points))
+    assert warm_map.get_route_of_Ids(ids[0], ids[-1]) == cold_map.get_route_of_Ids(ids[0], ids[-1])
+
+    # another origin: the snapshot is stale
+    moved_map = LaneletMap(0.001, 0, osm_map_file, use_snapshot=True)
+    assert moved_map.snapshot == None
+    assert LaneletMap(0.001, 0, osm_map_file, use_snapshot=True).snapshot != None
+
+    # another OSM file under the same name
+    make_ring_map(100).write_LaneletMap_to_file(osm_map_file)
+    changed_map = LaneletMap(0.001, 0, osm_map_file, use_snapshot=True)
+    assert changed_map.snapshot == None and len(changed_map.lanelet_index) < len(ids)
+    assert len(LaneletMap(0.001, 0, osm_map_file, use_snapshot=True).snapshot.lanelet_ids) == len(changed_map.lanelet_index)
+
+
+# A map with a regulatory element is not written as snapshot: it starts from the OSM file each time
+def test_snapshot_refused_with_regulatory_element(tmp_path):
+
+    lanelet_map_ = make_ring_map(100)
+    lane = lanelet_map_.get_Lanelet_with_Id(sorted(lanelet_map_.lanelet_index)[0])
+    light = LineString3d(getId(), [Point3d(getId(), lane.leftBound[0].x + 1.0, lane.leftBound[0].y, 5.0),
+                                   Point3d(getId(), lane.rightBound[0].x - 1.0, lane.rightBound[0].y, 5.0)],
+                         {"type": "traffic_light"})
+    traffic_light = TrafficLight(getId(), AttributeMap(), [light])
+    lane.addRegulatoryElement(traffic_light)
+    lanelet_map_.lmap.add(traffic_light)
+    osm_map_file = str(tmp_path / "traffic_light.osm")
+    lanelet_map_.write_LaneletMap_to_file(osm_map_file)
+
+    for _ in range(2):
+        loaded_map = LaneletMap(0, 0, osm_map_file, use_snapshot=True)
+        assert loaded_map.snapshot == None and not os.path.exists(osm_map_file + ".snapshot")
+        assert len(loaded_map.lmap.regulatoryElementLayer) == 1
+
+    with pytest.raises(ValueError):
+        MapSnapshot.from_LaneletMap(loaded_map)
+    assert loaded_map.validate()["passed"]
+
+
+# A map published into shared memory (or a snapshot file) is attached by other processes:
+# the same lookups, neighbours and matching without a Lanelet2 map; a process exiting
+# does not remove the block for the others
+def test_shared_map_publish_attach(tmp_path):
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    ids = sorted(lanelet_map_.lanelet_index)
+    rng = np.random.default_rng(0)
+    _, _, xy = lanelet_map_.get_LineString_arrays()
+    points = rng.uniform(xy.min(axis=0), xy.max(axis=0), (1000, 2))
+
+    snapshot_path = str(tmp_path / "Data_Map.snapshot")
+    lanelet_map_.export_snapshot(snapshot_path)
+    block = lanelet_map_.publish_shared_map()
+    try:
+        for shared_map in (block.name, snapshot_path):
+            attached_map = LaneletMap(shared_map=shared_map)
+            assert bounds_of(attached_map, ids) == bounds_of(lanelet_map_, ids)
+            for ID in ids:
+                assert attached_map.get_following_Lanelets(attached_map.get_Lanelet_with_Id(ID)) != None
+            neighbours = attached_map.get_neighbour_ids(np.array(ids))
+            for name, expected in lanelet_map_.get_neighbour_ids(np.array(ids)).items():
+                assert all(np.array_equal(a, b) for a, b in zip(neighbours[name], expected))
+            assert np.array_equal(attached_map.points_xy_over_Lanelets(points), lanelet_map_.points_xy_over_Lanelets(points))
+
+            # no copy of the whole map
+            with pytest.raises(RuntimeError):
+                attached_map.get_route_of_Ids(ids[0], ids[5])
+            assert attached_map.snapshot != None
+
+        # worker processes attach and exit
+        worker = "from LaneletMap import LaneletMap; print(len(LaneletMap(shared_map=%r).snapshot.lanelet_ids))" % block.name
+        for _ in range(2):
+            output = subprocess.run([sys.executable, "-c", worker], cwd=os.path.dirname(DATA_MAP),
+                                    capture_output=True, text=True, check=True).stdout
+            assert output.split()[-1] == str(len(ids))
+        assert len(LaneletMap(shared_map=block.name).snapshot.lanelet_ids) == len(ids)
+    finally:
+        block.close()
+        block.unlink()
+
+
+# A tiled map answers lookups, neighbours, corridors and matching like the whole map from at most
+# max_tiles open tiles; operations on the whole map raise instead of loading all tiles
+def test_tiled_map(tmp_path):
+
+    osm_map_file = write_ring_map(tmp_path, 300)
+    full_map = LaneletMap(0, 0, osm_map_file)
+    # a first tiled map splits the OSM file into tiles
+    LaneletMap(0, 0, osm_map_file, tile_size=50.0, max_tiles=4)
+    tiled_map = LaneletMap(0, 0, osm_map_file, tile_size=50.0, max_tiles=4)
+    assert len(tiled_map.snapshot.tile_codes) > 4
+
+    ids = sorted(full_map.lanelet_index)
+    for ID in ids:
+        lane = tiled_map.get_Lanelet_with_Id(ID)
+        assert lane.id == ID
+        following = tiled_map.get_following_Lanelets(lane)
+        assert [lane.id for lane in following] == [lane.id for lane in full_map.get_following_Lanelets(full_map.get_Lanelet_with_Id(ID))]
+    corridor = tiled_map.get_corridor_ahead(tiled_map.get_Lanelet_with_Id(ids[0]), 200.0)
+    expected = full_map.get_corridor_ahead(full_map.get_Lanelet_with_Id(ids[0]), 200.0)
+    assert all(np.allclose(corridor[name], expected[name]) for name in expected)
+
+    rng = np.random.default_rng(0)
+    _, _, xy = full_map.get_LineString_arrays()
+    points = rng.uniform(xy.min(axis=0), xy.max(axis=0), (2000, 2))
+    assert np.array_equal(tiled_map.points_xy_over_Lanelets(points), full_map.points_xy_over_Lanelets(points))
+    for x, y in points[:200].tolist():
+        assert tiled_map.point_xy_over_Lanelet(x, y) == full_map.point_xy_over_Lanelet(x, y)
+    assert len(tiled_map.snapshot.tiles) <= 4
+
+    # operations on the whole map
+    for operation in (lambda: tiled_map.lmap, lambda: tiled_map.get_route_of_Ids(ids[0], ids[1]),
+                      lambda: tiled_map.write_LaneletMap_to_file(str(tmp_path / "tiled.osm")),
+                      lambda: tiled_map.stream_LaneletMap_to_file(str(tmp_path / "tiled.osm")),
+                      tiled_map.validate, tiled_map.get_snapshot, tiled_map.get_geometry_arrays,
+                      tiled_map.get_centerlines, lambda: tiled_map.xy_to_sd(points), tiled_map.draw_map):
+        with pytest.raises(RuntimeError):
+            operation()
+    assert len(tiled_map.snapshot.tiles) <= 4
+
+
+# Centerlines of a Lanelet with an inverted bound: the bound is stored against the driving direction
+def test_centerline_of_inverted_bound():
+
+    for add_to_index in (False, True):
+        lanelet_map_ = LaneletMap()
+        left = LineString3d(getId(), [Point3d(getId(), 0, 3, 0), Point3d(getId(), 10, 3, 0)])
+        right = LineString3d(getId(), [Point3d(getId(), 10, 0, 0), Point3d(getId(), 0, 0, 0)])
+        lane = Lanelet(getId(), left, right.invert())
+        lanelet_map_.lmap.add(lane)
+        if add_to_index:
+            lanelet_map_.add_Lanelet_to_index(lane)
+        else:
+            lanelet_map_.build_index()
+
+        # lanelet2 adds inner points: the centerlines are compared on the same x-values
+        expected = np.array([(point.x, point.y) for point in lane.centerline])
+        for spacing in (None, 2.5):
+            xyz = lanelet_map_.get_centerlines(spacing)["xyz"]
+            assert np.allclose(xyz[[0, -1], :2], expected[[0, -1]])
+            assert np.allclose(xyz[:, 1], np.interp(xyz[:, 0], expected[:, 0], expected[:, 1]))
+        assert np.allclose(lanelet_map_.get_centerlines(2.5)["xyz"][:, 0], [0.0, 2.5, 5.0, 7.5, 10.0])
+
+        # the snapshot keeps the direction of the bound
+        snapshot_lane = MapSnapshot.from_LaneletMap(lanelet_map_).get_lanelet(lane.id)
+        assert [(point.x, point.y) for point in snapshot_lane.rightBound] == [(0.0, 0.0), (10.0, 0.0)]
+
+
+# Frenet coordinates: s along the lane from its first Lanelet, d to the left, and back to (x, y)
+def test_frenet_round_trip():
+
+    x = np.arange(0.0, 50.0, 10.0)
+    def boundary(y):
+        return np.stack((x, np.full(len(x), y)), axis=1)
+
+    lanelet_map_ = LaneletMap()
+    upper, lower = lanelet_map_.build_corridor([boundary(3.5), boundary(0.0), boundary(-3.5)], closed=False)
+    sd = lanelet_map_.xy_to_sd([[15.0, 2.5], [25.0, -1.0], [100.0, 0.0]])
+    assert sd["lane_ids"].tolist() == [upper[0].id, lower[0].id, -1]
+    assert np.allclose(sd["s"][:2], [15.0, 25.0]) and np.allclose(sd["d"][:2], [0.75, 0.75])
+    assert np.isnan(sd["s"][2]) and np.isnan(sd["d"][2])
+    assert np.allclose(lanelet_map_.sd_to_xy(sd["lane_ids"][:2], sd["s"][:2], sd["d"][:2]), [[15.0, 2.5], [25.0, -1.0]])
+    # beyond the end of an open lane, an unknown lane
+    assert np.allclose(lanelet_map_.sd_to_xy([upper[0].id], [45.0], [0.0]), [[45.0, 1.75]])
+    assert np.isnan(lanelet_map_.sd_to_xy([-1], [0.0], [0.0])).all()
+
+    # the closed lanes of the ring map
+    lanelet_map_ = make_ring_map(300)
+    frenet = lanelet_map_.get_frenet()
+    assert frenet.cyclic.all()
+    rng = np.random.default_rng(0)
+    lane = rng.integers(0, len(frenet.lane_ids), 1000)
+    s = rng.uniform(0.0, 1.0, 1000) * frenet.lane_lengths[lane]
+    d = rng.uniform(-1.0, 1.0, 1000)
+    xy = lanelet_map_.sd_to_xy(frenet.lane_ids[lane], s, d)
+    sd = lanelet_map_.xy_to_sd(xy)
+    assert (sd["lane_ids"] == frenet.lane_ids[lane]).all()
+    assert np.abs(sd["s"] - s).max() < 0.05 and np.abs(sd["d"] - d).max() < 0.01
+    assert np.allclose(lanelet_map_.sd_to_xy(frenet.lane_ids[lane], s + frenet.lane_lengths[lane], d), xy)
+    assert lanelet_map_.get_frenet() is frenet
+
+
+# Map matching of single points without a snapshot: the Lanelet containing the point,
+# also where Lanelets overlap (fork) and on a map without Lanelets
+def test_point_over_Lanelet(tmp_path):
+
+    assert LaneletMap().point_xy_over_Lanelet(1.0, 2.0) == None
+
+    lanelet_map_ = LaneletMap(0, 0, write_ring_map(tmp_path, 300))
+    # a second road leaving the ring diagonally overlaps its Lanelets
+    lanelet_map_.build_corridor([[(150.0, -2.0), (250.0, 60.0)], [(150.0, -8.0), (250.0, 54.0)]], closed=False)
+    lanes = list(lanelet_map_.lanelet_index.values())
+
+    rng = np.random.default_rng(0)
+    _, _, xy = lanelet_map_.get_LineString_arrays()
+    points = rng.uniform(xy.min(axis=0), xy.max(axis=0), (500, 2))
+    points[:100] = rng.uniform((150.0, -8.0), (250.0, 60.0), (100, 2))
+    lat, lon = lanelet_map_.project_xy_to_ll(points)
+
+    for (x, y), point_lat, point_lon in zip(points.tolist(), lat.tolist(), lon.tolist()):
+        inside = {lane.id for lane in lanes if lanelet2.geometry.inside(lane, BasicPoint2d(x, y))}
+        ID = lanelet_map_.point_xy_over_Lanelet(x, y)
+        assert ID in inside if len(inside) > 0 else ID == None
+        assert lanelet_map_.point_ll_over_Lanelet(point_lat, point_lon) == ID
+
+
+# Two adjacent corridors share their common boundary: with snapping while they are
+# built, else after dedupe_points()
+def test_adjacent_corridors_share_bound():
+
+    x = np.arange(0.0, 50.0, 10.0)
+    def boundary(y):
+        return np.stack((x, np.full(len(x), y)), axis=1)
+
+    for snapping in (True, False):
+        lanelet_map_ = LaneletMap()
+        if snapping:
+            lanelet_map_.enable_snapping()
+        upper = lanelet_map_.build_corridor([boundary(3.5), boundary(0.0)], closed=False)[0]
+        lower = lanelet_map_.build_corridor([boundary(0.0), boundary(-3.5)], closed=False)[0]
+        # a lane of the opposite direction on the other side
+        opposite = lanelet_map_.build_corridor([boundary(7.0)[::-1], boundary(3.5)[::-1]], closed=False)[0]
+        if not snapping:
+            assert lanelet_map_.get_rightBound_Lanelet(upper[0]) == None
+            assert lanelet_map_.dedupe_points() == 10 + 8
+
+        assert len(lanelet_map_.line_index) == 4 * 4
+        assert len(lanelet_map_.lmap.lineStringLayer) == 4 * 4
+        for upper_lane, lower_lane, opposite_lane in zip(upper, lower, reversed(opposite)):
+            upper_lane = lanelet_map_.get_Lanelet_with_Id(upper_lane.id)
+            opposite_lane = lanelet_map_.get_Lanelet_with_Id(opposite_lane.id)
+            assert lanelet_map_.get_rightBound_Lanelet(upper_lane).id == lower_lane.id
+            assert lanelet_map_.get_leftBound_Lanelet(lower_lane).id == upper_lane.id
+            assert opposite_lane.rightBound.id == upper_lane.leftBound.id
+            assert opposite_lane.rightBound.inverted() != upper_lane.leftBound.inverted()
+        assert lanelet_map_.validate()["passed"]
+
+
+# Moved Points, a replaced LineString and removals change the map matching, the Lanelet2 map
+# and the routes; a routing graph in use is rebuilt by update_map(), not by the next route
+def test_update_map():
+
+    x = np.arange(0.0, 50.0, 10.0)
+    def boundary(y):
+        return np.stack((x, np.full(len(x), y)), axis=1)
+
+    lanelet_map_ = LaneletMap()
+    upper, lower = lanelet_map_.build_corridor([boundary(3.5), boundary(0.0), boundary(-3.5)], closed=False)
+    upper_ids = [lane.id for lane in upper]
+    assert lanelet_map_.get_route_of_Ids(upper_ids[0], upper_ids[-1]) == (tuple(upper_ids), 40.0)
+    assert lanelet_map_.point_xy_over_Lanelet(15.0, 0.5) == upper_ids[1]
+    graph = lanelet_map_.routing_graph
+
+    # the shared bound moves above the position
+    shared = lanelet_map_.get_Lanelet_with_Id(upper_ids[1]).rightBound
+    counts = lanelet_map_.update_map(points=[Point3d(point.id, point.x, 1.0, point.z) for point in shared])
+    assert counts == {"added": 0, "changed": 2, "removed": 0}
+    assert lanelet_map_.point_xy_over_Lanelet(15.0, 0.5) == lower[1].id
+    assert lanelet_map_.lmap.pointLayer[shared[1].id].y == 1.0
+    graph = lanelet_map_.routing_graph
+    assert graph != None
+    assert lanelet_map_.get_route_of_Ids(upper_ids[0], upper_ids[-1]) == (tuple(upper_ids), 40.0)
+    assert lanelet_map_.routing_graph is graph
+
+    # a LineString with a new Point in between
+    left = lanelet_map_.get_Lanelet_with_Id(upper_ids[3]).leftBound
+    first, last = list(left)
+    counts = lanelet_map_.update_map(lines=[LineString3d(left.id, [first, Point3d(getId(), 35.0, 5.0, 0.0), last], left.attributes)])
+    assert counts == {"added": 1, "changed": 1, "removed": 0}
+    assert len(lanelet_map_.get_Lanelet_with_Id(upper_ids[3]).leftBound) == 3
+    assert lanelet_map_.point_xy_over_Lanelet(35.0, 4.0) == upper_ids[3]
+
+    # the LineString and the Point of a removed Lanelet, the Point still belongs to the other bound
+    counts = lanelet_map_.update_map(remove_ids=[upper_ids[3], left.id, last.id, first.id])
+    assert counts == {"added": 0, "changed": 0, "removed": 3}
+    assert upper_ids[3] not in lanelet_map_.lanelet_index and first.id in lanelet_map_.point_index
+    assert lanelet_map_.point_xy_over_Lanelet(35.0, 2.0) == None
+    assert not lanelet_map_.lmap.laneletLayer.exists(upper_ids[3])
+    assert lanelet_map_.get_route_of_Ids(upper_ids[0], upper_ids[2]) == (tuple(upper_ids[:3]), 30.0)
+    assert lanelet_map_.validate()["passed"]
+
+
+# A delta file moves a node and deletes a Lanelet of the loaded map
+def test_load_delta(tmp_path):
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    ids = sorted(lanelet_map_.lanelet_index)
+    point = lanelet_map_.get_Lanelet_with_Id(ids[0]).leftBound[0]
+    y = point.y
+
+    delta_file = str(tmp_path / "delta.osm")
+    with open(delta_file, "w") as delta:
+        delta.write('<?xml version="1.0"?>\n<osm version="0.6" generator="lanelet2">\n')
+        delta.write('  <node id="%d" visible="true" version="1" lat="0.0004" lon="0.0" />\n' % point.id)
+        delta.write('  <relation id="%d" action="delete" />\n</osm>\n' % ids[-1])
+
+    assert lanelet_map_.load_delta(delta_file) == {"added": 0, "changed": 1, "removed": 1}
+    assert lanelet_map_.point_index[point.id].y < y - 5.0
+    assert lanelet_map_.lmap.pointLayer[point.id].y == lanelet_map_.point_index[point.id].y
+    assert ids[-1] not in lanelet_map_.lanelet_index
+    assert not lanelet_map_.lmap.laneletLayer.exists(ids[-1])
+    assert lanelet_map_.validate()["passed"]
+    assert lanelet_map_.load_delta(str(tmp_path / "missing.osm")) == None
+
+
+# The trajectory files are matched in chunks, in this process or in worker processes, and
+# written in input order with the Lanelet ID as an additional column
+def test_match_trajectory_file(tmp_path):
+
+    osm_map_file = str(tmp_path / "Data_Map.osm")
+    shutil.copy(DATA_MAP, osm_map_file)
+    lanelet_map_ = LaneletMap(0, 0, osm_map_file)
+
+    xy = np.random.default_rng(2).uniform((-10.0, -10.0), (110.0, 110.0), (2500, 2))
+    expected = lanelet_map_.points_xy_over_Lanelets(xy).tolist()
+    lat, lon = lanelet_map_.project_xy_to_ll(xy)
+
+    # local points with a header, GPS points without
+    xy_file = str(tmp_path / "trajectory.csv")
+    with open(xy_file, "w") as trajectory:
+        trajectory.write("t,x,y\n")
+        trajectory.writelines("%d,%r,%r\n" % (k, x, y) for k, (x, y) in enumerate(xy.tolist()))
+    ll_file = str(tmp_path / "gnss.csv")
+    with open(ll_file, "w") as trajectory:
+        trajectory.writelines("%r,%r\n" % point for point in zip(lat.tolist(), lon.tolist()))
+
+    for workers in (1, 2):
+        output_file = str(tmp_path / ("matched_%d.csv" % workers))
+        assert match_trajectory_file(osm_map_file, xy_file, output_file, columns=("x", "y"), workers=workers,
+                                     chunk_size=300, max_pending=2) == len(xy)
+        with open(output_file) as matched:
+            assert matched.readline() == "t,x,y,lanelet_id\n"
+            rows = [line.rstrip("\n").split(",") for line in matched]
+        assert [int(row[0]) for row in rows] == list(range(len(xy)))
+        assert [int(row[-1]) for row in rows] == expected
+
+        output_file = str(tmp_path / ("matched_ll_%d.csv" % workers))
+        assert match_trajectory_file(osm_map_file, ll_file, output_file, columns=(0, 1), ll=True, workers=workers,
+                                     chunk_size=1000) == len(xy)
+        with open(output_file) as matched:
+            assert [int(line.rsplit(",", 1)[1]) for line in matched] == expected
+
+    assert -1 in expected and any(ID >= 0 for ID in expected)
+    assert match_trajectory_file(osm_map_file, xy_file, output_file, columns=("lat", "lon")) == None
+    assert match_trajectory_file(str(tmp_path / "missing.osm"), xy_file, output_file) == None
+
+
+# The server answers concurrent requests in batches like the map itself, also a client
+# which sends all its requests before it reads the answers, and an invalid request
+def test_server_batches_requests(tmp_path):
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    ids = sorted(lanelet_map_.lanelet_index)
+    xy = np.random.default_rng(0).uniform((-10.0, -10.0), (110.0, 110.0), (2000, 2))
+    expected_xy = [ID if ID >= 0 else None for ID in lanelet_map_.points_xy_over_Lanelets(xy).tolist()]
+    neighbours = lanelet_map_.get_neighbour_ids(np.array(ids, dtype=np.int64))
+    offsets, following = neighbours["following"]
+    expected_following = [following[begin:end].tolist() for begin, end in zip(offsets[:-1], offsets[1:])]
+    assert any(ID == None for ID in expected_xy) and any(ID != None for ID in expected_xy)
+
+    socket_path = str(tmp_path / "map.sock")
+
+    async def run():
+        server = LaneletMapServer(lanelet_map_)
+        await server.start(socket_path)
+
+        client = await AsyncLaneletMapClient.connect(socket_path)
+        results = await asyncio.gather(*(client.point_xy_over_Lanelet(x, y) for x, y in xy[:200].tolist()),
+                                       *(client.get_following_Lanelets(ID) for ID in ids))
+        await client.close()
+
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        async def send():
+            for k, (x, y) in enumerate(xy.tolist()):
+                writer.write((json.dumps({"id": k, "method": "point_xy_over_Lanelet", "args": [x, y]}) + "\n").encode())
+            writer.write(b"no json\n")
+            await writer.drain()
+            writer.write_eof()
+        _, lines = await asyncio.gather(send(), reader.read())
+        writer.close()
+
+        server.server.close()
+        await server.server.wait_closed()
+        return results, [json.loads(line) for line in lines.splitlines()], server.get_server_stats()
+
+    results, responses, stats = asyncio.run(run())
+
+    assert results == expected_xy[:200] + expected_following
+    errors = [response for response in responses if "error" in response]
+    assert len(errors) == 1 and errors[0]["id"] == None
+    assert {response["id"]: response["result"] for response in responses if "result" in response} == dict(enumerate(expected_xy))
+    assert stats["requests"] == 200 + len(ids) + len(xy) and stats["mean_batch"] > 10.0
+
+
+# The tracker drops its cached polygons and neighbours when a bound is moved and matches
+# the changed map, not the old one
+def test_tracker_after_moved_bound():
+
+    x = np.arange(0.0, 50.0, 10.0)
+    def boundary(y):
+        return np.stack((x, np.full(len(x), y)), axis=1)
+
+    lanelet_map_ = LaneletMap()
+    upper, lower = lanelet_map_.build_corridor([boundary(3.5), boundary(0.0), boundary(-3.5)], closed=False)
+    tracker = LaneletTracker(lanelet_map_)
+    assert tracker.point_xy_over_Lanelet(15.0, 0.5) == upper[1].id
+    assert tracker.point_xy_over_Lanelet(15.0, 0.6) == upper[1].id
+    assert tracker.stats()["current"] == 1
+
+    # the shared bound moves above the position
+    shared = lanelet_map_.get_Lanelet_with_Id(upper[1].id).rightBound
+    assert lanelet_map_.update_map(points=[Point3d(point.id, point.x, 1.0, point.z) for point in shared])["changed"] > 0
+
+    assert lanelet_map_.point_xy_over_Lanelet(15.0, 0.5) == lower[1].id
+    assert tracker.point_xy_over_Lanelet(15.0, 0.5) == lower[1].id
+    assert tracker.point_xy_over_Lanelet(15.0, 2.0) == upper[1].id
+    assert tracker.stats()["global"] == 1
+
+
+# The neighbour table gives the neighbours of the routing graph, also if several Lanelets share a bound
+def test_topology_like_routing_graph():
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    topology = lanelet_map_.get_topology()
+    graph = lanelet_map_.graph
+    for lane in lanelet_map_.lanelet_index.values():
+        assert sorted(topology.following_ids(lane.id)) == sorted(other.id for other in graph.following(lane, False))
+        assert sorted(topology.preceding_ids(lane.id)) == sorted(other.id for other in graph.previous(lane, False))
+        for ID, other in ((topology.left_id(lane.id), graph.adjacentLeft(lane) or graph.left(lane)),
+                          (topology.right_id(lane.id), graph.adjacentRight(lane) or graph.right(lane))):
+            assert ID == (other.id if other != None else None)
+
+    def line(y):
+        return LineString3d(getId(), [Point3d(getId(), 0.0, y, 0.0), Point3d(getId(), 10.0, y, 0.0)])
+
+    # four Lanelets on one bound, the first two with the lowest rows and IDs
+    lanelet_map_ = LaneletMap()
+    shared = line(0.0)
+    inverted_right = Lanelet(getId(), line(3.0).invert(), shared.invert())
+    inverted_left = Lanelet(getId(), shared.invert(), line(-3.0).invert())
+    upper = Lanelet(getId(), line(3.5), shared)
+    lower = Lanelet(getId(), shared, line(-3.5))
+    for lane in (inverted_right, inverted_left, upper, lower):
+        lanelet_map_.lmap.add(lane)
+        lanelet_map_.add_Lanelet_to_index(lane)
+
+    topology = lanelet_map_.get_topology()
+    graph = lanelet_map_.graph
+    assert topology.left_id(lower.id) == upper.id == graph.adjacentLeft(lower).id
+    assert topology.right_id(upper.id) == lower.id == graph.adjacentRight(upper).id
+    assert topology.right_id(inverted_right.id) == inverted_left.id
+    assert topology.left_id(inverted_left.id) == inverted_right.id
+
+
+# The routes of a batch come from the routing graph once per pair and are cached until the map changes
+def test_routes_and_cache():
+
+    x = np.arange(0.0, 50.0, 10.0)
+    def boundary(y):
+        return np.stack((x, np.full(len(x), y)), axis=1)
+
+    lanelet_map_ = LaneletMap(collect_stats=True)
+    upper, lower = lanelet_map_.build_corridor([boundary(3.5), boundary(0.0), boundary(-3.5)], closed=False)
+    upper_ids = [lane.id for lane in upper]
+    lower_ids = [lane.id for lane in lower]
+
+    routes = lanelet_map_.get_routes([[upper_ids[0], upper_ids[2]], [upper_ids[-1], upper_ids[0]], [upper_ids[0], upper_ids[2]]])
+    assert routes["paths"] == [tuple(upper_ids[:3]), None, tuple(upper_ids[:3])]
+    assert routes["costs"].tolist() == [30.0, np.inf, 30.0]
+    assert lanelet_map_.stats()["caches"]["route"] == {"hits": 0, "misses": 2, "hit_rate": 0.0}
+    assert lanelet_map_.get_shortest_path(upper[0], upper[2]) == tuple(upper_ids[:3])
+    assert lanelet_map_.get_cost_to_go(upper[0], upper[2]) == 30.0
+    assert lanelet_map_.get_route_of_Ids(lower_ids[0], lower_ids[-1]) == (tuple(lower_ids), 40.0)
+    assert lanelet_map_.get_route_of_Ids(upper_ids[0], lower_ids[-1]) == (None, None)
+    assert lanelet_map_.stats()["caches"]["route"]["hits"] == 2
+
+    assert lanelet_map_.get_reachable_set(upper[0], 15.0) == tuple(upper_ids[1::-1])
+    assert sorted(lanelet_map_.get_reachable_set(upper[0], 100.0)) == upper_ids
+
+    # the removed Lanelet breaks the cached route
+    lanelet_map_.update_map(remove_ids=[upper_ids[1]])
+    assert lanelet_map_.get_routes([[upper_ids[0], upper_ids[2]]])["costs"].tolist() == [np.inf]
+    assert lanelet_map_.get_reachable_set(upper[0], 100.0) == (upper_ids[0],)
+
+
+# The validation report lists each defect of the map once, also if the spatial checks run on worker processes
+def test_validation_report(monkeypatch):
+
+    def line(x0, x1, y):
+        return LineString3d(getId(), [Point3d(getId(), x0, y, 0.0), Point3d(getId(), x1, y, 0.0)])
+
+    lanelet_map_ = LaneletMap()
+    first = Lanelet(getId(), line(0.0, 10.0, 3.0), line(0.0, 10.0, 0.0))
+    # starts 0.5 m after the end of the first one
+    second = Lanelet(getId(), line(10.5, 20.0, 3.0), line(10.5, 20.0, 0.0))
+    shared = line(30.0, 40.0, 0.0)
+    upper = Lanelet(getId(), line(30.0, 40.0, 3.0), shared)
+    lower = Lanelet(getId(), shared, line(30.0, 40.0, -3.0))
+    inverted = Lanelet(getId(), shared.invert(), line(30.0, 40.0, 6.0).invert())
+    # starts 5 mm beside the end of the left bound of the second one
+    flat = line(20.005, 25.0, 3.0)
+    degenerate = Lanelet(getId(), flat, flat)
+    lanes = (first, second, upper, lower, inverted, degenerate)
+    for lane in lanes:
+        lanelet_map_.lmap.add(lane)
+        lanelet_map_.add_Lanelet_to_index(lane)
+
+    report = lanelet_map_.validate()
+    checks = report["checks"]
+    assert report["map"] == {"lanelets": 6, "lines": 9, "points": 18}
+    assert sorted(checks["no_successor"]["ids"]) == sorted(checks["no_predecessor"]["ids"]) == sorted(lane.id for lane in lanes)
+    assert checks["shared_bounds"]["ids"] == [shared.id]
+    assert sorted(checks["shared_bounds"]["lanelets"][0]) == sorted([upper.id, lower.id, inverted.id])
+    assert checks["degenerate"]["ids"] == [degenerate.id]
+    assert sorted(checks["duplicate_points"]["ids"][0]) == sorted([second.leftBound[1].id, flat[0].id])
+    assert checks["unconnected"]["ids"] == [[first.id, second.id]]
+    assert np.allclose(checks["unconnected"]["gaps"], [0.5])
+    assert (report["errors"], report["warnings"], report["passed"]) == (4, 12, False)
+    assert all(check["severity"] == LaneletValidation.SEVERITY[name] for name, check in checks.items())
+
+    monkeypatch.setattr(LaneletValidation, "PARALLEL_MIN_POINTS", 0)
+    assert validate_snapshot(lanelet_map_.get_snapshot(complete=False), workers=2)["checks"] == checks
+
+
+# The statistics record the calls of the API, not the helpers and nested calls within them
+def test_stats_of_api_calls():
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP, collect_stats=True)
+    ids = sorted(lanelet_map_.lanelet_index)
+    for ID in ids[:20]:
+        lane = lanelet_map_.get_Lanelet_with_Id(ID)
+        lanelet_map_.get_following_Lanelet(lane)
+    lanelet_map_.get_shortest_path(lanelet_map_.get_Lanelet_with_Id(ids[0]), lanelet_map_.get_Lanelet_with_Id(ids[5]))
+
+    calls = {name: method["calls"] for name, method in lanelet_map_.stats()["methods"].items()}
+    assert calls == {"get_Lanelet_with_Id": 22, "get_following_Lanelet": 20, "get_shortest_path": 1}
+    assert "routing_graph" in lanelet_map_.stats()["phases"]
+
+    lanelet_map_.disable_stats()
+    assert "get_Lanelet_with_Id" not in vars(lanelet_map_)
+
+
+# The ring map built element by element equals the ring map of build_corridor()
+def test_benchmark_ring_map_by_elements():
+
+    def structure(lanelet_map_):
+        ids = np.array(sorted(lanelet_map_.lanelet_index))
+        neighbours = lanelet_map_.get_neighbour_ids(ids)
+        polygons = sorted(tuple(np.round(lanelet_map_.get_Polygon_of_Lanelet(lanelet_map_.get_Lanelet_with_Id(ID)), 6).ravel())
+                          for ID in ids.tolist())
+        return (len(lanelet_map_.line_index), len(lanelet_map_.point_index), polygons,
+                int((neighbours["left"] >= 0).sum()), int((neighbours["right"] >= 0).sum()),
+                np.diff(neighbours["following"][0]).tolist())
+
+    corridor_map = make_ring_map(300)
+    element_map = make_ring_map_by_elements(300)
+    assert structure(element_map) == structure(corridor_map)
+    assert element_map.validate()["passed"]
+
+
+# The grid map of the benchmarks has crossings: Lanelets with several successors and predecessors
+def test_benchmark_grid_map_has_crossings():
+
+    lanelet_map_ = make_grid_map(1000)
+    ids = np.array(sorted(lanelet_map_.lanelet_index))
+    neighbours = lanelet_map_.get_neighbour_ids(ids)
+
+    n_following = np.diff(neighbours["following"][0])
+    n_preceding = np.diff(neighbours["preceding"][0])
+    assert (n_following >= 1).all() and (n_following == 3).any()
+    assert (n_preceding >= 1).all() and (n_preceding == 3).any()
+    assert lanelet_map_.validate()["passed"]
+
+    # routes through the crossings, also with turns
+    path, cost = lanelet_map_.get_route_of_Ids(int(ids[0]), int(ids[-1]))
+    assert path != None and cost > 0.0
+
+
+# The streamed export merges a marking of collinear two-point LineStrings into one way,
+# the bounds of the Lanelets are written unchanged; the same with worker processes
+def test_stream_merges_collinear_markings(tmp_path):
+
+    lanelet_map_ = LaneletMap(0, 0, DATA_MAP)
+    bounds = {ID: [point.id for point in line] for ID, line in lanelet_map_.line_index.items()}
+
+    # a dashed marking: 10 segments on a straight line, then a kink
+    points = [Point3d(getId(), 1000.0 + 5.0 * i, 2000.0, 0.0) for i in range(11)] + [Point3d(getId(), 1050.0, 2010.0, 0.0)]
+    for first, second in zip(points[:-1], points[1:]):
+        lanelet_map_.lmap.add(LineString3d(getId(), [first, second], {"type": "line_thin", "subtype": "dashed"}))
+    lanelet_map_.build_index()
+
+    counts = {}
+    for merge_collinear in (False, True):
+        target_map = str(tmp_path / ("map_%d.osm" % merge_collinear))
+        counts[merge_collinear] = lanelet_map_.stream_LaneletMap_to_file(target_map, merge_collinear=merge_collinear)
+
+        # the worker processes format the same document, also gzip compressed
+        parallel_map = str(tmp_path / ("map_%d_parallel.osm.gz" % merge_collinear))
+        assert lanelet_map_.stream_LaneletMap_to_file(parallel_map, merge_collinear=merge_collinear, workers=2) == counts[merge_collinear]
+        with gzip.open(parallel_map, "rt") as parallel_file, open(target_map) as target_file:
+            assert parallel_file.read() == target_file.read()
+
+        written = LaneletMap(0, 0, target_map)
+        for ID, point_ids in bounds.items():
+            assert [point.id for point in written.lmap.lineStringLayer[ID]] == point_ids
+        markings = [line for line in written.lmap.lineStringLayer if line.id not in bounds]
+        assert sorted(len(line) for line in markings) == ([2, 11] if merge_collinear else [2] * 11)
+        assert len(written.point_index) == len(lanelet_map_.point_index)
+
+    assert counts[False]["ways"] - counts[True]["ways"] == 9
+
+
+# wait_ready() returns False while the map is still loading
+def test_wait_ready_timeout():
+
+    lanelet_map_ = LaneletMap()
+    assert lanelet_map_.wait_ready(0.01)
+
+    lanelet_map_.load_future = Future()
+    assert not lanelet_map_.wait_ready(0.01)
+    assert not lanelet_map_.is_ready()
+
+    lanelet_map_.load_future.set_result(lanelet_map_)
+    assert lanelet_map_.wait_ready(0.01)